@@ -7,15 +7,33 @@ class Settings(BaseSettings):
     DEBUG: bool
     SECRET_KEY: str
     ENVIRONMENT: str
+
+    # Auth Token Settings
+    AUTH_TOKEN_MODE: str = "appwrite"  # "appwrite" (legacy user ID) or "signed"
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 30
     
     # Appwrite Config
     APPWRITE_ENDPOINT: str
     APPWRITE_PROJECT_ID: str
     APPWRITE_API_KEY: str
     APPWRITE_BUCKET_ID: str
+    APPWRITE_POOL_SIZE: int = 20
+    APPWRITE_CONNECT_TIMEOUT: float = 5.0
+    APPWRITE_READ_TIMEOUT: float = 30.0
     
     # OpenAI Config
     OPENAI_API_KEY: str
+    OPENAI_MAX_CONCURRENCY: int = 4
+    OPENAI_TIMEOUT: float = 30.0
+    OPENAI_MAX_RETRIES: int = 2
+
+    # Vision Cache Settings
+    VISION_CACHE_BACKEND: str = "memory"  # "memory", "disk" or "none"
+    VISION_CACHE_MAX_ENTRIES: int = 5000
+    VISION_CACHE_PATH: str = ".calmate/vision_cache.sqlite3"
+    VISION_CACHE_NEAR_DUPLICATES: bool = False
+    VISION_CACHE_PHASH_DISTANCE: int = 4
     
     # Database Config
     DATABASE_ID: str
@@ -39,10 +57,77 @@ class Settings(BaseSettings):
     
     # Cache Settings
     CACHE_TTL: int
+    PRINCIPAL_CACHE_SIZE: int = 10000
     
     # Upload Settings
     MAX_UPLOAD_SIZE: int
     ALLOWED_IMAGE_TYPES: str
+    MAX_BATCH_IMAGES: int = 10
+    UPLOAD_CHUNK_SIZE: int = 65536
+
+    # Storage Index Settings
+    STORAGE_INDEX_BACKEND: str = "sqlite"  # "sqlite" or "none" (read-only or serverless deploys)
+    STORAGE_INDEX_PATH: str = ".calmate/storage_index.sqlite3"
+    STORAGE_USAGE_RECONCILE_HOUR: int = 4
+
+    # Nutrition Rollup Settings
+    NUTRITION_ROLLUP_COLLECTION_ID: str = "daily_nutrition"
+    NUTRITION_BACKFILL_ON_STARTUP: bool = False
+    NUTRITION_BACKFILL_CONCURRENCY: int = 8
+
+    # Nutrition Analytics Settings
+    ANALYTICS_PAGE_SIZE: int = 1000
+    ANALYTICS_GOAL_TOLERANCE: float = 0.1  # Within 10% of daily_calorie_goal counts as on target
+
+    # Food Search Settings
+    SEARCH_INDEX_MEMORY_MB: int = 64  # Per worker, across all users' indexes
+    SEARCH_INDEX_TTL: int = 600  # Seconds before an index is rebuilt from the database
+    SEARCH_INDEX_PAGE_SIZE: int = 1000
+    SEARCH_FUZZY_THRESHOLD: float = 0.3  # Minimum trigram similarity for a fuzzy term match
+
+    # Export/Import Settings
+    EXPORT_PAGE_SIZE: int = 500
+    IMPORT_BATCH_SIZE: int = 100
+    IMPORT_CONCURRENCY: int = 8
+    IMPORT_MAX_REPORTED_ERRORS: int = 100
+
+    # Macronutrient Migration Settings
+    MACRO_MIGRATION_ON_STARTUP: bool = False
+    MACRO_MIGRATION_PAGE_SIZE: int = 100
+    MACRO_MIGRATION_CONCURRENCY: int = 8
+
+    # JSON Response Settings
+    JSON_STREAM_MIN_ITEMS: int = 1000  # List responses this long are streamed in chunks
+
+    # Revision Claim Settings
+    REVISION_CLAIMS_COLLECTION_ID: str = "revision_claims"
+    REVISION_CLAIM_TIMEOUT: int = 30  # Seconds before an unfinished revision claim counts as abandoned
+    REVISION_CLAIM_RETENTION_HOURS: int = 24
+
+    # Storage Retention Settings
+    RETENTION_DRY_RUN: bool = True  # Report orphans without deleting them
+    RETENTION_MIN_AGE_DAYS: int = 1
+    RETENTION_SWEEP_HOUR: int = 3
+    RETENTION_PAGE_SIZE: int = 100
+    RETENTION_DELETE_CONCURRENCY: int = 8
+    RETENTION_CHECKPOINT_PATH: str = ".calmate/retention_checkpoint.json"
+
+    # Image Processing Settings
+    IMAGE_MAX_EDGE: int = 1024
+    IMAGE_OUTPUT_FORMAT: str = "JPEG"  # "JPEG" or "WEBP"
+    THUMBNAIL_SIZES: str = "160,480"  # Longest edge in pixels, comma separated
+    IMAGE_QUALITY: int = 85
+    IMAGE_PROCESS_WORKERS: int = 2  # 0 runs image work in a thread instead
+
+    # Analysis Queue Settings
+    ANALYSIS_QUEUE_BACKEND: str = "memory"  # "memory" or "sqlite"
+    ANALYSIS_QUEUE_PATH: str = ".calmate/analysis_jobs.sqlite3"
+    ANALYSIS_WORKERS: int = 2
+    ANALYSIS_BATCH_SIZE: int = 4
+    ANALYSIS_RATE_PER_SECOND: float = 2.0
+    ANALYSIS_JOB_TTL: int = 3600
+    ANALYSIS_JOB_LEASE: int = 300  # Seconds before a running job is presumed lost and requeued
+    ANALYSIS_MAX_ATTEMPTS: int = 3
 
     # Notification Settings
     NOTIFICATION_EMAIL: Optional[str] = None
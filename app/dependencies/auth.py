@@ -1,34 +1,66 @@
 # app/dependencies/auth.py
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from appwrite.client import Client
 from appwrite.services.databases import Databases
 from app.models.user import User
 from app.config import settings
+from app.utils.appwrite_client import get_client
+from app.utils.principal_cache import get_cached_principal, cache_principal
+from app.utils.tokens import is_signed_token, decode_token
+from app.utils.appwrite_gateway import AsyncDatabases
 from datetime import datetime
+import jwt
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/auth/login")
 
+
+def _user_from_claims(claims: dict) -> User:
+    """
+    Builds the principal from a verified signed token without any database
+    call. It only identifies the user: profile state (goals, counters,
+    streaks) is left at defaults, so handlers that need it read the user
+    document.
+    """
+    return User(
+        id=claims['sub'],
+        email=claims['email'],
+        full_name=claims.get('full_name'),
+        profile_image=claims.get('profile_image'),
+        fcm_token=None,
+        last_log_date=None,
+        created_at=datetime.fromisoformat(claims['created_at']),
+        updated_at=datetime.fromisoformat(claims['updated_at'])
+    )
+
+
 async def get_current_user(
     token: str = Depends(oauth2_scheme)
 ) -> User:
+    if is_signed_token(token):
+        try:
+            return _user_from_claims(decode_token(token))
+        except (jwt.InvalidTokenError, KeyError, ValueError) as e:
+            print(f"Authentication error: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Could not validate credentials"
+            )
+
+    cached_user = get_cached_principal(token)
+    if cached_user is not None:
+        return cached_user
+
     try:
-        # Initialize client
-        client = Client()
-        client.set_endpoint(settings.APPWRITE_ENDPOINT)
-        client.set_project(settings.APPWRITE_PROJECT_ID)
-        client.set_key(settings.APPWRITE_API_KEY)
-        
-        # Get user document
-        database = Databases(client)
-        user_data = database.get_document(
+        # Get user document (memoized for the rest of the request)
+        database = AsyncDatabases(Databases(get_client()))
+        user_data = await database.get_document(
             database_id=settings.DATABASE_ID,
             collection_id='6758085b003d85763089',
             document_id=token
         )
         
         # Map Appwrite document to User model
-        return User(
+        user = User(
             id=user_data['$id'],  # Appwrite uses $id for document ID
             username=user_data['username'],
             email=user_data['email'],
@@ -43,6 +75,8 @@ async def get_current_user(
             created_at=datetime.fromisoformat(user_data['$createdAt']),
             updated_at=datetime.fromisoformat(user_data['$updatedAt'])
         )
+        cache_principal(token, user)
+        return user
         
     except Exception as e:
         print(f"Authentication error: {str(e)}")
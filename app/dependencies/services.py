@@ -0,0 +1,71 @@
+# app/dependencies/services.py
+from functools import lru_cache
+from app.services.analysis_queue import AnalysisQueue, build_analysis_queue
+from app.services.database_service import DatabaseService
+from app.services.gamification_service import GamificationService
+from app.services.meal_service import MealService
+from app.services.nutrition_service import NutritionService
+from app.services.portability_service import PortabilityService
+from app.services.search_service import SearchService
+from app.services.social_service import SocialService
+from app.services.storage_service import StorageService
+from app.services.streak_service import StreakService
+from app.services.vision_service import VisionService
+
+# Services are stateless wrappers around the shared Appwrite client, so one
+# instance per worker is injected instead of constructing them per request.
+
+
+@lru_cache()
+def get_database_service() -> DatabaseService:
+    return DatabaseService()
+
+
+@lru_cache()
+def get_storage_service() -> StorageService:
+    return StorageService()
+
+
+@lru_cache()
+def get_streak_service() -> StreakService:
+    return StreakService()
+
+
+@lru_cache()
+def get_gamification_service() -> GamificationService:
+    return GamificationService()
+
+
+@lru_cache()
+def get_social_service() -> SocialService:
+    return SocialService()
+
+
+@lru_cache()
+def get_vision_service() -> VisionService:
+    return VisionService()
+
+
+@lru_cache()
+def get_meal_service() -> MealService:
+    return MealService()
+
+
+@lru_cache()
+def get_nutrition_service() -> NutritionService:
+    return NutritionService()
+
+
+@lru_cache()
+def get_search_service() -> SearchService:
+    return SearchService()
+
+
+@lru_cache()
+def get_portability_service() -> PortabilityService:
+    return PortabilityService()
+
+
+@lru_cache()
+def get_analysis_queue() -> AnalysisQueue:
+    return build_analysis_queue()
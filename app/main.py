@@ -13,8 +13,14 @@ from app.routes import (
     auth_routes
 )
 from app.config import settings
-from app.utils.appwrite_client import get_client
+from app.utils.appwrite_client import get_client, close_client
+from app.utils.openai_client import close_openai_client, openai_gate
+from app.utils.vision_cache import vision_cache
+from app.utils.image_processing import start_image_pool, shutdown_image_pool
+from app.dependencies.services import get_analysis_queue, get_storage_service
 from app.utils.scheduler import init_scheduler
+from app.utils.storage_index import storage_index
+from app.utils.unit_of_work import unit_of_work
 import logging
 
 # Set up logging
@@ -23,24 +29,35 @@ logger = logging.getLogger(__name__)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup: Initialize services, database connections, etc.
-    client = get_client()
+    # Startup: Initialize the worker-wide pooled Appwrite client
+    get_client()
+    start_image_pool()
     logger.info("Starting up CalMate API...")
     
     # Initialize and start the scheduler
     scheduler = init_scheduler()
     # Store scheduler in app state
     app.state.scheduler = scheduler
+
+    # Start background meal analysis workers
+    await get_analysis_queue().start()
     
     yield
     
     # Shutdown: Clean up resources
     logger.info("Shutting down CalMate API...")
+    await get_analysis_queue().stop()
     # Shut down scheduler gracefully
     if hasattr(app.state, "scheduler"):
         logger.info("Shutting down scheduler...")
         app.state.scheduler.shutdown()
 
+    shutdown_image_pool()
+
+    # Close pooled Appwrite and OpenAI connections
+    close_client()
+    await close_openai_client()
+
 app = FastAPI(
     title="CalMate API",
     description="AI-powered fitness tracking with social features",
@@ -54,8 +71,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+# Request-scoped document memoization
+@app.middleware("http")
+async def open_unit_of_work(request: Request, call_next):
+    with unit_of_work():
+        return await call_next(request)
+
 # Request timing middleware
 @app.middleware("http")
 async def add_process_time_header(request: Request, call_next):
@@ -91,7 +115,11 @@ async def health_check():
         "status": "healthy",
         "version": app.version,
         "environment": settings.ENVIRONMENT,
-        "scheduler_status": scheduler_status
+        "scheduler_status": scheduler_status,
+        "vision": openai_gate.snapshot(),
+        "vision_cache": vision_cache.snapshot() if vision_cache is not None else None,
+        # Only the O(1) counters; without an index the stats need a bucket scan
+        "storage": await get_storage_service().get_storage_stats() if storage_index.enabled else None
     }
 
 # API documentation customization
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, validator
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, List, Literal, Optional, Union
 from datetime import datetime
 import json
 
@@ -16,6 +16,21 @@ class FoodLog(BaseModel):
     timestamp: datetime
     new_achievements: Optional[List[Dict[str, Any]]] = None
 
+class FoodLogImport(BaseModel):
+    """One record of a food log import; the same shape /food/export writes."""
+    id: Optional[str] = Field(None, max_length=36)
+    food_name: str = Field(..., min_length=1, max_length=255)
+    portion_size: float = Field(..., ge=0)
+    calories: float = Field(..., ge=0)
+    macronutrients: Dict[str, float]
+    image_url: str = ''
+    visibility: Literal['private', 'friends', 'public'] = 'friends'
+    timestamp: datetime
+
+class FoodLogBatch(BaseModel):
+    logs: List[FoodLog]
+    new_achievements: List[Dict[str, Any]] = Field(default_factory=list)
+
 class FeedItem(BaseModel):
     id: str
     user_id: str
@@ -25,6 +40,7 @@ class FeedItem(BaseModel):
     calories: float
     macronutrients: Dict[str, float]
     image_url: str
+    thumbnails: Dict[str, str] = Field(default_factory=dict)  # size -> URL
     timestamp: datetime
 
     class Config:
@@ -1,6 +1,6 @@
 # app/models/user.py
 from pydantic import BaseModel, EmailStr
-from typing import List, Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 
 class User(BaseModel):
@@ -8,6 +8,7 @@ class User(BaseModel):
     email: EmailStr
     full_name: Optional[str]
     profile_image: Optional[str]
+    profile_thumbnails: Dict[str, str] = {}  # size -> URL
     current_streak: int = 0
     highest_streak: int = 0
     total_points: int = 0
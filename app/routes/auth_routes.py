@@ -5,9 +5,27 @@ from app.models.user import User
 from app.services.database_service import DatabaseService
 from appwrite.client import Client
 from appwrite.services.account import Account
+from appwrite.services.databases import Databases
 from pydantic import BaseModel, EmailStr
-from app.dependencies.auth import get_current_user
+from app.dependencies.auth import get_current_user, oauth2_scheme
+from app.dependencies.services import (
+    get_database_service
+)
+from app.utils.principal_cache import invalidate_user
+from app.utils.tokens import (
+    REFRESH_TOKEN_TYPE,
+    create_access_token,
+    create_refresh_token,
+    decode_token,
+    is_signed_token,
+    new_session_id,
+    revoke_session,
+    revoke_token
+)
 from app.config import settings
+from app.utils.appwrite_client import get_client
+from app.utils.appwrite_gateway import AsyncDatabases, AsyncGateway
+import jwt
 
 router = APIRouter()
 
@@ -24,24 +42,43 @@ class UserLogin(BaseModel):
     password: str
 
 
-def get_appwrite_client():
-    client = Client()
-    client.set_endpoint(settings.APPWRITE_ENDPOINT)
-    client.set_project(settings.APPWRITE_PROJECT_ID)
-    client.set_key(settings.APPWRITE_API_KEY)
-    return client
+class TokenRefresh(BaseModel):
+    refresh_token: str
+
+
+def get_appwrite_client() -> Client:
+    return get_client()
+
+
+async def issue_signed_tokens(client: Client, user_id: str, session_id: Optional[str] = None) -> dict:
+    """Issues an access/refresh token pair for a user, in a new session unless one is given"""
+    user_data = await AsyncDatabases(Databases(client)).get_document(
+        database_id=settings.DATABASE_ID,
+        collection_id='6758085b003d85763089',
+        document_id=user_id
+    )
+    session_id = session_id or new_session_id()
+    access_token, expires = create_access_token(user_data, session_id)
+    refresh_token, _ = create_refresh_token(user_id, session_id)
+    return {
+        "access_token": access_token,
+        "refresh_token": refresh_token,
+        "token_type": "bearer",
+        "user_id": user_id,
+        "expires": expires.isoformat()
+    }
 
 @router.post("/signup", response_model=User)
 async def signup(
     user_data: UserCreate,
-    database_service: DatabaseService = Depends()
+    database_service: DatabaseService = Depends(get_database_service)
 ):
     try:
         client = get_appwrite_client()
-        account = Account(client)
+        account = AsyncGateway(Account(client))
         
         # Create Appwrite account
-        user = account.create(
+        user = await account.create(
             user_id='unique()',
             email=user_data.email,
             password=user_data.password,
@@ -76,14 +113,17 @@ async def signup(
 async def login(credentials: UserLogin):
     try:
         client = get_appwrite_client()
-        account = Account(client)
+        account = AsyncGateway(Account(client))
 
         # Create session
-        session = account.create_email_password_session(
+        session = await account.create_email_password_session(
             email=credentials.email,
             password=credentials.password
         )
 
+        if settings.AUTH_TOKEN_MODE == "signed":
+            return await issue_signed_tokens(client, session['userId'])
+
         # Return JWT in a format our client can use
         return {
             "access_token": session['userId'],  # Use userId instead of session ID
@@ -100,11 +140,44 @@ async def login(credentials: UserLogin):
         )
 
 
+@router.post("/refresh")
+async def refresh(token_data: TokenRefresh):
+    try:
+        claims = decode_token(token_data.refresh_token, REFRESH_TOKEN_TYPE)
+    except jwt.InvalidTokenError as e:
+        print("Refresh Error:", str(e))
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid refresh token"
+        )
+
+    try:
+        # Rotate: a refresh token can only be used once
+        revoke_token(claims)
+        return await issue_signed_tokens(get_appwrite_client(), claims['sub'], claims.get('sid'))
+    except Exception as e:
+        print("Refresh Error:", str(e))
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid refresh token"
+        )
+
+
 @router.post("/logout")
-async def logout(current_user: User = Depends(get_current_user)):
+async def logout(
+    token: str = Depends(oauth2_scheme),
+    current_user: User = Depends(get_current_user)
+):
+    if is_signed_token(token):
+        # Revoke the session too, so its refresh token can't mint a new pair
+        claims = decode_token(token)
+        revoke_token(claims)
+        revoke_session(claims)
+
     try:
         client = get_appwrite_client()
-        account = Account(client)
+        account = AsyncGateway(Account(client))
+        invalidate_user(current_user.id)
         await account.delete_session('current')
         return {"message": "Successfully logged out"}
     except Exception as e:
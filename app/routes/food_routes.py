@@ -1,20 +1,36 @@
 # app/routes/food_routes.py
+import asyncio
 import json
 import traceback
 from fastapi import APIRouter, Depends, File, UploadFile, HTTPException, Query
-from appwrite.query import Query as AppwriteQuery
+from fastapi.responses import StreamingResponse
 from typing import List, Optional
-from datetime import datetime, timezone
+from datetime import datetime
 from app.config import Settings
 from app.services.database_service import DatabaseService
 from app.services.vision_service import VisionService
 from app.services.storage_service import StorageService
-from app.services.streak_service import StreakService
-from app.services.gamification_service import GamificationService
-from app.models.food_log import FoodLog
+from app.services.meal_service import MealService
+from app.services.analysis_queue import AnalysisQueue
+from app.services.nutrition_service import NutritionService
+from app.services.search_service import SearchService
+from app.services.portability_service import PortabilityService
+from app.utils.job_queue import TERMINAL_STATES
+from app.utils.macronutrients import decode_macros
+from app.utils.responses import construct_rows, json_array_response
+from app.models.food_log import FoodLog, FoodLogBatch
 from app.models.user import User
 from app.dependencies.auth import get_current_user
-import uuid
+from app.dependencies.services import (
+    get_database_service,
+    get_storage_service,
+    get_vision_service,
+    get_meal_service,
+    get_nutrition_service,
+    get_search_service,
+    get_portability_service,
+    get_analysis_queue
+)
 from app.config import settings
 
 router = APIRouter(tags=["food"])
@@ -25,132 +41,355 @@ async def analyze_food(
     file: UploadFile = File(...),
     visibility: str = Query("friends", enum=["private", "friends", "public"]),
     current_user: User = Depends(get_current_user),
-    vision_service: VisionService = Depends(),
-    storage_service: StorageService = Depends(),
-    streak_service: StreakService = Depends(),
-    gamification_service: GamificationService = Depends(),
-    database_service: DatabaseService = Depends()
+    vision_service: VisionService = Depends(get_vision_service),
+    storage_service: StorageService = Depends(get_storage_service),
+    meal_service: MealService = Depends(get_meal_service)
 ):
     try:
-        # Upload image
-        file_data = await storage_service.upload_image(file)
+        # Downscale once; the derivative is what gets stored and analyzed
+        image = await storage_service.prepare_upload(file)
+
+        # Upload the image and analyze the same bytes concurrently
+        file_data, analysis = await asyncio.gather(
+            storage_service.upload_prepared(image, current_user.id),
+            vision_service.analyze_food(image.data, image.content_type),
+            return_exceptions=True
+        )
+        if isinstance(file_data, BaseException):
+            raise file_data
         print(f"File uploaded: {file_data}")
 
-        # Analyze food
-        analysis = await vision_service.analyze_food(file_data['file_url'])
-        print(f"Analysis completed: {analysis}")
-
-        # Generate unique ID
-        log_id = str(uuid.uuid4())
-
-        # Create food log data for database
-        food_log_data = {
-            "id": log_id,
-            "user_id": current_user.id,
-            "food_name": analysis['food_name'],
-            "portion_size": float(analysis['portion_size']),
-            "calories": float(analysis['calories']),
-            "macronutrients": json.dumps(analysis['macronutrients']),  # Convert dict to JSON string
-            "image_url": file_data['file_url'],
-            "visibility": visibility,
-            "reactions": [],
-            "timestamp": datetime.now(timezone.utc).isoformat()
+        try:
+            if isinstance(analysis, BaseException):
+                raise analysis
+            print(f"Analysis completed: {analysis}")
+
+            # Save the log and update streak, achievements and calories
+            food_log_data = await meal_service.log_meal(
+                current_user.id,
+                analysis,
+                file_data['file_url'],
+                visibility
+            )
+        except Exception:
+            # No log references the image; drop the upload's reference
+            await storage_service.release_upload(file_data['file_id'], current_user.id)
+            raise
+
+        # Prepare response data
+        response_data = {
+            **food_log_data,
+            "macronutrients": analysis['macronutrients'],  # Use original dict for response
+            "timestamp": datetime.fromisoformat(food_log_data["timestamp"])  # Convert back to datetime
         }
 
-        # Save to Appwrite
-        database_service.database.create_document(
-            database_id=settings.DATABASE_ID,
-            collection_id='675928700015cab990d9',
-            document_id=log_id,
-            data=food_log_data
+        return FoodLog(**response_data)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error in food analysis: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=str(e)
         )
 
-        # Update streaks and achievements
-        await streak_service.update_streak(current_user.id)
-        new_achievements = await gamification_service.check_achievements(current_user.id)
 
-        # Update user's daily calories
-        user = database_service.database.get_document(
-            database_id=settings.DATABASE_ID,
-            collection_id='6758085b003d85763089',
-            document_id=current_user.id
+@router.post("/analyze/batch", response_model=FoodLogBatch)
+async def analyze_food_batch(
+    files: List[UploadFile] = File(...),
+    visibility: str = Query("friends", enum=["private", "friends", "public"]),
+    current_user: User = Depends(get_current_user),
+    vision_service: VisionService = Depends(get_vision_service),
+    storage_service: StorageService = Depends(get_storage_service),
+    meal_service: MealService = Depends(get_meal_service)
+):
+    if len(files) > settings.MAX_BATCH_IMAGES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.MAX_BATCH_IMAGES} images can be analyzed per batch"
         )
 
-        # Handle missing or None value for 'calories_consumed_today'
-        current_calories = int(user.get('calories_consumed_today') or 0)
-        new_calories = current_calories + int(analysis['calories'])
+    try:
+        images = await asyncio.gather(*(storage_service.prepare_upload(file) for file in files))
 
-        database_service.database.update_document(
-            database_id=settings.DATABASE_ID,
-            collection_id='6758085b003d85763089',
-            document_id=current_user.id,
-            data={'calories_consumed_today': new_calories}
+        # Uploads run concurrently; vision calls share the OpenAI concurrency limit
+        uploads, analyses = await asyncio.gather(
+            asyncio.gather(*(
+                storage_service.upload_prepared(image, current_user.id)
+                for image in images
+            ), return_exceptions=True),
+            asyncio.gather(*(
+                vision_service.analyze_food(image.data, image.content_type)
+                for image in images
+            ), return_exceptions=True)
         )
 
-        if analysis['calories'] is None:
-            raise ValueError("Calories analysis returned None.")
+        try:
+            failure = next((result for result in (*uploads, *analyses) if isinstance(result, BaseException)), None)
+            if failure is not None:
+                raise failure
 
+            # One streak/achievement/calorie pass for the whole batch
+            food_logs, new_achievements = await meal_service.log_meals(
+                current_user.id,
+                [(analysis, file_data['file_url']) for analysis, file_data in zip(analyses, uploads)],
+                visibility
+            )
+        except Exception:
+            # No log references the stored images; drop the uploads' references
+            await asyncio.gather(*(
+                storage_service.release_upload(file_data['file_id'], current_user.id)
+                for file_data in uploads
+                if not isinstance(file_data, BaseException)
+            ))
+            raise
 
-        # Prepare response data
-        response_data = {
-            **food_log_data,
-            "macronutrients": analysis['macronutrients'],  # Use original dict for response
-            "timestamp": datetime.fromisoformat(food_log_data["timestamp"]),  # Convert back to datetime
-            "new_achievements": new_achievements
-        }
+        return FoodLogBatch(
+            logs=[
+                FoodLog(**{
+                    **food_log_data,
+                    "macronutrients": analysis['macronutrients'],
+                    "timestamp": datetime.fromisoformat(food_log_data["timestamp"])
+                })
+                for food_log_data, analysis in zip(food_logs, analyses)
+            ],
+            new_achievements=new_achievements
+        )
 
-        return FoodLog(**response_data)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error in batch food analysis: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=str(e)
+        )
 
+
+@router.post("/analyze/async", status_code=202)
+async def analyze_food_async(
+    file: UploadFile = File(...),
+    visibility: str = Query("friends", enum=["private", "friends", "public"]),
+    current_user: User = Depends(get_current_user),
+    storage_service: StorageService = Depends(get_storage_service),
+    analysis_queue: AnalysisQueue = Depends(get_analysis_queue)
+):
+    try:
+        # Store the image now; analysis and logging happen in the background
+        image = await storage_service.prepare_upload(file)
+        file_data = await storage_service.upload_prepared(image, current_user.id)
+
+        job = await analysis_queue.enqueue(current_user.id, {
+            "file_id": file_data['file_id'],
+            "file_url": file_data['file_url'],
+            "content_type": image.content_type,
+            "visibility": visibility
+        })
+
+        return {
+            "job_id": job.id,
+            "status": job.status,
+            "status_url": f"/api/v1/food/jobs/{job.id}",
+            "events_url": f"/api/v1/food/jobs/{job.id}/events"
+        }
+
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Error in food analysis: {str(e)}")
+        print(f"Error queueing food analysis: {str(e)}")
         raise HTTPException(
             status_code=500,
             detail=str(e)
         )
 
 
+async def _get_user_job(job_id: str, user_id: str, analysis_queue: AnalysisQueue):
+    job = await analysis_queue.get(job_id)
+    # Don't reveal other users' jobs
+    if job is None or job.user_id != user_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+def _job_response(job) -> dict:
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "result": job.result,
+        "error": job.error,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at
+    }
+
+
+@router.get("/jobs/{job_id}")
+async def get_analysis_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user),
+    analysis_queue: AnalysisQueue = Depends(get_analysis_queue)
+):
+    job = await _get_user_job(job_id, current_user.id, analysis_queue)
+    return _job_response(job)
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_analysis_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user),
+    analysis_queue: AnalysisQueue = Depends(get_analysis_queue)
+):
+    job = await _get_user_job(job_id, current_user.id, analysis_queue)
+
+    async def event_stream():
+        current = job
+        last_status = None
+        while True:
+            if current.status != last_status:
+                last_status = current.status
+                yield f"event: {current.status}\ndata: {json.dumps(_job_response(current))}\n\n"
+            if current.status in TERMINAL_STATES:
+                return
+            if not await analysis_queue.wait_for_update(job_id, timeout=15):
+                yield ": keep-alive\n\n"
+            current = await analysis_queue.get(job_id)
+            if current is None:
+                return
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
+
+
+@router.get("/summary")
+async def get_nutrition_summary(
+    days: int = Query(7, ge=1, le=90),
+    current_user: User = Depends(get_current_user),
+    database_service: DatabaseService = Depends(get_database_service)
+):
+    return await database_service.get_nutrition_summary(current_user.id, days)
+
+
+@router.get("/analytics")
+async def get_nutrition_analytics(
+    days: int = Query(90, ge=1, le=3660),
+    rolling_window: int = Query(7, ge=1, le=90),
+    percentiles: List[float] = Query([10, 25, 50, 75, 90]),
+    include_daily: bool = True,
+    current_user: User = Depends(get_current_user),
+    database_service: DatabaseService = Depends(get_database_service),
+    nutrition_service: NutritionService = Depends(get_nutrition_service)
+):
+    if any(p < 0 or p > 100 for p in percentiles):
+        raise HTTPException(status_code=400, detail="Percentiles must be between 0 and 100")
+
+    try:
+        # Signed-token principals carry no profile state
+        user = await database_service.get_user(current_user.id) or {}
+        return await nutrition_service.get_analytics(
+            current_user.id,
+            days,
+            rolling_window,
+            percentiles,
+            calorie_goal=user.get('daily_calorie_goal'),
+            include_daily=include_daily
+        )
+    except Exception as e:
+        print(f"Error computing nutrition analytics: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error computing nutrition analytics: {str(e)}"
+        )
+
+
+@router.get("/search")
+async def search_food_logs(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(20, ge=1, le=50),
+    current_user: User = Depends(get_current_user),
+    search_service: SearchService = Depends(get_search_service)
+):
+    try:
+        return await search_service.search(current_user.id, q, limit)
+    except Exception as e:
+        print(f"Error searching food logs: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error searching food logs: {str(e)}"
+        )
+
+
+@router.get("/export")
+async def export_food_logs(
+    format: str = Query("ndjson", enum=["ndjson", "csv"]),
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    current_user: User = Depends(get_current_user),
+    portability_service: PortabilityService = Depends(get_portability_service)
+):
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        portability_service.export_logs(current_user.id, format, date_from, date_to),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="food_logs.{format}"'}
+    )
+
+
+@router.post("/import")
+async def import_food_logs(
+    file: UploadFile = File(...),
+    format: str = Query("ndjson", enum=["ndjson", "csv"]),
+    current_user: User = Depends(get_current_user),
+    portability_service: PortabilityService = Depends(get_portability_service)
+):
+    try:
+        return await portability_service.import_logs(current_user.id, file.file, format)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error importing food logs: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error importing food logs: {str(e)}"
+        )
+
+
 @router.get("/logs", response_model=List[FoodLog])
 async def get_food_logs(
     limit: int = Query(10, le=50),
-    offset: int = 0,
+    cursor: Optional[str] = Query(None, description="Page token from the X-Next-Cursor header"),
+    offset: int = Query(0, deprecated=True),
     date_from: Optional[datetime] = None,
     date_to: Optional[datetime] = None,
     current_user: User = Depends(get_current_user),
-    database_service: DatabaseService = Depends()  # Changed from vision_service
+    database_service: DatabaseService = Depends(get_database_service)  # Changed from vision_service
 ):
     try:
-        # Create queries
-        queries = [
-            AppwriteQuery.equal('user_id', current_user.id),
-            AppwriteQuery.limit(limit),
-            AppwriteQuery.offset(offset),
-            AppwriteQuery.order_desc('timestamp')  # Most recent first
-        ]
-
-        # Add date filters if provided
-        if date_from:
-            queries.append(Query.greater_than('timestamp', date_from.isoformat()))
-        if date_to:
-            queries.append(Query.less_than('timestamp', date_to.isoformat()))
-
-        # Get logs from database
-        logs = database_service.database.list_documents(
-            database_id=settings.DATABASE_ID,
-            collection_id='675928700015cab990d9',  # food_logs collection ID
-            queries=queries
-        )
-
-        # Process the logs
-        food_logs = []
-        for log in logs['documents']:
-            # Parse the JSON string back to dict for macronutrients
-            log['macronutrients'] = json.loads(log['macronutrients'])
-            # Convert timestamp string to datetime
-            log['timestamp'] = datetime.fromisoformat(log['timestamp'])
-            food_logs.append(FoodLog(**log))
+        try:
+            logs, next_cursor = await database_service.get_user_logs(
+                current_user.id,
+                limit,
+                cursor=cursor,
+                date_from=date_from,
+                date_to=date_to,
+                offset=offset
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
-        return food_logs
+        # Rows come from our own collection, so skip per-row model validation
+        food_logs = construct_rows(FoodLog, (
+            {**log, "id": log['$id'], "macronutrients": decode_macros(log)} for log in logs
+        ))
+        return json_array_response(
+            food_logs,
+            headers={"X-Next-Cursor": next_cursor} if next_cursor else None
+        )
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error fetching food logs: {str(e)}")
         raise HTTPException(
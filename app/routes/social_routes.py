@@ -6,8 +6,13 @@ from app.services.social_service import SocialService
 from app.models.friendship import FriendRequest, Friendship
 from app.models.user import User
 from app.dependencies.auth import get_current_user
+from app.dependencies.services import (
+    get_database_service,
+    get_social_service
+)
 from app.models.food_log import FeedItem
 from app.config import settings
+from app.utils.responses import json_array_response
 from appwrite.query import Query as AppWriteQuery
 
 router = APIRouter(tags=["social"])
@@ -16,7 +21,7 @@ router = APIRouter(tags=["social"])
 async def send_friend_request(
     user_id: str,
     current_user: User = Depends(get_current_user),
-    social_service: SocialService = Depends(),
+    social_service: SocialService = Depends(get_social_service),
 ):
     try:
         request = await social_service.send_friend_request(current_user.id, user_id)
@@ -28,13 +33,13 @@ async def send_friend_request(
 async def get_friend_requests(
     type: str = Query("received", enum=["sent", "received"]),
     current_user: User = Depends(get_current_user),
-    social_service: SocialService = Depends()
+    social_service: SocialService = Depends(get_social_service)
 ):
     try:
         field = 'to_user' if type == 'received' else 'from_user'
         query = AppWriteQuery.equal(field, current_user.id)
 
-        requests = social_service.database.list_documents(
+        requests = await social_service.database.list_documents(
             database_id=settings.DATABASE_ID,
             collection_id='67592a09000aff381e48',
             queries=[
@@ -47,13 +52,13 @@ async def get_friend_requests(
         request_list = []
         for request in requests['documents']:
             # Get both users' details
-            from_user = social_service.database.get_document(
+            from_user = await social_service.database.get_document(
                 database_id=settings.DATABASE_ID,
                 collection_id=social_service.users_collection,
                 document_id=request['from_user']
             )
             
-            to_user = social_service.database.get_document(
+            to_user = await social_service.database.get_document(
                 database_id=settings.DATABASE_ID,
                 collection_id=social_service.users_collection,
                 document_id=request['to_user']
@@ -86,7 +91,7 @@ async def get_friend_requests(
 async def list_users(
    search: Optional[str] = None,
    current_user: User = Depends(get_current_user),
-   database_service: DatabaseService = Depends()
+   database_service: DatabaseService = Depends(get_database_service)
 ):
    try:
        queries = [
@@ -96,9 +101,9 @@ async def list_users(
 
        # Add search query if provided
        if search:
-           queries.append(Query.search('username', search))
+           queries.append(AppWriteQuery.search('username', search))
 
-       users = database_service.database.list_documents(
+       users = await database_service.database.list_documents(
            database_id=settings.DATABASE_ID,
            collection_id='6758085b003d85763089',
            queries=queries
@@ -116,7 +121,7 @@ async def list_users(
                    'achievements_count': len(user.get('achievements', [])),
                })
 
-       return user_list
+       return json_array_response(user_list)
 
    except Exception as e:
        print(f"List users error: {str(e)}")
@@ -129,7 +134,7 @@ async def list_users(
 async def accept_friend_request(
     request_id: str,
     current_user: User = Depends(get_current_user),
-    social_service: SocialService = Depends(),
+    social_service: SocialService = Depends(get_social_service),
 ):
     try:
         # Accept the request
@@ -142,26 +147,37 @@ async def accept_friend_request(
 @router.get("/friends", response_model=List[Friendship])
 async def get_friends(
     current_user: User = Depends(get_current_user),
-    social_service: SocialService = Depends()
+    social_service: SocialService = Depends(get_social_service)
 ):
-    return await social_service.get_friends(current_user.id)
+    return json_array_response(await social_service.get_friends(current_user.id))
 
 @router.get("/feed", response_model=List[FeedItem])
 async def get_friend_feed(
     limit: int = Query(20, le=50),
-    offset: int = 0,
+    cursor: Optional[str] = Query(None, description="Page token from the X-Next-Cursor header"),
+    offset: int = Query(0, deprecated=True),
     current_user: User = Depends(get_current_user),
-    social_service: SocialService = Depends()
+    social_service: SocialService = Depends(get_social_service)
 ):
-    return await social_service.get_friend_feed(
-        current_user.id,
-        limit,
-        offset
+    try:
+        feed_items, next_cursor = await social_service.get_friend_feed(
+            current_user.id,
+            limit,
+            cursor=cursor,
+            offset=offset
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Feed items are built in the FeedItem shape by the service
+    return json_array_response(
+        feed_items,
+        headers={"X-Next-Cursor": next_cursor} if next_cursor else None
     )
 
 @router.post("/friends/cleanup", include_in_schema=False)  # Hidden admin endpoint
 async def cleanup_friendships(
     current_user: User = Depends(get_current_user),
-    social_service: SocialService = Depends()
+    social_service: SocialService = Depends(get_social_service)
 ):
     return await social_service.cleanup_duplicate_friendships()
\ No newline at end of file
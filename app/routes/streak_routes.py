@@ -4,13 +4,17 @@ from app.services.streak_service import StreakService
 from app.services.gamification_service import GamificationService
 from app.models.user import User
 from app.dependencies.auth import get_current_user
+from app.dependencies.services import (
+    get_streak_service,
+    get_gamification_service
+)
 
 router = APIRouter(tags=["streaks"])
 
 @router.get("/current")
 async def get_current_streak(
     current_user: User = Depends(get_current_user),
-    streak_service: StreakService = Depends()
+    streak_service: StreakService = Depends(get_streak_service)
 ):
     return await streak_service.get_user_streak(current_user.id)
 
@@ -18,6 +22,6 @@ async def get_current_streak(
 async def get_streak_leaderboard(
     limit: int = Query(10, le=50),
     current_user: User = Depends(get_current_user),
-    gamification_service: GamificationService = Depends()
+    gamification_service: GamificationService = Depends(get_gamification_service)
 ):
     return await gamification_service.get_leaderboard(limit)
\ No newline at end of file
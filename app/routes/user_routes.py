@@ -5,7 +5,13 @@ from app.services.database_service import DatabaseService
 from app.services.storage_service import StorageService
 from app.models.user import User
 from app.dependencies.auth import get_current_user
+from app.dependencies.services import (
+    get_database_service,
+    get_storage_service
+)
 from app.config import settings
+from app.utils.principal_cache import invalidate_user
+from app.utils.user_updates import user_updates
 from pydantic import BaseModel
 from typing import Optional
 from appwrite.query import Query
@@ -17,14 +23,16 @@ router = APIRouter(tags=["users"])
 @router.get("/profile", response_model=User)
 async def get_profile(
     current_user: User = Depends(get_current_user),
-    database_service: DatabaseService = Depends()
+    database_service: DatabaseService = Depends(get_database_service),
+    storage_service: StorageService = Depends(get_storage_service)
 ):
     try:
-        user = database_service.database.get_document(  # Remove await
+        user = await database_service.database.get_document(
             database_id=settings.DATABASE_ID,
             collection_id='6758085b003d85763089',  # users collection
             document_id=current_user.id
         )
+        thumbnails = await storage_service.thumbnail_urls([user.get('profile_image')])
         
         # Map Appwrite response to our User model
         return {
@@ -33,6 +41,7 @@ async def get_profile(
             'email': user['email'],
             'full_name': user.get('full_name'),
             'profile_image': user.get('profile_image'),
+            'profile_thumbnails': thumbnails[0],
             'current_streak': user.get('current_streak', 0),
             'highest_streak': user.get('highest_streak', 0),
             'total_points': user.get('total_points', 0),
@@ -58,14 +67,15 @@ class UserUpdate(BaseModel):
 async def update_profile(
     update_data: UserUpdate,
     current_user: User = Depends(get_current_user),
-    database_service: DatabaseService = Depends()
+    database_service: DatabaseService = Depends(get_database_service),
+    storage_service: StorageService = Depends(get_storage_service)
 ):
     try:
         print("Received update data:", update_data.dict())
 
         # Check if username already exists
         if update_data.username:
-            existing_users = database_service.database.list_documents(
+            existing_users = await database_service.database.list_documents(
                 database_id=settings.DATABASE_ID,
                 collection_id='6758085b003d85763089',
                 queries=[
@@ -82,13 +92,15 @@ async def update_profile(
         print("Fields to update:", update_fields)
 
         # Update user document
-        updated_user = database_service.database.update_document(
+        updated_user = await database_service.database.update_document(
             database_id=settings.DATABASE_ID,
             collection_id='6758085b003d85763089',
             document_id=current_user.id,
             data=update_fields
         )
+        invalidate_user(current_user.id)
         print("Raw updated user from DB:", updated_user)
+        thumbnails = await storage_service.thumbnail_urls([updated_user.get('profile_image')])
 
         response_data = {
             'id': updated_user['$id'],
@@ -96,6 +108,7 @@ async def update_profile(
             'email': updated_user['email'],
             'full_name': updated_user.get('full_name'),
             'profile_image': updated_user.get('profile_image'),
+            'profile_thumbnails': thumbnails[0],
             'current_streak': updated_user.get('current_streak', 0),
             'highest_streak': updated_user.get('highest_streak', 0),
             'total_points': updated_user.get('total_points', 0),
@@ -120,23 +133,39 @@ async def update_profile(
 async def update_profile_image(
     file: UploadFile = File(...),
     current_user: User = Depends(get_current_user),
-    storage_service: StorageService = Depends(),
-    database_service: DatabaseService = Depends()
+    storage_service: StorageService = Depends(get_storage_service),
+    database_service: DatabaseService = Depends(get_database_service)
 ):
     try:
-        file_data = await storage_service.upload_image(file)
+        # The principal (cache or token claims) may predate the last change
+        stored_user = await database_service.get_user(current_user.id) or {}
+        old_file_id = storage_service.file_id_from_url(stored_user.get('profile_image'))
+
+        file_data = await storage_service.upload_image(file, current_user.id)
         await database_service.update_user(
             current_user.id,
             {"profile_image": file_data['file_url']}
         )
+        invalidate_user(current_user.id)
+
+        # Release the previous picture; it is only deleted if nothing else uses it
+        if old_file_id and old_file_id != file_data['file_id']:
+            await storage_service.delete_image(old_file_id, current_user.id)
         return {"message": "Profile image updated successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/storage")
+async def get_storage_usage(
+    current_user: User = Depends(get_current_user),
+    storage_service: StorageService = Depends(get_storage_service)
+):
+    return await storage_service.get_storage_stats(current_user.id)
+
 @router.get("/stats")
 async def get_stats(
     current_user: User = Depends(get_current_user),
-    database_service: DatabaseService = Depends()
+    database_service: DatabaseService = Depends(get_database_service)
 ):
     return await database_service.get_user_stats(current_user.id)
 
@@ -145,11 +174,11 @@ async def get_stats(
 async def update_fcm_token(
     fcm_token: str,
     current_user: User = Depends(get_current_user),
-    database_service: DatabaseService = Depends()
+    database_service: DatabaseService = Depends(get_database_service)
 ):
     try:
         # Update user document with FCM token
-        database_service.database.update_document(
+        await database_service.database.update_document(
             database_id=Settings.DATABASE_ID,
             collection_id='users',
             document_id=current_user.id,
@@ -157,6 +186,7 @@ async def update_fcm_token(
                 'fcm_token': fcm_token
             }
         )
+        invalidate_user(current_user.id)
         return {"message": "FCM token updated"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -168,18 +198,14 @@ class CalorieGoalUpdate(BaseModel):
 async def set_calorie_goal(
     goal_data: CalorieGoalUpdate,
     current_user: User = Depends(get_current_user),
-    database_service: DatabaseService = Depends()
+    database_service: DatabaseService = Depends(get_database_service)
 ):
     try:
-        # Ensure 'calories_consumed_today' is initialized properly
-        updated_user = database_service.database.update_document(
-            database_id=settings.DATABASE_ID,
-            collection_id='6758085b003d85763089',  # users collection
-            document_id=current_user.id,
-            data={
-                'daily_calorie_goal': goal_data.daily_goal,
-                'calories_consumed_today': getattr(current_user, 'calories_consumed_today', 0)
-            }
+        # Only the goal is written; calories_consumed_today is a counter
+        # owned by the user update queue
+        await user_updates.update(
+            current_user.id,
+            lambda user: {'daily_calorie_goal': goal_data.daily_goal}
         )
         
         return {
@@ -199,11 +225,11 @@ async def set_calorie_goal(
 @router.get("/calorie-status")
 async def get_calorie_status(
     current_user: User = Depends(get_current_user),
-    database_service: DatabaseService = Depends()
+    database_service: DatabaseService = Depends(get_database_service)
 ):
     try:
         # Retrieve the user document
-        user = database_service.database.get_document(
+        user = await database_service.database.get_document(
             database_id=settings.DATABASE_ID,
             collection_id='6758085b003d85763089',
             document_id=current_user.id
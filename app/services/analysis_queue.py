@@ -0,0 +1,186 @@
+# app/services/analysis_queue.py
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+from fastapi import HTTPException
+from app.config import settings
+from app.services.meal_service import MealService
+from app.services.storage_service import StorageService
+from app.services.vision_service import VisionService
+from app.utils.job_queue import (
+    FAILED,
+    SUCCEEDED,
+    Job,
+    MemoryJobStore,
+    SQLiteJobStore,
+    TokenBucket
+)
+from app.utils.unit_of_work import unit_of_work
+
+logger = logging.getLogger(__name__)
+
+
+class AnalysisQueue:
+    """
+    In-process worker pool for meal analysis jobs.
+
+    The HTTP request only stores the image and enqueues a job; workers claim
+    queued jobs in batches, pass each through a token bucket so vision calls
+    are rate limited, then run the same vision + MealService pipeline as the
+    synchronous endpoint. Job state lives in a pluggable store (memory or
+    SQLite) so it can be polled or streamed.
+
+    A job still running after ANALYSIS_JOB_LEASE seconds is assumed lost
+    (its worker died) and is queued again, up to ANALYSIS_MAX_ATTEMPTS
+    attempts in all; workers look for such jobs whenever they are idle.
+    Errors from the store are logged and retried with backoff.
+    """
+
+    def __init__(self, store, workers: int, batch_size: int, rate_per_second: float):
+        self.store = store
+        self.workers = workers
+        self.batch_size = batch_size
+        self.rate_limiter = TokenBucket(rate_per_second, burst=batch_size)
+        self.vision_service = VisionService()
+        self.storage_service = StorageService()
+        self.meal_service = MealService()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._listeners: Dict[str, List[asyncio.Event]] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._last_requeue = 0.0
+
+    async def start(self) -> None:
+        self._wakeup = asyncio.Event()
+        try:
+            await self._requeue_expired()
+        except Exception as e:
+            logger.error(f"Error requeueing interrupted analysis jobs: {str(e)}")
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        logger.info(f"Analysis queue started with {self.workers} workers")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def enqueue(self, user_id: str, payload: Dict[str, Any]) -> Job:
+        job = Job(user_id=user_id, payload=payload)
+        await self.store.add(job)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        return await self.store.get(job_id)
+
+    async def wait_for_update(self, job_id: str, timeout: float) -> bool:
+        """Waits until the job changes state; returns False on timeout."""
+        event = asyncio.Event()
+        self._listeners.setdefault(job_id, []).append(event)
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            listeners = self._listeners.get(job_id, [])
+            if event in listeners:
+                listeners.remove(event)
+            if not listeners:
+                self._listeners.pop(job_id, None)
+
+    async def _save(self, job: Job) -> None:
+        await self.store.update(job)
+        for event in self._listeners.get(job.id, []):
+            event.set()
+
+    async def _requeue_expired(self) -> None:
+        # Shared by the workers; a pass per lease period is enough
+        if time.monotonic() - self._last_requeue < settings.ANALYSIS_JOB_LEASE / 2:
+            return
+        self._last_requeue = time.monotonic()
+        requeued = await self.store.requeue_running(
+            settings.ANALYSIS_JOB_LEASE,
+            settings.ANALYSIS_MAX_ATTEMPTS
+        )
+        if requeued:
+            logger.info(f"Requeued {requeued} interrupted analysis jobs")
+            self._wakeup.set()
+
+    async def _worker(self) -> None:
+        failures = 0
+        while True:
+            try:
+                # Clear before claiming, so a job enqueued after the claim still wakes us
+                self._wakeup.clear()
+                jobs = await self.store.claim(self.batch_size)
+                if not jobs:
+                    await self._requeue_expired()
+                    try:
+                        # Poll occasionally as well, in case another process enqueued
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=5)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                for job in jobs:
+                    await self._save(job)  # Notify listeners that it's running
+                results = await asyncio.gather(*(self._run(job) for job in jobs), return_exceptions=True)
+                for job, result in zip(jobs, results):
+                    if isinstance(result, Exception):
+                        # Left running; it is retried once its lease expires
+                        logger.error(f"Error saving analysis job {job.id}: {str(result)}")
+                failures = 0
+            except Exception as e:
+                failures += 1
+                logger.error(f"Analysis worker error: {str(e)}")
+                await asyncio.sleep(min(2 ** failures, 60))
+
+    async def _run(self, job: Job) -> None:
+        payload = job.payload
+        try:
+            with unit_of_work():
+                image_data = await self.storage_service.download_image(payload['file_id'])
+
+                await self.rate_limiter.acquire()
+                analysis = await self.vision_service.analyze_food(image_data, payload['content_type'])
+
+                food_log_data = await self.meal_service.log_meal(
+                    job.user_id,
+                    analysis,
+                    payload['file_url'],
+                    payload['visibility']
+                )
+
+            job.result = {
+                **food_log_data,
+                "macronutrients": analysis['macronutrients']
+            }
+            job.status = SUCCEEDED
+        except HTTPException as e:
+            job.status = FAILED
+            job.error = str(e.detail)
+        except Exception as e:
+            logger.error(f"Analysis job {job.id} failed: {str(e)}")
+            job.status = FAILED
+            job.error = str(e)
+        if job.status == FAILED:
+            # The image was stored at enqueue time; no log will reference it
+            await self.storage_service.release_upload(payload['file_id'], job.user_id)
+        await self._save(job)
+
+
+def build_analysis_queue() -> AnalysisQueue:
+    """Builds the queue configured by ANALYSIS_QUEUE_BACKEND ("memory" or "sqlite")."""
+    if settings.ANALYSIS_QUEUE_BACKEND == "sqlite":
+        store = SQLiteJobStore(settings.ANALYSIS_QUEUE_PATH, settings.ANALYSIS_JOB_TTL)
+    else:
+        store = MemoryJobStore(settings.ANALYSIS_JOB_TTL)
+    return AnalysisQueue(
+        store,
+        settings.ANALYSIS_WORKERS,
+        settings.ANALYSIS_BATCH_SIZE,
+        settings.ANALYSIS_RATE_PER_SECOND
+    )
@@ -1,10 +1,14 @@
 # app/services/database_service.py
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from fastapi import HTTPException
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from appwrite.services.databases import Databases
 from appwrite.query import Query
 from app.utils.appwrite_client import get_client
+from app.utils.appwrite_gateway import AsyncDatabases
+from app.utils.macronutrients import encode_macros
+from app.utils.pagination import keyset_queries, split_page
+from app.services.nutrition_service import NutritionService
 from app.config import settings
 from app.models.food_log import FoodLog
 from app.models.user import User
@@ -12,8 +16,9 @@ from app.models.user import User
 class DatabaseService:
     def __init__(self):
         self.client = get_client()
-        self.database = Databases(self.client)
+        self.database = AsyncDatabases(Databases(self.client))
         self.db_id = settings.DATABASE_ID
+        self.nutrition_service = NutritionService()
 
     async def create_user(self, user_data: Dict[str, Any]) -> Dict[str, Any]:
         """Creates a new user in the database"""
@@ -21,7 +26,7 @@ class DatabaseService:
             # Debug log
             print(f"Attempting to create user with data: {user_data}")
 
-            result = self.database.create_document(
+            result = await self.database.create_document(
                 database_id=self.db_id,
                 # Make sure this matches your Appwrite collection ID
                 collection_id='6758085b003d85763089',
@@ -51,7 +56,7 @@ class DatabaseService:
     async def get_user(self, user_id: str) -> Optional[Dict[str, Any]]:
         """Gets user by ID"""
         try:
-            return self.database.get_document(
+            return await self.database.get_document(
                 database_id=self.db_id,
                 collection_id='6758085b003d85763089',
                 document_id=user_id
@@ -59,6 +64,21 @@ class DatabaseService:
         except Exception:
             return None
 
+    async def update_user(self, user_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Updates fields on a user document"""
+        try:
+            return await self.database.update_document(
+                database_id=self.db_id,
+                collection_id='6758085b003d85763089',
+                document_id=user_id,
+                data=data
+            )
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Error updating user: {str(e)}"
+            )
+
     async def create_food_log(self, user_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Creates a new food log entry.
@@ -68,9 +88,7 @@ class DatabaseService:
                 "user_id": user_id,
                 "food_name": data["food_name"],
                 "calories": data["calories"],
-                "protein": data["macronutrients"]["protein"],
-                "carbs": data["macronutrients"]["carbs"],
-                "fats": data["macronutrients"]["fats"],
+                **encode_macros(data["macronutrients"]),
                 "image_url": data["image_url"],
                 "timestamp": datetime.now().isoformat(),
                 "visibility": data.get("visibility", "friends")
@@ -79,6 +97,7 @@ class DatabaseService:
             result = await self.database.create_document(
                 database_id=self.db_id,
                 collection_id='675928700015cab990d9',
+                document_id='unique()',
                 data=log_data
             )
 
@@ -94,24 +113,36 @@ class DatabaseService:
         self,
         user_id: str,
         limit: int = 10,
+        cursor: Optional[str] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
         offset: int = 0
-    ) -> List[Dict[str, Any]]:
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
         """
-        Gets food logs for a specific user.
+        Gets a page of food logs for a specific user, newest first, and the
+        cursor of the next page (None on the last page). `offset` is only
+        kept for older clients; pass the returned cursor instead.
+        Raises ValueError on a malformed cursor.
         """
+        queries = [
+            Query.equal('user_id', user_id),
+            *keyset_queries(limit, cursor)
+        ]
+        if offset and not cursor:
+            queries.append(Query.offset(offset))
+        if date_from:
+            queries.append(Query.greater_than('timestamp', date_from.isoformat()))
+        if date_to:
+            queries.append(Query.less_than('timestamp', date_to.isoformat()))
+
         try:
             result = await self.database.list_documents(
                 database_id=self.db_id,
                 collection_id='675928700015cab990d9',
-                queries=[
-                    Query.equal('user_id', user_id),
-                    Query.orderDesc('timestamp'),
-                    Query.limit(limit),
-                    Query.offset(offset)
-                ]
+                queries=queries
             )
 
-            return result['documents']
+            return split_page(result['documents'], limit)
 
         except Exception as e:
             raise HTTPException(
@@ -205,32 +236,38 @@ class DatabaseService:
         days: int = 7
     ) -> Dict[str, Any]:
         """
-        Gets nutrition summary for specified days.
+        Gets nutrition summary for the last `days` days (including today, UTC)
+        from the daily rollups: one range query returning at most `days`
+        small documents, however many meals were logged.
         """
         try:
-            from_date = (datetime.now() - timedelta(days=days)).isoformat()
-
-            logs = await self.database.list_documents(
-                database_id=self.db_id,
-                collection_id='675928700015cab990d9',
-                queries=[
-                    Query.equal('user_id', user_id),
-                    Query.greaterThan('timestamp', from_date)
-                ]
-            )
+            end = datetime.now(timezone.utc).date()
+            start = end - timedelta(days=days - 1)
+            rollups = await self.nutrition_service.get_daily_totals(user_id, start, end)
 
             # Calculate averages
-            total_calories = sum(log['calories'] for log in logs['documents'])
-            total_protein = sum(log['protein'] for log in logs['documents'])
-            total_carbs = sum(log['carbs'] for log in logs['documents'])
-            total_fats = sum(log['fats'] for log in logs['documents'])
+            total_calories = sum(day['calories'] for day in rollups)
+            total_protein = sum(day['protein'] for day in rollups)
+            total_carbs = sum(day['carbs'] for day in rollups)
+            total_fats = sum(day['fats'] for day in rollups)
 
             return {
                 "avg_daily_calories": total_calories / days,
                 "avg_daily_protein": total_protein / days,
                 "avg_daily_carbs": total_carbs / days,
                 "avg_daily_fats": total_fats / days,
-                "total_logs": len(logs['documents'])
+                "total_logs": sum(day['log_count'] for day in rollups),
+                "days": [
+                    {
+                        "date": day['date'],
+                        "calories": day['calories'],
+                        "protein": day['protein'],
+                        "carbs": day['carbs'],
+                        "fats": day['fats'],
+                        "log_count": day['log_count']
+                    }
+                    for day in rollups
+                ]
             }
 
         except Exception as e:
@@ -1,10 +1,14 @@
-from typing import Dict, List, Optional, Any
+import asyncio
+from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime, timezone, timedelta
 from fastapi import HTTPException
 from appwrite.services.databases import Databases
 from appwrite.query import Query
 from app.utils.appwrite_client import get_client
+from app.utils.appwrite_gateway import AsyncDatabases
+from app.utils.macronutrients import decode_macros
 from app.config import settings
+from app.utils.user_updates import user_updates
 from app.models.user import User
 
 # Achievement definitions
@@ -44,7 +48,7 @@ ACHIEVEMENTS = {
 class GamificationService:
     def __init__(self):
         self.client = get_client()
-        self.database = Databases(self.client)
+        self.database = AsyncDatabases(Databases(self.client))
         self.db_id = settings.DATABASE_ID
         self.users_collection = "6758085b003d85763089"
         self.food_logs_collection = "675928700015cab990d9"
@@ -53,90 +57,141 @@ class GamificationService:
     async def check_achievements(self, user_id: str) -> List[Dict[str, Any]]:
         """Check and award new achievements"""
         try:
-            user = self.database.get_document(
-                database_id=self.db_id,
-                collection_id=self.users_collection,
-                document_id=user_id
-            )
-            
-            new_achievements = []
-            
-            # Streak based achievements
-            if user['highest_streak'] >= 7:
-                new_achievements.append('WEEK_WARRIOR')
-            if user['highest_streak'] >= 30:
-                new_achievements.append('MONTH_MASTER')
-                
-            # Log count achievements
-            logs = self.database.list_documents(
-                database_id=self.db_id,
-                collection_id=self.food_logs_collection,
-                queries=[Query.equal('user_id', user_id)]
-            )
-            
-            if logs['total'] >= 100:
-                new_achievements.append('CENTURY_LOGGER')
-            
-            # Protein tracking achievement
-            if self._check_protein_streak(user_id):
-                new_achievements.append('PROTEIN_CHAMPION')
-            
-            # Social achievement
-            if self._check_social_achievement(user_id):
-                new_achievements.append('SOCIAL_BUTTERFLY')
-            
-            # Award new achievements
-            current_achievements = set(user.get('achievements', []))
-            new_achievements = set(new_achievements) - current_achievements
-            
-            if new_achievements:
-                total_points = sum(ACHIEVEMENTS[ach]['points'] for ach in new_achievements)
-                self.database.update_document(
+            user, signals = await asyncio.gather(
+                self.database.get_document(
                     database_id=self.db_id,
                     collection_id=self.users_collection,
-                    document_id=user_id,
-                    data={
-                        'achievements': list(current_achievements | new_achievements),
-                        'total_points': user.get('total_points', 0) + total_points
-                    }
-                )
-            
-            return [ACHIEVEMENTS[ach] for ach in new_achievements]
-            
+                    document_id=user_id
+                ),
+                self.gather_achievement_signals(user_id)
+            )
+
+            new_achievements: List[Dict[str, Any]] = []
+
+            def award(latest: Dict[str, Any]) -> Dict[str, Any]:
+                nonlocal new_achievements
+                new_achievements, updates = self.evaluate_achievements(latest, *signals)
+                return updates
+
+            await user_updates.update(user_id, award, current=user)
+            return new_achievements
+
         except Exception as e:
             print(f"Achievement error: {str(e)}")
             raise HTTPException(status_code=500, detail=str(e))
 
-    def _check_protein_streak(self, user_id: str) -> bool:
+    async def gather_achievement_signals(self, user_id: str) -> Tuple[int, bool, bool]:
+        """
+        Runs the independent achievement queries concurrently.
+        Returns (total_logs, high_protein_week, social_butterfly).
+        """
+        (total_logs, high_protein_week), social_butterfly = await asyncio.gather(
+            self.gather_log_signals(user_id),
+            self.check_social_achievement(user_id)
+        )
+        return total_logs, high_protein_week, social_butterfly
+
+    async def gather_log_signals(self, user_id: str) -> Tuple[int, bool]:
+        """
+        Runs the achievement queries that depend on the user's food logs.
+        Returns (total_logs, high_protein_week).
+        """
+        total_logs, high_protein_week = await asyncio.gather(
+            self._count_logs(user_id),
+            self._check_protein_streak(user_id)
+        )
+        return total_logs, high_protein_week
+
+    def evaluate_achievements(
+        self,
+        user: Dict[str, Any],
+        total_logs: int,
+        high_protein_week: bool,
+        social_butterfly: bool
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Decides which achievements a user has newly earned.
+        Returns the achievement definitions and the user fields to write
+        (empty if nothing changed); does not touch the database.
+        """
+        earned = []
+
+        # Streak based achievements
+        if user.get('highest_streak', 0) >= 7:
+            earned.append('WEEK_WARRIOR')
+        if user.get('highest_streak', 0) >= 30:
+            earned.append('MONTH_MASTER')
+
+        # Log count achievements
+        if total_logs >= 100:
+            earned.append('CENTURY_LOGGER')
+
+        # Protein tracking achievement
+        if high_protein_week:
+            earned.append('PROTEIN_CHAMPION')
+
+        # Social achievement
+        if social_butterfly:
+            earned.append('SOCIAL_BUTTERFLY')
+
+        current_achievements = set(user.get('achievements', []))
+        new_achievements = set(earned) - current_achievements
+
+        if not new_achievements:
+            return [], {}
+
+        total_points = sum(ACHIEVEMENTS[ach]['points'] for ach in new_achievements)
+        updates = {
+            'achievements': list(current_achievements | new_achievements),
+            'total_points': (user.get('total_points') or 0) + total_points
+        }
+        return [ACHIEVEMENTS[ach] for ach in new_achievements], updates
+
+    async def _count_logs(self, user_id: str) -> int:
+        """Counts a user's food logs (only the total is needed, not the rows)"""
+        logs = await self.database.list_documents(
+            database_id=self.db_id,
+            collection_id=self.food_logs_collection,
+            queries=[Query.equal('user_id', user_id), Query.limit(1)]
+        )
+        return logs['total']
+
+    async def _check_protein_streak(self, user_id: str) -> bool:
         """Check if user maintained high protein intake"""
         try:
             week_ago = (datetime.now(timezone.utc) - timedelta(days=7)).isoformat()
-            logs = self.database.list_documents(
-                database_id=self.db_id,
-                collection_id=self.food_logs_collection,
-                queries=[
-                    Query.equal('user_id', user_id),
-                    Query.greater_than('timestamp', week_ago)  # Changed from greaterThan to greater
-                ]
-            )
-            
-            if len(logs['documents']) < 7:
+            week = [
+                Query.equal('user_id', user_id),
+                Query.greater_than('timestamp', week_ago)
+            ]
+            # Count the week's logs and its low protein logs upstream; only
+            # logs still on the legacy JSON macros are decoded here
+            logs, low_protein, legacy = await asyncio.gather(*(
+                self.database.list_documents(
+                    database_id=self.db_id,
+                    collection_id=self.food_logs_collection,
+                    queries=[*week, *queries]
+                )
+                for queries in (
+                    [Query.limit(1)],
+                    [Query.less_than('protein', 50), Query.limit(1)],
+                    [Query.is_null('protein'), Query.limit(100)]
+                )
+            ))
+
+            if logs['total'] < 7 or low_protein['total'] > 0:
                 return False
-            
-            # Check protein in macronutrients
-            return all(
-                log.get('macronutrients', {}).get('protein', 0) >= 50 
-                for log in logs['documents']
-            )
+
+            return all(decode_macros(log)['protein'] >= 50 for log in legacy['documents'])
             
         except Exception as e:
             print(f"Protein check error: {str(e)}")
             return False
 
-    def _check_social_achievement(self, user_id: str) -> bool:
+    async def check_social_achievement(self, user_id: str) -> bool:
         """Check if user has enough friends"""
         try:
-            friends = self.database.list_documents(
+            friends = await self.database.list_documents(
                 database_id=self.db_id,
                 collection_id=self.friends_collection,
                 queries=[Query.equal('user_id', user_id)]
@@ -158,23 +213,10 @@ class GamificationService:
         }
         
         try:
-            user = self.database.get_document(
-                database_id=self.db_id,
-                collection_id=self.users_collection,
-                document_id=user_id
-            )
-            
             points = points_map.get(action, 0)
             
             if points > 0:
-                self.database.update_document(
-                    database_id=self.db_id,
-                    collection_id=self.users_collection,
-                    document_id=user_id,
-                    data={
-                        'total_points': user.get('total_points', 0) + points
-                    }
-                )
+                await user_updates.increment(user_id, {'total_points': points})
             
             return points
             
@@ -184,7 +226,7 @@ class GamificationService:
 
     async def get_leaderboard(self, limit: int = 10) -> List[Dict[str, Any]]:
         try:
-            users = self.database.list_documents(
+            users = await self.database.list_documents(
                 database_id=self.db_id,
                 collection_id=self.users_collection,
                 queries=[
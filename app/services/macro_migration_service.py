@@ -0,0 +1,75 @@
+# app/services/macro_migration_service.py
+import asyncio
+import logging
+from functools import partial
+from typing import Any, Dict
+from appwrite.query import Query
+from appwrite.services.databases import Databases
+from app.config import settings
+from app.utils.appwrite_client import get_client
+from app.utils.appwrite_gateway import AsyncDatabases
+from app.utils.macronutrients import MACRONUTRIENTS, decode_macros
+from app.utils.pagination import iter_pages
+
+logger = logging.getLogger(__name__)
+
+
+class MacroMigrationService:
+    """
+    Rewrites food logs that still store macros as the legacy
+    `macronutrients` JSON string to the numeric protein/carbs/fats
+    attributes, a page at a time with bounded concurrency, and clears the
+    JSON string.
+
+    Only logs with no `protein` value are read, so an interrupted migration
+    simply continues where it stopped when run again.
+    """
+
+    def __init__(self):
+        self.client = get_client()
+        self.database = AsyncDatabases(Databases(self.client))
+        self.db_id = settings.DATABASE_ID
+        self.food_logs_collection = '675928700015cab990d9'
+
+    async def migrate(self) -> int:
+        """Migrates every legacy food log and returns how many were rewritten."""
+        semaphore = asyncio.Semaphore(settings.MACRO_MIGRATION_CONCURRENCY)
+        list_page = partial(
+            self.database.list_documents,
+            database_id=self.db_id,
+            collection_id=self.food_logs_collection
+        )
+        migrated = 0
+        async for logs, _ in iter_pages(
+            list_page,
+            'documents',
+            settings.MACRO_MIGRATION_PAGE_SIZE,
+            queries=[Query.is_null('protein')]
+        ):
+            await asyncio.gather(*(self._migrate_log(log, semaphore) for log in logs))
+            migrated += len(logs)
+        return migrated
+
+    async def _migrate_log(self, log: Dict[str, Any], semaphore: asyncio.Semaphore) -> None:
+        try:
+            macros = decode_macros(log)
+        except ValueError:
+            logger.warning(f"Food log {log['$id']} has malformed macronutrients; storing zeros")
+            macros = dict.fromkeys(MACRONUTRIENTS, 0.0)
+
+        async with semaphore:
+            await self.database.update_document(
+                database_id=self.db_id,
+                collection_id=self.food_logs_collection,
+                document_id=log['$id'],
+                data={**macros, "macronutrients": None}
+            )
+
+
+async def migrate_food_log_macros() -> None:
+    """Scheduled entry point."""
+    try:
+        migrated = await MacroMigrationService().migrate()
+        logger.info(f"Migrated macronutrients of {migrated} food logs")
+    except Exception as e:
+        logger.error(f"Error in migrate_food_log_macros: {str(e)}")
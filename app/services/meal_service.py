@@ -0,0 +1,189 @@
+# app/services/meal_service.py
+import asyncio
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple
+from fastapi import HTTPException
+from appwrite.services.databases import Databases
+from app.utils.appwrite_client import get_client
+from app.utils.appwrite_gateway import AsyncDatabases
+from app.services.streak_service import StreakService
+from app.services.gamification_service import GamificationService
+from app.services.nutrition_service import NutritionService
+from app.utils.macronutrients import encode_macros
+from app.utils.search_index import food_search_index
+from app.utils.user_updates import user_updates
+from app.config import settings
+
+
+class MealService:
+    """
+    Persists an analyzed meal and applies its side effects to the user
+    (streak, achievements, points, calories, daily nutrition rollup).
+
+    The steps run as a small dependency graph:
+
+        create log ──┬─> count logs ──────┐
+                     ├─> protein check ───┤
+                     └─> daily rollup     │
+        read user ─────────────────────────┼─> evaluate ─> single user write
+        social check ──────────────────────┘
+
+    so every independent round-trip overlaps and the user document is
+    written exactly once.
+    """
+
+    def __init__(self):
+        self.client = get_client()
+        self.database = AsyncDatabases(Databases(self.client))
+        self.db_id = settings.DATABASE_ID
+        self.users_collection = '6758085b003d85763089'
+        self.food_logs_collection = '675928700015cab990d9'
+        self.streak_service = StreakService()
+        self.gamification_service = GamificationService()
+        self.nutrition_service = NutritionService()
+
+    async def log_meal(
+        self,
+        user_id: str,
+        analysis: Dict[str, Any],
+        image_url: str,
+        visibility: str
+    ) -> Dict[str, Any]:
+        """
+        Creates the food log and updates the user in one coalesced write.
+        Returns the stored log data plus the newly earned achievements.
+        """
+        food_logs, new_achievements = await self.log_meals(
+            user_id,
+            [(analysis, image_url)],
+            visibility
+        )
+        return {
+            **food_logs[0],
+            "new_achievements": new_achievements
+        }
+
+    async def log_meals(
+        self,
+        user_id: str,
+        meals: List[Tuple[Dict[str, Any], str]],
+        visibility: str
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Creates a food log per (analysis, image_url) pair concurrently, then
+        evaluates streak and achievements once for the whole batch and
+        updates the user in one coalesced write.
+        Returns the stored log data and the newly earned achievements.
+        """
+        if any(analysis['calories'] is None for analysis, _ in meals):
+            raise HTTPException(status_code=500, detail="Calories analysis returned None.")
+
+        try:
+            food_logs = [
+                self._build_log(user_id, analysis, image_url, visibility)
+                for analysis, image_url in meals
+            ]
+
+            async def create_logs_then_check():
+                await self._create_logs(food_logs)
+                food_search_index.add_logs(user_id, food_logs)
+                # These queries must see the logs we just wrote
+                signals, _ = await asyncio.gather(
+                    self.gamification_service.gather_log_signals(user_id),
+                    self.nutrition_service.add_logs(user_id, food_logs)
+                )
+                return signals
+
+            (total_logs, high_protein_week), user, social_butterfly = await asyncio.gather(
+                create_logs_then_check(),
+                self.database.get_document(
+                    database_id=self.db_id,
+                    collection_id=self.users_collection,
+                    document_id=user_id
+                ),
+                self.gamification_service.check_social_achievement(user_id)
+            )
+
+            # Coalesce streak, achievements/points and calories into one
+            # write, recomputed from the latest user if another write wins
+            calories = sum(int(analysis['calories']) for analysis, _ in meals)
+            new_achievements: List[Dict[str, Any]] = []
+
+            def apply_meals(latest: Dict[str, Any]) -> Dict[str, Any]:
+                nonlocal new_achievements
+                updates = self.streak_service.compute_streak_update(latest)
+                new_achievements, achievement_updates = self.gamification_service.evaluate_achievements(
+                    {**latest, **updates},
+                    total_logs,
+                    high_protein_week,
+                    social_butterfly
+                )
+                updates.update(achievement_updates)
+                # Handle missing or None value for 'calories_consumed_today'
+                updates['calories_consumed_today'] = int(latest.get('calories_consumed_today') or 0) + calories
+                return updates
+
+            await user_updates.update(user_id, apply_meals, current=user)
+
+            return food_logs, new_achievements
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            print(f"Meal logging error: {str(e)}")
+            raise HTTPException(status_code=500, detail=str(e))
+
+    async def _create_logs(self, food_logs: List[Dict[str, Any]]) -> None:
+        """
+        Creates the logs concurrently, all or none: if any create fails the
+        ones that succeeded are deleted again, so a retried request doesn't
+        leave duplicates behind.
+        """
+        results = await asyncio.gather(*(
+            self.database.create_document(
+                database_id=self.db_id,
+                collection_id=self.food_logs_collection,
+                document_id=food_log_data['id'],
+                data=food_log_data
+            )
+            for food_log_data in food_logs
+        ), return_exceptions=True)
+
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if not errors:
+            return
+
+        rollback = await asyncio.gather(*(
+            self.database.delete_document(
+                database_id=self.db_id,
+                collection_id=self.food_logs_collection,
+                document_id=food_log_data['id']
+            )
+            for food_log_data, result in zip(food_logs, results)
+            if not isinstance(result, BaseException)
+        ), return_exceptions=True)
+        for failure in rollback:
+            if isinstance(failure, BaseException):
+                print(f"Error rolling back food log: {str(failure)}")
+        raise errors[0]
+
+    def _build_log(
+        self,
+        user_id: str,
+        analysis: Dict[str, Any],
+        image_url: str,
+        visibility: str
+    ) -> Dict[str, Any]:
+        return {
+            "id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "food_name": analysis['food_name'],
+            "portion_size": float(analysis['portion_size']),
+            "calories": float(analysis['calories']),
+            **encode_macros(analysis['macronutrients']),
+            "image_url": image_url,
+            "visibility": visibility,
+            "reactions": [],
+            "timestamp": datetime.now(timezone.utc).isoformat()
+        }
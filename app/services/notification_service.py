@@ -7,6 +7,7 @@ from appwrite.services.databases import Databases
 from appwrite.query import Query
 from firebase_admin import messaging, initialize_app, credentials, get_app
 from app.utils.appwrite_client import get_client
+from app.utils.appwrite_gateway import AsyncDatabases
 from app.config import settings
 from app.models.user import User
 
@@ -21,7 +22,7 @@ except ValueError:
 class NotificationService:
     def __init__(self):
         self.client = get_client()
-        self.database = Databases(self.client)
+        self.database = AsyncDatabases(Databases(self.client))
         self.db_id = settings.DATABASE_ID
         self.users_collection = '6758085b003d85763089'
 
@@ -70,7 +71,7 @@ class NotificationService:
         """Notify user about friend's activity"""
         try:
             # Get friend's info
-            friend = self.database.get_document(
+            friend = await self.database.get_document(
                 database_id=self.db_id,
                 collection_id=self.users_collection,
                 document_id=friend_id
@@ -89,7 +90,7 @@ class NotificationService:
         """Send push notification via Firebase"""
         try:
             # Get user's FCM token
-            user = self.database.get_document(
+            user = await self.database.get_document(
                 database_id=self.db_id,
                 collection_id=self.users_collection,
                 document_id=user_id
@@ -124,7 +125,7 @@ class NotificationService:
             response = messaging.send(message)
             
             # Log notification
-            self.database.create_document(
+            await self.database.create_document(
                 database_id=self.db_id,
                 collection_id='notifications',
                 document_id=str(uuid.uuid4()),
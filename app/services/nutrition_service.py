@@ -0,0 +1,197 @@
+# app/services/nutrition_service.py
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from functools import partial
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from appwrite.query import Query
+from appwrite.services.databases import Databases
+from app.config import settings
+from app.utils.appwrite_client import get_client
+from app.utils.appwrite_gateway import AsyncDatabases
+from app.utils.document_updates import DocumentUpdateQueue
+from app.utils.macronutrients import decode_macros
+from app.utils.nutrition_analytics import build_columns, compute_analytics
+from app.utils.pagination import iter_pages
+
+logger = logging.getLogger(__name__)
+
+TOTAL_FIELDS = ('calories', 'protein', 'carbs', 'fats', 'log_count')
+
+
+def rollup_id(user_id: str, day: date) -> str:
+    """Document ID of a user's rollup for one (UTC) day."""
+    return f"{user_id}_{day.strftime('%Y%m%d')}"
+
+
+def log_totals(log: Dict[str, Any]) -> Dict[str, float]:
+    """A food log's contribution to its day's rollup."""
+    return {
+        "calories": float(log['calories'] or 0),
+        **decode_macros(log),
+        "log_count": 1
+    }
+
+
+def log_day(log: Dict[str, Any]) -> date:
+    return datetime.fromisoformat(log['timestamp']).astimezone(timezone.utc).date()
+
+
+rollup_updates = DocumentUpdateQueue(settings.NUTRITION_ROLLUP_COLLECTION_ID)
+
+
+class NutritionService:
+    """
+    Maintains one rollup document per user per UTC day in the collection
+    NUTRITION_ROLLUP_COLLECTION_ID (attributes: user_id, date, calories,
+    protein, carbs, fats, log_count, revision), so summaries read at most one small
+    document per day instead of every food log in the window.
+
+    Rollups are incremented as logs are written, through a
+    DocumentUpdateQueue, and can be rebuilt from the food logs with
+    backfill().
+    """
+
+    def __init__(self):
+        self.client = get_client()
+        self.database = AsyncDatabases(Databases(self.client))
+        self.db_id = settings.DATABASE_ID
+        self.rollups_collection = settings.NUTRITION_ROLLUP_COLLECTION_ID
+        self.food_logs_collection = '675928700015cab990d9'
+
+    async def add_logs(self, user_id: str, logs: Iterable[Dict[str, Any]]) -> None:
+        """Adds newly written food logs to their days' rollups."""
+        by_day: Dict[date, Dict[str, float]] = defaultdict(lambda: dict.fromkeys(TOTAL_FIELDS, 0))
+        for log in logs:
+            for field, value in log_totals(log).items():
+                by_day[log_day(log)][field] += value
+
+        # Serialized per rollup (and claimed per revision across workers), so
+        # concurrent logs for the same day don't lose each other's totals
+        await asyncio.gather(*(
+            rollup_updates.increment(
+                rollup_id(user_id, day),
+                totals,
+                initial={"user_id": user_id, "date": day.isoformat()}
+            )
+            for day, totals in by_day.items()
+        ))
+
+    async def _overwrite(self, user_id: str, day: date, totals: Dict[str, float]) -> None:
+        data = {
+            "calories": float(totals['calories']),
+            "protein": float(totals['protein']),
+            "carbs": float(totals['carbs']),
+            "fats": float(totals['fats']),
+            "log_count": int(totals['log_count'])
+        }
+        await rollup_updates.update(
+            rollup_id(user_id, day),
+            lambda rollup: data,
+            initial={"user_id": user_id, "date": day.isoformat()}
+        )
+
+    async def get_daily_totals(self, user_id: str, start: date, end: date) -> List[Dict[str, Any]]:
+        """Rollups for start..end inclusive, oldest first, in one range query. Days without logs are absent."""
+        result = await self.database.list_documents(
+            database_id=self.db_id,
+            collection_id=self.rollups_collection,
+            queries=[
+                Query.equal('user_id', user_id),
+                Query.greater_than_equal('date', start.isoformat()),
+                Query.less_than_equal('date', end.isoformat()),
+                Query.order_asc('date'),
+                Query.limit((end - start).days + 1)
+            ]
+        )
+        return result['documents']
+
+    async def get_analytics(
+        self,
+        user_id: str,
+        days: int,
+        rolling_window: int,
+        percentiles: List[float],
+        calorie_goal: Optional[float] = None,
+        include_daily: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Trends over the last `days` days (including today, UTC), computed
+        from the user's food logs with vectorized column operations.
+        """
+        end = datetime.now(timezone.utc).date()
+        start = end - timedelta(days=days - 1)
+
+        timestamps, calories, protein, carbs, fats = [], [], [], [], []
+        list_page = partial(
+            self.database.list_documents,
+            database_id=self.db_id,
+            collection_id=self.food_logs_collection
+        )
+        async for logs, _ in iter_pages(
+            list_page,
+            'documents',
+            settings.ANALYTICS_PAGE_SIZE,
+            queries=[
+                Query.equal('user_id', user_id),
+                Query.greater_than_equal('timestamp', start.isoformat())
+            ]
+        ):
+            for log in logs:
+                totals = log_totals(log)
+                timestamps.append(log['timestamp'])
+                calories.append(totals['calories'])
+                protein.append(totals['protein'])
+                carbs.append(totals['carbs'])
+                fats.append(totals['fats'])
+
+        columns = build_columns(timestamps, calories, protein, carbs, fats)
+        return compute_analytics(
+            columns,
+            end_day=(end - date(1970, 1, 1)).days,
+            n_days=days,
+            rolling_window=rolling_window,
+            percentiles=percentiles,
+            calorie_goal=calorie_goal,
+            goal_tolerance=settings.ANALYTICS_GOAL_TOLERANCE,
+            include_daily=include_daily
+        )
+
+    async def backfill(self, user_id: Optional[str] = None) -> int:
+        """
+        Rebuilds rollups from the food logs of one user, or of everyone, and
+        returns how many day documents were written. Existing rollups for
+        those days are overwritten, so it is safe to re-run.
+        """
+        queries = [Query.equal('user_id', user_id)] if user_id else []
+        totals: Dict[Tuple[str, date], Dict[str, float]] = defaultdict(
+            lambda: dict.fromkeys(TOTAL_FIELDS, 0)
+        )
+        list_page = partial(
+            self.database.list_documents,
+            database_id=self.db_id,
+            collection_id=self.food_logs_collection
+        )
+        async for logs, _ in iter_pages(list_page, 'documents', 100, queries=queries):
+            for log in logs:
+                for field, value in log_totals(log).items():
+                    totals[(log['user_id'], log_day(log))][field] += value
+
+        semaphore = asyncio.Semaphore(settings.NUTRITION_BACKFILL_CONCURRENCY)
+
+        async def overwrite(key: Tuple[str, date], day_totals: Dict[str, float]) -> None:
+            async with semaphore:
+                await self._overwrite(*key, day_totals)
+
+        await asyncio.gather(*(overwrite(key, day_totals) for key, day_totals in totals.items()))
+        return len(totals)
+
+
+async def backfill_nutrition_rollups() -> None:
+    """Scheduled entry point."""
+    try:
+        written = await NutritionService().backfill()
+        logger.info(f"Backfilled {written} daily nutrition rollups")
+    except Exception as e:
+        logger.error(f"Error in backfill_nutrition_rollups: {str(e)}")
@@ -0,0 +1,186 @@
+# app/services/portability_service.py
+import asyncio
+import codecs
+import csv
+import uuid
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Any, AsyncIterator, BinaryIO, Dict, List, Optional
+import anyio
+from appwrite.exception import AppwriteException
+from appwrite.query import Query
+from appwrite.services.databases import Databases
+from app.config import settings
+from app.models.food_log import FoodLogImport
+from app.services.nutrition_service import NutritionService
+from app.utils.appwrite_client import get_client
+from app.utils.appwrite_gateway import AsyncDatabases
+from app.utils.food_log_io import csv_chunk, export_row, iter_import_records, ndjson_chunk
+from app.utils.macronutrients import encode_macros
+from app.utils.pagination import keyset_queries, split_page
+from app.utils.search_index import food_search_index
+
+# Imported logs get IDs derived from the user and the record's own ID, so
+# re-running an import skips the rows that were already written.
+IMPORT_NAMESPACE = uuid.UUID('6f1c2a55-3e0b-4d8e-9a57-0c1f4b7d2e93')
+
+
+class PortabilityService:
+    """
+    Bulk export and import of a user's food logs.
+
+    Exports stream newest first over keyset pages (EXPORT_PAGE_SIZE logs
+    each), fetching the next page while the current one is being sent, so
+    memory stays constant however long the history is. Imports are parsed
+    and validated lazily and written IMPORT_BATCH_SIZE records at a time,
+    at most IMPORT_CONCURRENCY writes in flight; each batch is then added to
+    the daily nutrition rollups and the search index.
+
+    Imported logs are history: they don't affect streaks, points or
+    achievements.
+    """
+
+    def __init__(self):
+        self.client = get_client()
+        self.database = AsyncDatabases(Databases(self.client))
+        self.db_id = settings.DATABASE_ID
+        self.food_logs_collection = '675928700015cab990d9'
+        self.nutrition_service = NutritionService()
+
+    async def _list_page(
+        self,
+        user_id: str,
+        cursor: Optional[str],
+        date_from: Optional[datetime],
+        date_to: Optional[datetime]
+    ) -> Dict[str, Any]:
+        queries = [
+            Query.equal('user_id', user_id),
+            *keyset_queries(settings.EXPORT_PAGE_SIZE, cursor)
+        ]
+        if date_from:
+            queries.append(Query.greater_than_equal('timestamp', date_from.isoformat()))
+        if date_to:
+            queries.append(Query.less_than('timestamp', date_to.isoformat()))
+        return await self.database.list_documents(
+            database_id=self.db_id,
+            collection_id=self.food_logs_collection,
+            queries=queries
+        )
+
+    async def export_logs(
+        self,
+        user_id: str,
+        fmt: str,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None
+    ) -> AsyncIterator[str]:
+        """Yields the user's food logs as NDJSON or CSV text, one chunk per page."""
+        header = fmt == 'csv'
+        page = asyncio.create_task(self._list_page(user_id, None, date_from, date_to))
+        try:
+            while page is not None:
+                documents, cursor = split_page((await page)['documents'], settings.EXPORT_PAGE_SIZE)
+                page = None
+                if cursor:
+                    # Overlap the next upstream read with sending this page
+                    page = asyncio.create_task(self._list_page(user_id, cursor, date_from, date_to))
+
+                rows = [export_row(document) for document in documents]
+                if fmt == 'csv':
+                    chunk = csv_chunk(rows, header=header)
+                    header = False
+                else:
+                    chunk = ndjson_chunk(rows)
+                if chunk:
+                    yield chunk
+        finally:
+            if page is not None:
+                page.cancel()  # Client went away mid-export
+
+    async def import_logs(self, user_id: str, file: BinaryIO, fmt: str) -> Dict[str, Any]:
+        """
+        Imports NDJSON or CSV food log records (the export format) for a
+        user. Invalid records and records that fail to write are reported
+        and skipped; records imported before are skipped as duplicates.
+        """
+        # Decode lazily; uploads are SpooledTemporaryFiles, which TextIOWrapper can't wrap on Python 3.9
+        records = iter_import_records(codecs.iterdecode(file, 'utf-8-sig'), fmt)
+        semaphore = asyncio.Semaphore(settings.IMPORT_CONCURRENCY)
+        report: Dict[str, Any] = {"imported": 0, "duplicates": 0, "invalid": 0, "failed": 0, "errors": []}
+
+        def report_error(line: Optional[int], error: str, count: str = "invalid") -> None:
+            report[count] += 1
+            if len(report["errors"]) < settings.IMPORT_MAX_REPORTED_ERRORS:
+                report["errors"].append({"line": line, "error": error})
+
+        async def create(log: Dict[str, Any]) -> bool:
+            async with semaphore:
+                try:
+                    await self.database.create_document(
+                        database_id=self.db_id,
+                        collection_id=self.food_logs_collection,
+                        document_id=log['id'],
+                        data=log
+                    )
+                    return True
+                except AppwriteException as e:
+                    if e.code != 409:
+                        raise
+                    return False
+
+        while True:
+            # Parsing and validation read the upload file, so they run off the event loop
+            try:
+                batch = await anyio.to_thread.run_sync(
+                    lambda: list(islice(records, settings.IMPORT_BATCH_SIZE))
+                )
+            except (UnicodeDecodeError, csv.Error) as e:
+                report_error(None, f"Unreadable file, import stopped: {str(e)}")
+                break
+            if not batch:
+                break
+
+            lines: List[int] = []
+            logs: List[Dict[str, Any]] = []
+            for record in batch:
+                if 'error' in record:
+                    report_error(record['line'], record['error'])
+                else:
+                    lines.append(record['line'])
+                    logs.append(self._build_log(user_id, record['log']))
+
+            # One failed write mustn't keep the rest of the batch out of the rollups
+            results = await asyncio.gather(*(create(log) for log in logs), return_exceptions=True)
+            new_logs = []
+            for line, log, result in zip(lines, logs, results):
+                if isinstance(result, BaseException):
+                    report_error(line, f"Could not be saved: {str(result)}", count="failed")
+                elif result:
+                    new_logs.append(log)
+                else:
+                    report["duplicates"] += 1
+            report["imported"] += len(new_logs)
+
+            if new_logs:
+                await self.nutrition_service.add_logs(user_id, new_logs)
+                food_search_index.add_logs(user_id, new_logs)
+
+        return report
+
+    def _build_log(self, user_id: str, record: FoodLogImport) -> Dict[str, Any]:
+        timestamp = record.timestamp
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+        return {
+            "id": str(uuid.uuid5(IMPORT_NAMESPACE, f"{user_id}:{record.id}")) if record.id else str(uuid.uuid4()),
+            "user_id": user_id,
+            "food_name": record.food_name,
+            "portion_size": record.portion_size,
+            "calories": record.calories,
+            **encode_macros(record.macronutrients),
+            "image_url": record.image_url,
+            "visibility": record.visibility,
+            "reactions": [],
+            "timestamp": timestamp.astimezone(timezone.utc).isoformat()
+        }
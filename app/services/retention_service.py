@@ -0,0 +1,190 @@
+# app/services/retention_service.py
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from typing import Any, Dict, List, Optional, Set
+from appwrite.exception import AppwriteException
+from appwrite.services.databases import Databases
+from app.config import settings
+from app.services.storage_service import StorageService
+from app.utils.appwrite_client import get_client
+from app.utils.appwrite_gateway import AsyncDatabases
+from app.utils.image_processing import thumbnail_sizes
+from app.utils.pagination import iter_pages
+from app.utils.storage_index import variant_file_id
+
+logger = logging.getLogger(__name__)
+
+
+class RetentionService:
+    """
+    Deletes orphaned images from the storage bucket.
+
+    A sweep first collects every file referenced by a food log or a profile
+    (plus their thumbnails), then streams the bucket page by page and deletes
+    files that are unreferenced and older than the grace period, with bounded
+    concurrency. The grace period protects uploads whose log hasn't been
+    written yet (e.g. queued analysis jobs).
+
+    Orphans are only collected during the scan and deleted once it has
+    finished: the scan pages with Query.cursor_after, which fails if the
+    cursor file no longer exists, so nothing it pages on may be deleted
+    underneath it. Both phases are checkpointed after every page (the
+    cursor and the orphans found so far, then the orphans left to delete),
+    so an interrupted sweep resumes where it stopped. A resumed cursor that
+    no longer resolves (the file was deleted since) restarts the scan.
+    """
+
+    def __init__(self, storage_service: Optional[StorageService] = None):
+        self.client = get_client()
+        self.database = AsyncDatabases(Databases(self.client))
+        self.storage_service = storage_service or StorageService()
+        self.db_id = settings.DATABASE_ID
+        self.users_collection = '6758085b003d85763089'
+        self.food_logs_collection = '675928700015cab990d9'
+        self.checkpoint_path = settings.RETENTION_CHECKPOINT_PATH
+        self.page_size = settings.RETENTION_PAGE_SIZE
+
+    async def collect_references(self) -> Set[str]:
+        """
+        IDs of every file a food log or profile points at, including the
+        thumbnails stored alongside them.
+        """
+        referenced = set()
+        sources = [
+            (self.food_logs_collection, 'image_url'),
+            (self.users_collection, 'profile_image')
+        ]
+        for collection_id, field in sources:
+            list_page = partial(
+                self.database.list_documents,
+                database_id=self.db_id,
+                collection_id=collection_id
+            )
+            async for documents, _ in iter_pages(list_page, 'documents', self.page_size):
+                for document in documents:
+                    file_id = self.storage_service.file_id_from_url(document.get(field))
+                    if file_id:
+                        referenced.add(file_id)
+
+        sizes = thumbnail_sizes()
+        for file_id in list(referenced):
+            referenced.update(variant_file_id(file_id, size) for size in sizes)
+        return referenced
+
+    async def sweep(
+        self,
+        min_age_days: Optional[int] = None,
+        dry_run: Optional[bool] = None
+    ) -> Dict[str, Any]:
+        """
+        Runs (or resumes) a sweep and returns its report. With dry_run the
+        orphans are only counted, not deleted.
+        """
+        if min_age_days is None:
+            min_age_days = settings.RETENTION_MIN_AGE_DAYS
+        if dry_run is None:
+            dry_run = settings.RETENTION_DRY_RUN
+
+        checkpoint = self._load_checkpoint()
+        if checkpoint.get('phase') != 'delete':
+            try:
+                checkpoint = await self._scan(checkpoint, min_age_days, dry_run)
+            except AppwriteException as e:
+                if not checkpoint.get('cursor') or e.code not in (400, 404):
+                    raise
+                logger.warning(
+                    f"Storage sweep cursor {checkpoint['cursor']} no longer resolves "
+                    f"({str(e)}); restarting the scan"
+                )
+                self._clear_checkpoint()
+                checkpoint = await self._scan({}, min_age_days, dry_run)
+
+        report, orphans = checkpoint['report'], checkpoint['orphans']
+        if not dry_run:
+            while orphans:
+                batch, orphans = orphans[:self.page_size], orphans[self.page_size:]
+                report["deleted"] += await self.storage_service.delete_files(
+                    batch,
+                    settings.RETENTION_DELETE_CONCURRENCY
+                )
+                self._save_checkpoint({"phase": "delete", "orphans": orphans, "report": report})
+
+        self._clear_checkpoint()
+        report["finished_at"] = time.time()
+        logger.info(f"Storage sweep finished: {report}")
+        return report
+
+    async def _scan(self, checkpoint: Dict[str, Any], min_age_days: int, dry_run: bool) -> Dict[str, Any]:
+        """
+        Scans the bucket (resuming after checkpoint's cursor) and returns the
+        delete-phase checkpoint: the report and every orphan found.
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(days=min_age_days)
+        report = checkpoint.get('report') or {
+            "scanned": 0,
+            "orphaned": 0,
+            "orphaned_bytes": 0,
+            "deleted": 0,
+            "dry_run": dry_run,
+            "started_at": time.time()
+        }
+        orphans: List[Dict[str, Any]] = checkpoint.get('orphans') or []
+        if checkpoint.get('cursor'):
+            logger.info(f"Resuming storage sweep after file {checkpoint['cursor']}")
+
+        # If this fails nothing is deleted: an incomplete reference set
+        # would make live images look orphaned
+        referenced = await self.collect_references()
+
+        async for files, cursor in self.storage_service.iter_files(
+            self.page_size,
+            cursor=checkpoint.get('cursor')
+        ):
+            page_orphans = [
+                {"$id": file['$id'], "sizeOriginal": file['sizeOriginal']}
+                for file in files
+                if file['$id'] not in referenced
+                and datetime.fromisoformat(file['$createdAt']) < cutoff
+            ]
+            report["scanned"] += len(files)
+            report["orphaned"] += len(page_orphans)
+            report["orphaned_bytes"] += sum(file['sizeOriginal'] for file in page_orphans)
+            orphans.extend(page_orphans)
+
+            self._save_checkpoint({"phase": "scan", "cursor": cursor, "orphans": orphans, "report": report})
+
+        checkpoint = {"phase": "delete", "orphans": orphans, "report": report}
+        self._save_checkpoint(checkpoint)
+        return checkpoint
+
+    def _load_checkpoint(self) -> Dict[str, Any]:
+        try:
+            with open(self.checkpoint_path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save_checkpoint(self, checkpoint: Dict[str, Any]) -> None:
+        os.makedirs(os.path.dirname(self.checkpoint_path) or '.', exist_ok=True)
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _clear_checkpoint(self) -> None:
+        try:
+            os.remove(self.checkpoint_path)
+        except FileNotFoundError:
+            pass
+
+
+async def sweep_storage() -> None:
+    """Scheduled entry point."""
+    try:
+        await RetentionService().sweep()
+    except Exception as e:
+        logger.error(f"Error in sweep_storage: {str(e)}")
@@ -0,0 +1,64 @@
+# app/services/search_service.py
+import asyncio
+from functools import partial
+from typing import Any, Dict, List
+from appwrite.query import Query
+from appwrite.services.databases import Databases
+from app.config import settings
+from app.utils.appwrite_client import get_client
+from app.utils.appwrite_gateway import AsyncDatabases
+from app.utils.pagination import iter_pages
+from app.utils.search_index import FoodLogIndex, food_search_index
+
+
+class SearchService:
+    """
+    Ranked, typo-tolerant search over a user's food logs, served from an
+    in-memory index that is built from the database on a user's first
+    search and then kept current as meals are logged.
+    """
+
+    def __init__(self):
+        self.client = get_client()
+        self.database = AsyncDatabases(Databases(self.client))
+        self.db_id = settings.DATABASE_ID
+        self.food_logs_collection = '675928700015cab990d9'
+        self._builds: Dict[str, asyncio.Task] = {}
+
+    async def search(self, user_id: str, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        index = food_search_index.get(user_id)
+        if index is None:
+            index = await self._get_or_build(user_id)
+        return index.search(query, limit, settings.SEARCH_FUZZY_THRESHOLD)
+
+    async def _get_or_build(self, user_id: str) -> FoodLogIndex:
+        # Concurrent first searches by the same user share one build
+        build = self._builds.get(user_id)
+        if build is None:
+            build = asyncio.create_task(self._build(user_id))
+            self._builds[user_id] = build
+            build.add_done_callback(lambda _: self._builds.pop(user_id, None))
+        return await asyncio.shield(build)
+
+    async def _build(self, user_id: str) -> FoodLogIndex:
+        food_search_index.begin_build(user_id)
+        try:
+            index = FoodLogIndex()
+            list_page = partial(
+                self.database.list_documents,
+                database_id=self.db_id,
+                collection_id=self.food_logs_collection
+            )
+            async for logs, _ in iter_pages(
+                list_page,
+                'documents',
+                settings.SEARCH_INDEX_PAGE_SIZE,
+                queries=[Query.equal('user_id', user_id)]
+            ):
+                for log in logs:
+                    index.add(log)
+        except Exception:
+            food_search_index.abort_build(user_id)
+            raise
+        food_search_index.finish_build(user_id, index)
+        return index
@@ -1,20 +1,26 @@
 # app/services/social_service.py
+import asyncio
 import traceback
-from typing import List, Dict, Any
+from functools import partial
+from typing import List, Dict, Any, Optional, Tuple
 from fastapi import HTTPException
 from appwrite.services.databases import Databases
 from appwrite.query import Query
 from app.utils.appwrite_client import get_client
+from app.utils.appwrite_gateway import AsyncDatabases
+from app.services.storage_service import StorageService
+from app.utils.macronutrients import decode_macros
+from app.utils.pagination import iter_pages, keyset_queries, split_page
 from app.config import settings
 import uuid
 from datetime import datetime, timezone
-import json
 
 
 class SocialService:
     def __init__(self):
         self.client = get_client()
-        self.database = Databases(self.client)
+        self.database = AsyncDatabases(Databases(self.client))
+        self.storage_service = StorageService()
         self.db_id = settings.DATABASE_ID
         self.users_collection = '6758085b003d85763089'      # Users collection ID
         self.friends_collection = '67592b05001baf89ebb5'    # Friendships collection ID
@@ -25,7 +31,7 @@ class SocialService:
         try:
             print(f"Attempting friend request from {from_user} to {to_user}")
 
-            existing = self.database.list_documents(
+            existing = await self.database.list_documents(
                 database_id=self.db_id,
                 collection_id='67592a09000aff381e48',
                 queries=[
@@ -52,7 +58,7 @@ class SocialService:
             request_id = str(uuid.uuid4())
             print(f"Generated request ID: {request_id}")
 
-            response = self.database.create_document(
+            response = await self.database.create_document(
                 database_id=self.db_id,
                 collection_id='67592a09000aff381e48',
                 document_id=request_id,
@@ -82,14 +88,14 @@ class SocialService:
 
     async def accept_friend_request(self, request_id: str) -> Dict[str, Any]:
         try:
-            request = self.database.get_document(
+            request = await self.database.get_document(
                 database_id=self.db_id,
                 collection_id='67592a09000aff381e48',  # friend_requests collection
                 document_id=request_id
             )
 
             # Check if friendship already exists
-            existing_friendship = self.database.list_documents(
+            existing_friendship = await self.database.list_documents(
                 database_id=self.db_id,
                 collection_id='67592b05001baf89ebb5',  # friendships collection
                 queries=[
@@ -102,7 +108,7 @@ class SocialService:
 
             if existing_friendship['total'] == 0:
                 # Create friendship
-                self.database.create_document(
+                await self.database.create_document(
                     database_id=self.db_id,
                     collection_id='67592b05001baf89ebb5',
                     document_id=str(uuid.uuid4()),
@@ -116,7 +122,7 @@ class SocialService:
                 )
 
                 # Create reverse friendship
-                self.database.create_document(
+                await self.database.create_document(
                     database_id=self.db_id,
                     collection_id='67592b05001baf89ebb5',
                     document_id=str(uuid.uuid4()),
@@ -130,7 +136,7 @@ class SocialService:
                 )
 
             # Update request status
-            updated_request = self.database.update_document(
+            updated_request = await self.database.update_document(
                 database_id=self.db_id,
                 collection_id='67592a09000aff381e48',
                 document_id=request_id,
@@ -152,24 +158,34 @@ class SocialService:
     async def get_friends(self, user_id: str) -> List[Dict[str, Any]]:
         try:
             # Get all friendships where user is user_id
-            friendships = self.database.list_documents(
-                database_id=self.db_id,
-                collection_id=self.friends_collection,
+            friendships = []
+            async for page, _ in iter_pages(
+                partial(
+                    self.database.list_documents,
+                    database_id=self.db_id,
+                    collection_id=self.friends_collection
+                ),
+                'documents',
+                100,
                 queries=[
                     Query.equal('user_id', user_id),
                     Query.equal('status', 'active')
                 ]
-            )
+            ):
+                friendships.extend(page)
 
-            # Get user details for each friend
-            friend_list = []
-            for friendship in friendships['documents']:
-                friend = self.database.get_document(
+            # Get user details for each friend concurrently
+            friends = await asyncio.gather(*(
+                self.database.get_document(
                     database_id=self.db_id,
                     collection_id=self.users_collection,
                     document_id=friendship['friend_id']
                 )
+                for friendship in friendships
+            ))
 
+            friend_list = []
+            for friendship, friend in zip(friendships, friends):
                 friend_list.append({
                     'id': friend['$id'],
                     'user_id': friendship['user_id'],
@@ -186,69 +202,94 @@ class SocialService:
             print(f"Get friends error: {str(e)}")
             raise HTTPException(status_code=500, detail=str(e))
 
-    async def get_friend_feed(self, user_id: str, limit: int = 20, offset: int = 0) -> List[Dict[str, Any]]:
+    async def get_friend_feed(
+        self,
+        user_id: str,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        offset: int = 0
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Returns a page of friends' logs, newest first, and the cursor of the
+        next page (None on the last page). `offset` is only kept for older
+        clients. Raises ValueError on a malformed cursor.
+        """
+        page_queries = keyset_queries(limit + offset, cursor)  # Validate before any I/O
+
         try:
             # First get all friends
-            friendships = self.database.list_documents(
-                database_id=self.db_id,
-                collection_id=self.friends_collection,
+            friend_ids = []
+            async for friendships, _ in iter_pages(
+                partial(
+                    self.database.list_documents,
+                    database_id=self.db_id,
+                    collection_id=self.friends_collection
+                ),
+                'documents',
+                100,
                 queries=[
                     Query.equal('user_id', user_id),
                     Query.equal('status', 'active')
                 ]
-            )
-            
-            # Get friend IDs
-            friend_ids = [friendship['friend_id'] for friendship in friendships['documents']]
-            
+            ):
+                friend_ids.extend(friendship['friend_id'] for friendship in friendships)
+
             if not friend_ids:
-                return []
+                return [], None
 
-            # Get all logs from all friends
-            all_logs = []
-            for friend_id in friend_ids:
-                logs = self.database.list_documents(
+            # One keyset query per 100 friends (Appwrite's limit on values in
+            # an equal query), merged into a single newest-first page
+            chunks = [friend_ids[i:i + 100] for i in range(0, len(friend_ids), 100)]
+            results = await asyncio.gather(*(
+                self.database.list_documents(
                     database_id=self.db_id,
                     collection_id='675928700015cab990d9',
                     queries=[
                         Query.equal('visibility', 'friends'),
-                        Query.equal('user_id', friend_id),
-                        Query.order_desc('timestamp')
+                        Query.equal('user_id', chunk),
+                        *page_queries
                     ]
                 )
-                all_logs.extend(logs['documents'])
-
-            # Sort all logs by timestamp
-            all_logs.sort(key=lambda x: x['timestamp'], reverse=True)
-            
-            # Apply pagination
-            paginated_logs = all_logs[offset:offset + limit]
-
-            # Process logs and add user info
-            feed_items = []
-            for log in paginated_logs:
-                user = self.database.get_document(
+                for chunk in chunks
+            ))
+            all_logs = [log for result in results for log in result['documents']]
+            all_logs.sort(key=lambda x: (x['timestamp'], x['$id']), reverse=True)
+            paginated_logs, next_cursor = split_page(all_logs[offset:], limit)
+
+            # Fetch each author once
+            author_ids = list({log['user_id'] for log in paginated_logs})
+            authors = await asyncio.gather(*(
+                self.database.get_document(
                     database_id=self.db_id,
                     collection_id=self.users_collection,
-                    document_id=log['user_id']
+                    document_id=author_id
                 )
-                
-                # Parse JSON string back to dict for macronutrients
-                macros = json.loads(log['macronutrients'])
+                for author_id in author_ids
+            ))
+            usernames = {author['$id']: author['username'] for author in authors}
 
+            # Thumbnail URLs for the whole page in one lookup
+            thumbnails = await self.storage_service.thumbnail_urls(
+                [log['image_url'] for log in paginated_logs]
+            )
+
+            # Process logs and add user info
+            feed_items = []
+            for log, log_thumbnails in zip(paginated_logs, thumbnails):
                 feed_items.append({
                     'id': log['$id'],
                     'user_id': log['user_id'],
-                    'username': user['username'],
+                    'username': usernames[log['user_id']],
                     'food_name': log['food_name'],
                     'portion_size': log['portion_size'],
                     'calories': log['calories'],
-                    'macronutrients': macros,
+                    'macronutrients': decode_macros(log),
                     'image_url': log['image_url'],
+                    'thumbnails': log_thumbnails,
                     'timestamp': log['timestamp']
                 })
 
-            return feed_items
+            return feed_items, next_cursor
 
         except Exception as e:
             print(f"Get friend feed error: {str(e)}")
@@ -257,7 +298,7 @@ class SocialService:
     async def cleanup_duplicate_friendships(self):
         try:
             # Get all friendships
-            friendships = self.database.list_documents(
+            friendships = await self.database.list_documents(
                 database_id=self.db_id,
                 collection_id='67592b05001baf89ebb5'
             )
@@ -275,7 +316,7 @@ class SocialService:
 
             # Delete duplicates
             for doc_id in duplicates:
-                self.database.delete_document(
+                await self.database.delete_document(
                     database_id=self.db_id,
                     collection_id='67592b05001baf89ebb5',
                     document_id=doc_id
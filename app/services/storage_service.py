@@ -1,20 +1,38 @@
 # app/services/storage_service.py
 from appwrite.client import Client
+from appwrite.query import Query
+from appwrite.services.databases import Databases
 from appwrite.services.storage import Storage
 from appwrite.input_file import InputFile
-from typing import Optional, Dict, BinaryIO
+from appwrite.exception import AppwriteException
+from typing import Any, AsyncIterator, Optional, Dict, BinaryIO, List, Tuple
 from fastapi import HTTPException, UploadFile
+import asyncio
 import mimetypes
-import uuid
+import os
+import tempfile
+from functools import partial
 from app.config import settings
 from app.utils.appwrite_client import get_client
+from app.utils.appwrite_gateway import AsyncDatabases, AsyncGateway
+from app.utils.image_processing import PreparedImage, prepare_image, thumbnail_sizes
+from app.utils.pagination import iter_pages
+from app.utils.storage_index import content_file_id, storage_index, variant_file_id
 
+IMAGE_SIGNATURES = {
+    'image/jpeg': [b'\xff\xd8\xff'],
+    'image/png': [b'\x89PNG\r\n\x1a\n'],
+    'image/gif': [b'GIF87a', b'GIF89a']
+}
 
 class StorageService:
     def __init__(self):
         self.client = get_client()
-        self.storage = Storage(self.client)
+        self.storage = AsyncGateway(Storage(self.client))
+        self.database = AsyncDatabases(Databases(self.client))
         self.bucket_id = settings.APPWRITE_BUCKET_ID
+        self.users_collection = '6758085b003d85763089'
+        self.food_logs_collection = '675928700015cab990d9'
 
     def _generate_file_url(self, file_id: str) -> str:
         """
@@ -26,39 +44,183 @@ class StorageService:
             f"?project={project_id}&mode=admin"
         )
 
+    def _generate_preview_url(self, file_id: str, size: int) -> str:
+        """
+        Appwrite on-the-fly preview; used for files stored without thumbnails.
+        """
+        return (
+            f"{settings.APPWRITE_ENDPOINT}/storage/buckets/{self.bucket_id}/files/{file_id}/preview"
+            f"?width={size}&height={size}&project={settings.APPWRITE_PROJECT_ID}"
+        )
 
-    async def upload_image(self, file: UploadFile) -> Dict[str, str]:
+    async def spool_image(self, file: UploadFile) -> str:
+        """
+        Streams an upload to a temporary file in fixed-size chunks, rejecting
+        it as soon as it exceeds MAX_UPLOAD_SIZE or its magic bytes are not an
+        allowed image type. Returns the temp file path; the caller deletes it.
+        """
+        too_large = HTTPException(
+            status_code=413,
+            detail=f"File too large. Maximum size is {settings.MAX_UPLOAD_SIZE} bytes."
+        )
+        if file.size is not None and file.size > settings.MAX_UPLOAD_SIZE:
+            raise too_large
+
+        fd, path = tempfile.mkstemp(prefix="calmate-upload-")
         try:
-            # Validate file type
-            if not self._is_valid_image(file.filename):
-                raise HTTPException(
-                    status_code=400,
-                    detail="Invalid file type. Only images (jpg, jpeg, png) are allowed."
-                )
+            size = 0
+            with os.fdopen(fd, 'wb') as spool:
+                while True:
+                    chunk = await file.read(settings.UPLOAD_CHUNK_SIZE)
+                    if not chunk:
+                        break
+
+                    if size == 0 and not self._is_valid_image(chunk[:16]):
+                        raise HTTPException(
+                            status_code=400,
+                            detail=f"Invalid file type. Allowed types: {settings.ALLOWED_IMAGE_TYPES}"
+                        )
+
+                    size += len(chunk)
+                    if size > settings.MAX_UPLOAD_SIZE:
+                        raise too_large
+                    spool.write(chunk)
 
-            # Generate unique ID
-            unique_id = str(uuid.uuid4()).replace('-', '')[:36]
-            
-            # Read file content
-            file_data = await file.read()
+            if size == 0:
+                raise HTTPException(status_code=400, detail="Empty file")
+            return path
+        except Exception:
+            os.unlink(path)
+            raise
 
-            # Upload to Appwrite
-            result = self.storage.create_file(
+    async def prepare_upload(self, file: UploadFile) -> PreparedImage:
+        """
+        Streams an uploaded image to disk and converts it to the downscaled
+        derivative that is both analyzed and stored. The original is decoded
+        from disk inside the image process pool, so it is never held in this
+        worker's memory.
+        """
+        path = await self.spool_image(file)
+        try:
+            return await prepare_image(path, file.filename)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        finally:
+            os.unlink(path)
+
+    async def upload_image(self, file: UploadFile, user_id: Optional[str] = None) -> Dict[str, str]:
+        image = await self.prepare_upload(file)
+        return await self.upload_prepared(image, user_id)
+
+    async def upload_prepared(self, image: PreparedImage, user_id: Optional[str] = None) -> Dict[str, str]:
+        """
+        Stores a prepared image together with its thumbnails.
+        """
+        return await self.upload_bytes(
+            image.data,
+            image.filename,
+            image.content_type,
+            thumbnails=image.thumbnails,
+            user_id=user_id
+        )
+
+    async def _create_file(
+        self,
+        file_id: str,
+        file_data: bytes,
+        filename: str,
+        content_type: Optional[str]
+    ) -> bool:
+        """
+        Stores a file; returns False if it was already there.
+        """
+        try:
+            await self.storage.create_file(
                 bucket_id=self.bucket_id,
-                file_id=unique_id,
+                file_id=file_id,
                 file=InputFile.from_bytes(
                     file_data,
-                    file.filename,
-                    mime_type=file.content_type  # Add mime type
+                    filename,
+                    mime_type=content_type  # Add mime type
                 ),
                 permissions=['read("any")']
             )
+            return True
+        except AppwriteException as e:
+            # Same bytes stored by another worker, or before the index existed
+            if e.code != 409:
+                raise
+            return False
+
+    async def _file_exists(self, file_id: str) -> bool:
+        try:
+            await self.storage.get_file(bucket_id=self.bucket_id, file_id=file_id)
+            return True
+        except AppwriteException as e:
+            if e.code != 404:
+                raise
+            return False
 
-            print(f"File uploaded with mime type: {file.content_type}")  # Debug print
+    async def upload_bytes(
+        self,
+        file_data: bytes,
+        filename: str,
+        content_type: Optional[str] = None,
+        thumbnails: Optional[Dict[int, bytes]] = None,
+        user_id: Optional[str] = None
+    ) -> Dict[str, str]:
+        """
+        Uploads image bytes that are already in memory, plus optional
+        thumbnails keyed by size, stored next to the original. The upload
+        is counted towards user_id's storage usage.
+
+        File IDs are derived from the content hash, so an image that this
+        instance's index already knows only gains a reference and no bytes
+        are sent upstream. Otherwise the files are created; one that
+        already exists (stored by another instance) is reused as is.
+        """
+        try:
+            file_id = content_file_id(file_data)
+
+            if await storage_index.acquire(file_id, user_id):
+                if await self._file_exists(file_id):
+                    return {
+                        "file_id": file_id,
+                        "file_url": self._generate_file_url(file_id)
+                    }
+                # Deleted upstream since it was indexed (retention sweep,
+                # another instance): drop the stale entry and store it again
+                await storage_index.release(file_id, user_id)
+                await storage_index.forget(file_id, len(file_data))
+
+            # Upload the original and its thumbnails to Appwrite concurrently
+            thumbnails = thumbnails or {}
+            stem, extension = os.path.splitext(filename)
+            created = await asyncio.gather(
+                self._create_file(file_id, file_data, filename, content_type),
+                *(
+                    self._create_file(
+                        variant_file_id(file_id, size),
+                        data,
+                        f"{stem}_{size}{extension}",
+                        content_type
+                    )
+                    for size, data in thumbnails.items()
+                )
+            )
+
+            await storage_index.register(
+                file_id,
+                len(file_data),
+                thumbnails.keys(),
+                stored_bytes=len(file_data) + sum(len(data) for data in thumbnails.values()),
+                user_id=user_id,
+                new_file=created[0]
+            )
 
             return {
-                "file_id": result['$id'],
-                "file_url": self._generate_file_url(result['$id'])
+                "file_id": file_id,
+                "file_url": self._generate_file_url(file_id)
             }
 
         except Exception as e:
@@ -68,22 +230,48 @@ class StorageService:
                 detail=f"Error uploading file: {str(e)}"
             )
 
-    def _is_valid_image(self, filename: str) -> bool:
+    async def download_image(self, file_id: str) -> bytes:
         """
-        Validates image file type.
+        Downloads the stored bytes of an image.
         """
-        allowed_types = ['.jpg', '.jpeg', '.png']  # Removed gif, added explicit types
-        return any(filename.lower().endswith(ext) for ext in allowed_types)
+        try:
+            return await self.storage.get_file_view(
+                bucket_id=self.bucket_id,
+                file_id=file_id
+            )
+        except Exception as e:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Error downloading file: {str(e)}"
+            )
 
-    async def delete_image(self, file_id: str) -> bool:
+    async def delete_image(self, file_id: str, user_id: Optional[str] = None) -> bool:
         """
-        Deletes an image from storage.
+        Drops one of user_id's references to an image, deleting it from
+        storage once no food log or profile uses it anymore.
+
+        The index is per instance, so its count can only keep a file: before
+        deleting, the food logs and profiles are checked for the file too.
+        Callers release an image after the document that used it was updated.
         """
         try:
+            variants = (await storage_index.variants([file_id])).get(file_id, thumbnail_sizes())
+            if await storage_index.release(file_id, user_id) > 0:
+                return True
+            if await self.is_referenced(file_id):
+                return True
+
             await self.storage.delete_file(
                 bucket_id=self.bucket_id,
                 file_id=file_id
             )
+            await asyncio.gather(*(
+                self.storage.delete_file(
+                    bucket_id=self.bucket_id,
+                    file_id=variant_file_id(file_id, size)
+                )
+                for size in variants
+            ), return_exceptions=True)
             return True
         except Exception as e:
             raise HTTPException(
@@ -91,6 +279,44 @@ class StorageService:
                 detail=f"Error deleting file: {str(e)}"
             )
 
+    async def is_referenced(self, file_id: str) -> bool:
+        """
+        Whether any food log or profile points at the file.
+        """
+        prefix = self._generate_file_url(file_id).split('?', 1)[0]
+        sources = [
+            (self.food_logs_collection, 'image_url'),
+            (self.users_collection, 'profile_image')
+        ]
+        results = await asyncio.gather(*(
+            self.database.list_documents(
+                database_id=settings.DATABASE_ID,
+                collection_id=collection_id,
+                queries=[Query.starts_with(field, prefix), Query.select([field]), Query.limit(1)]
+            )
+            for collection_id, field in sources
+        ))
+        return any(result['documents'] for result in results)
+
+    async def release_upload(self, file_id: str, user_id: Optional[str] = None) -> None:
+        """
+        Best-effort delete_image for an upload that nothing ended up using,
+        e.g. because its analysis failed.
+        """
+        try:
+            await self.delete_image(file_id, user_id)
+        except Exception as e:
+            print(f"Error releasing upload {file_id}: {str(e)}")
+
+    def file_id_from_url(self, file_url: str) -> Optional[str]:
+        """
+        Extracts the file ID from a URL built by _generate_file_url.
+        """
+        marker = f"/storage/buckets/{self.bucket_id}/files/"
+        if not file_url or marker not in file_url:
+            return None
+        return file_url.split(marker, 1)[1].split('/', 1)[0]
+
     async def get_image_url(self, file_id: str) -> str:
         """
         Gets the URL for an image.
@@ -107,63 +333,123 @@ class StorageService:
                 detail="Image not found"
             )
 
-    def _is_valid_image(self, filename: str) -> bool:
+    def _sniff_content_type(self, header: bytes) -> Optional[str]:
         """
-        Validates image file type.
+        Detects the image type from its leading magic bytes.
         """
-        allowed_types = ['.jpg', '.jpeg', '.png', '.gif']
-        return any(filename.lower().endswith(ext) for ext in allowed_types)
+        for mime_type, signatures in IMAGE_SIGNATURES.items():
+            if any(header.startswith(signature) for signature in signatures):
+                return mime_type
+        if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+            return 'image/webp'
+        return None
 
-    async def create_thumbnail(self, file_id: str) -> Optional[str]:
+    def _is_valid_image(self, header: bytes) -> bool:
         """
-        Creates a thumbnail version of the image.
+        Validates image file type from content, not the client-supplied name.
         """
-        try:
-            # Get original file
-            original = await self.storage.get_file(
-                bucket_id=self.bucket_id,
-                file_id=file_id
-            )
+        allowed_types = [t.strip() for t in settings.ALLOWED_IMAGE_TYPES.split(',')]
+        return self._sniff_content_type(header) in allowed_types
 
-            # Generate thumbnail ID
-            thumbnail_id = f"thumb_{file_id}"
+    async def thumbnail_urls(self, file_urls: List[Optional[str]]) -> List[Dict[str, str]]:
+        """
+        Maps image URLs to {size: url} for every configured THUMBNAIL_SIZES
+        entry, in one index lookup. Stored thumbnails are served directly,
+        sizes skipped because the image is already that small use the
+        original, and files without an index entry (older uploads) fall
+        back to an Appwrite preview.
+        """
+        file_ids = [self.file_id_from_url(url) for url in file_urls]
+        stored = await storage_index.variants(file_id for file_id in file_ids if file_id)
+        sizes = thumbnail_sizes()
 
-            # Create preview
-            # Note: Appwrite handles image transformations
-            preview_url = f"{settings.APPWRITE_ENDPOINT}/storage/buckets/{self.bucket_id}/files/{file_id}/preview?width=200&height=200"
+        result = []
+        for file_id in file_ids:
+            if not file_id:
+                result.append({})
+                continue
+            if file_id not in stored:
+                result.append({str(size): self._generate_preview_url(file_id, size) for size in sizes})
+                continue
+            result.append({
+                str(size): self._generate_file_url(
+                    variant_file_id(file_id, size) if size in stored[file_id] else file_id
+                )
+                for size in sizes
+            })
+        return result
 
-            return preview_url
+    async def create_thumbnail(self, file_id: str) -> Optional[str]:
+        """
+        Returns the URL of the smallest thumbnail of an image.
+        """
+        try:
+            urls = await self.thumbnail_urls([self._generate_file_url(file_id)])
+            sizes = thumbnail_sizes()
+            return urls[0].get(str(sizes[0])) if sizes else None
 
         except Exception as e:
             return None
 
-    async def cleanup_old_files(self, days: int = 30) -> None:
+    def iter_files(
+        self,
+        page_size: int = 100,
+        cursor: Optional[str] = None
+    ) -> AsyncIterator[Tuple[List[Dict[str, Any]], str]]:
         """
-        Cleans up files older than specified days.
+        Streams every file in the bucket as (files, last_id) pages.
         """
-        try:
-            files = await self.storage.list_files(
-                bucket_id=self.bucket_id
-            )
+        return iter_pages(
+            partial(self.storage.list_files, bucket_id=self.bucket_id),
+            'files',
+            page_size,
+            cursor=cursor
+        )
 
-            for file in files['files']:
-                # Add cleanup logic based on file creation date
-                pass
+    async def delete_files(self, files: List[Dict[str, Any]], concurrency: int) -> int:
+        """
+        Deletes bucket files (as returned by list_files) outright, ignoring
+        reference counts, with at most `concurrency` requests in flight.
+        Returns how many were deleted.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
 
-        except Exception as e:
-            print(f"Error in cleanup: {str(e)}")
+        async def delete(file: Dict[str, Any]) -> bool:
+            async with semaphore:
+                try:
+                    await self.storage.delete_file(bucket_id=self.bucket_id, file_id=file['$id'])
+                except AppwriteException as e:
+                    if e.code != 404:
+                        print(f"Error deleting file {file['$id']}: {str(e)}")
+                        return False
+                await storage_index.forget(file['$id'], file['sizeOriginal'])
+                return True
+
+        results = await asyncio.gather(*(delete(file) for file in files))
+        return sum(results)
 
-    async def get_storage_stats(self) -> Dict[str, int]:
+    async def cleanup_old_files(self, days: int = 30, dry_run: bool = False) -> Dict[str, Any]:
         """
-        Gets storage usage statistics.
+        Deletes files older than the given number of days that no food log
+        or profile references. See RetentionService.
+        """
+        from app.services.retention_service import RetentionService
+
+        return await RetentionService(self).sweep(min_age_days=days, dry_run=dry_run)
+
+    async def get_storage_stats(self, user_id: Optional[str] = None) -> Dict[str, int]:
+        """
+        Gets storage usage statistics for the bucket, or for one user, from
+        the incrementally maintained counters. Without a storage index the
+        usage is computed by scanning (see UsageService).
         """
         try:
-            files = await self.storage.list_files(
-                bucket_id=self.bucket_id
-            )
+            if storage_index.enabled:
+                total_size, file_count = await storage_index.usage(user_id)
+            else:
+                from app.services.usage_service import UsageService
 
-            total_size = sum(file['size'] for file in files['files'])
-            file_count = len(files['files'])
+                total_size, file_count = await UsageService(self).scan(user_id)
 
             return {
                 "total_size_bytes": total_size,
@@ -0,0 +1,150 @@
+# app/services/usage_service.py
+import asyncio
+import logging
+from collections import defaultdict
+from functools import partial
+from typing import Dict, Optional, Set, Tuple
+from appwrite.exception import AppwriteException
+from appwrite.query import Query
+from appwrite.services.databases import Databases
+from app.config import settings
+from app.services.storage_service import StorageService
+from app.utils.appwrite_client import get_client
+from app.utils.appwrite_gateway import AsyncDatabases
+from app.utils.image_processing import thumbnail_sizes
+from app.utils.pagination import iter_pages
+from app.utils.storage_index import BUCKET_SCOPE, storage_index, variant_file_id
+
+logger = logging.getLogger(__name__)
+
+
+class UsageService:
+    """
+    Rebuilds the storage usage counters from scratch.
+
+    Uploads and deletes keep the counters current incrementally; this full
+    scan corrects any drift. It sizes every file in the bucket, then charges
+    each food log and profile image (with its thumbnails) to its user.
+    """
+
+    def __init__(self, storage_service: Optional[StorageService] = None):
+        self.client = get_client()
+        self.database = AsyncDatabases(Databases(self.client))
+        self.storage_service = storage_service or StorageService()
+        self.db_id = settings.DATABASE_ID
+        self.users_collection = '6758085b003d85763089'
+        self.food_logs_collection = '675928700015cab990d9'
+        self.page_size = settings.RETENTION_PAGE_SIZE
+
+    async def reconcile(self) -> Dict[str, Tuple[int, int]]:
+        sizes: Dict[str, int] = {}
+        async for files, _ in self.storage_service.iter_files(self.page_size):
+            for file in files:
+                sizes[file['$id']] = file['sizeOriginal']
+
+        usage = defaultdict(lambda: [0, 0])
+        usage[BUCKET_SCOPE] = [sum(sizes.values()), len(sizes)]
+
+        edges = thumbnail_sizes()
+        sources = [
+            (self.food_logs_collection, 'image_url', 'user_id'),
+            (self.users_collection, 'profile_image', '$id')
+        ]
+        for collection_id, url_field, user_field in sources:
+            list_page = partial(
+                self.database.list_documents,
+                database_id=self.db_id,
+                collection_id=collection_id
+            )
+            async for documents, _ in iter_pages(list_page, 'documents', self.page_size):
+                for document in documents:
+                    file_id = self.storage_service.file_id_from_url(document.get(url_field))
+                    if file_id not in sizes:
+                        continue
+                    stored_bytes = sizes[file_id] + sum(
+                        sizes.get(variant_file_id(file_id, edge), 0) for edge in edges
+                    )
+                    user_usage = usage[document[user_field]]
+                    user_usage[0] += stored_bytes
+                    user_usage[1] += 1
+
+        reconciled = {scope: tuple(totals) for scope, totals in usage.items()}
+        await storage_index.replace_usage(reconciled)
+        return reconciled
+
+    async def scan(self, user_id: Optional[str] = None) -> Tuple[int, int]:
+        """
+        (total bytes, file count) of the bucket, or of the images one user's
+        food logs and profile use, computed from scratch. Used instead of the
+        counters when STORAGE_INDEX_BACKEND is "none".
+        """
+        if user_id is None:
+            total_size, file_count = 0, 0
+            async for files, _ in self.storage_service.iter_files(self.page_size):
+                total_size += sum(file['sizeOriginal'] for file in files)
+                file_count += len(files)
+            return total_size, file_count
+
+        file_ids: Set[str] = set()
+        list_page = partial(
+            self.database.list_documents,
+            database_id=self.db_id,
+            collection_id=self.food_logs_collection
+        )
+        async for documents, _ in iter_pages(
+            list_page,
+            'documents',
+            self.page_size,
+            queries=[Query.equal('user_id', user_id), Query.select(['image_url'])]
+        ):
+            file_ids.update(
+                self.storage_service.file_id_from_url(document.get('image_url')) for document in documents
+            )
+        try:
+            user = await self.database.get_document(
+                database_id=self.db_id,
+                collection_id=self.users_collection,
+                document_id=user_id
+            )
+            file_ids.add(self.storage_service.file_id_from_url(user.get('profile_image')))
+        except AppwriteException as e:
+            if e.code != 404:
+                raise
+        file_ids.discard(None)
+
+        semaphore = asyncio.Semaphore(settings.RETENTION_DELETE_CONCURRENCY)
+
+        async def size_of(file_id: str) -> int:
+            async with semaphore:
+                try:
+                    file = await self.storage_service.storage.get_file(
+                        bucket_id=self.storage_service.bucket_id,
+                        file_id=file_id
+                    )
+                    return file['sizeOriginal']
+                except AppwriteException as e:
+                    if e.code != 404:
+                        raise
+                    return 0
+
+        edges = thumbnail_sizes()
+        originals = await asyncio.gather(*(size_of(file_id) for file_id in file_ids))
+        thumbnails = await asyncio.gather(*(
+            size_of(variant_file_id(file_id, edge))
+            for file_id, size in zip(file_ids, originals) if size
+            for edge in edges
+        ))
+        return sum(originals) + sum(thumbnails), sum(1 for size in originals if size)
+
+
+async def reconcile_storage_usage() -> None:
+    """Scheduled entry point."""
+    try:
+        usage = await UsageService().reconcile()
+        total_size, file_count = usage[BUCKET_SCOPE]
+        logger.info(
+            f"Reconciled storage usage: {file_count} files, {total_size} bytes, "
+            f"{len(usage) - 1} users"
+        )
+    except Exception as e:
+        logger.error(f"Error in reconcile_storage_usage: {str(e)}")
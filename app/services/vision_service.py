@@ -1,38 +1,44 @@
 # app/services/vision_service.py
-from openai import OpenAI
 from typing import Dict, Any, Optional
 from fastapi import HTTPException
+import asyncio
+import copy
 import json
+import time
 from app.config import settings
 from app.models.food_log import FoodLog
+from app.utils.openai_client import get_openai_client, openai_gate
+from app.utils.vision_cache import vision_cache
 import base64
-import requests
 
 
 class VisionService:
     def __init__(self):
-        self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
+        self.client = get_openai_client()
 
-    async def analyze_food(self, image_url: str) -> Dict[str, Any]:
+    async def analyze_food(self, image_data: bytes, content_type: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Analyzes an image held in memory; no round-trip to storage is needed.
+        """
         try:
-            print(f"Downloading image from: {image_url}")
-            
-            # Download image with auth header
-            response = requests.get(
-                image_url,
-                headers={
-                    "X-Appwrite-Project": settings.APPWRITE_PROJECT_ID,
-                    "X-Appwrite-Key": settings.APPWRITE_API_KEY
-                }
-            )
-            response.raise_for_status()
-            
-            print("Image downloaded successfully")
-            base64_image = base64.b64encode(response.content).decode('utf-8')
+            lookup = None
+            if vision_cache is not None:
+                try:
+                    lookup = await vision_cache.get(image_data)
+                except Exception as cache_error:
+                    # The cache is an optimization; analyze as on a miss
+                    print(f"Vision cache lookup error: {str(cache_error)}")
+                if lookup is not None and lookup["result"] is not None:
+                    print("Vision cache hit")
+                    return copy.deepcopy(lookup["result"])
+
+            started = time.monotonic()
+            base64_image = base64.b64encode(image_data).decode('utf-8')
+            mime_type = content_type or "image/jpeg"
             print("Image encoded to base64")
 
             try:
-                openai_response = self.client.chat.completions.create(
+                openai_response = await openai_gate.run(lambda: self.client.chat.completions.create(
                     model="gpt-4o-mini",
                     messages=[{
                         "role": "user",
@@ -52,12 +58,12 @@ class VisionService:
                             Just return the JSON, no additional text."""},
                             {"type": "image_url",
                             "image_url": {
-                                "url": f"data:image/jpeg;base64,{base64_image}"
+                                "url": f"data:{mime_type};base64,{base64_image}"
                             }}
                         ]
                     }],
                     max_tokens=300
-                )
+                ), timeout=settings.OPENAI_TIMEOUT)
                 print("Raw OpenAI response:", openai_response)
                 
                 content = openai_response.choices[0].message.content
@@ -65,6 +71,12 @@ class VisionService:
                 
                 parsed_result = self._parse_response(content)
                 print("Parsed result:", parsed_result)
+
+                if lookup is not None:
+                    try:
+                        await vision_cache.put(lookup, copy.deepcopy(parsed_result), time.monotonic() - started)
+                    except Exception as cache_error:
+                        print(f"Vision cache store error: {str(cache_error)}")
                 
                 return parsed_result
                     
@@ -72,9 +84,9 @@ class VisionService:
                 print(f"OpenAI API error: {str(openai_error)}")
                 raise
 
-        except requests.exceptions.RequestException as e:
-            print(f"Download error: {str(e)}")
-            raise HTTPException(status_code=500, detail="Error downloading image")
+        except asyncio.TimeoutError:
+            print("Vision Analysis Error: model call timed out")
+            raise HTTPException(status_code=504, detail="Food analysis timed out")
         except Exception as e:
             print(f"Vision Analysis Error: {str(e)}")
             raise HTTPException(status_code=500, detail=str(e))
@@ -131,7 +143,7 @@ class VisionService:
         Provides nutrition recommendations based on analyzed food.
         """
         try:
-            response = await self.client.chat.completions.create(
+            response = await openai_gate.run(lambda: self.client.chat.completions.create(
                 model="gpt-4",
                 messages=[
                     {
@@ -141,7 +153,7 @@ class VisionService:
                         "provide brief nutrition recommendations."
                     }
                 ]
-            )
+            ), timeout=settings.OPENAI_TIMEOUT)
             return {
                 "recommendations": response.choices[0].message.content,
                 "healthiness_score": self._calculate_health_score(food_data)
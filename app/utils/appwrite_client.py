@@ -1,10 +1,132 @@
 # app/utils/appwrite_client.py
+import json
+import threading
+from typing import Optional
+import requests
+from requests.adapters import HTTPAdapter
 from appwrite.client import Client
+from appwrite.encoders.value_class_encoder import ValueClassEncoder
+from appwrite.exception import AppwriteException
+from appwrite.input_file import InputFile
 from app.config import settings
 
+
+class PooledClient(Client):
+    """
+    Appwrite client that sends every call through one keep-alive
+    requests.Session instead of opening a new connection per call.
+    """
+
+    def __init__(self, pool_size: int, connect_timeout: float, read_timeout: float):
+        super().__init__()
+        self._timeout = (connect_timeout, read_timeout)
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self._session.mount('https://', adapter)
+        self._session.mount('http://', adapter)
+
+    def call(self, method, path='', headers=None, params=None, response_type='json'):
+        # Mirrors appwrite.client.Client.call (SDK 7.0.1), using the pooled session
+        if headers is None:
+            headers = {}
+
+        if params is None:
+            params = {}
+
+        params = {k: v for k, v in params.items() if v is not None}
+
+        data = {}
+        files = {}
+        stringify = False
+
+        headers = {**self._global_headers, **headers}
+
+        if method != 'get':
+            data = params
+            params = {}
+
+        if headers['content-type'].startswith('application/json'):
+            data = json.dumps(data, cls=ValueClassEncoder)
+
+        if headers['content-type'].startswith('multipart/form-data'):
+            del headers['content-type']
+            stringify = True
+            for key in data.copy():
+                if isinstance(data[key], InputFile):
+                    files[key] = (data[key].filename, data[key].data)
+                    del data[key]
+            data = self.flatten(data, stringify=stringify)
+
+        response = None
+        try:
+            response = self._session.request(
+                method=method,
+                url=self._endpoint + path,
+                params=self.flatten(params, stringify=stringify),
+                data=data,
+                files=files,
+                headers=headers,
+                verify=(not self._self_signed),
+                allow_redirects=False if response_type == 'location' else True,
+                timeout=self._timeout
+            )
+
+            response.raise_for_status()
+
+            warnings = response.headers.get('x-appwrite-warning')
+            if warnings:
+                for warning in warnings.split(';'):
+                    print(f'Warning: {warning}')
+
+            content_type = response.headers['Content-Type']
+
+            if response_type == 'location':
+                return response.headers.get('Location')
+
+            if content_type.startswith('application/json'):
+                return response.json()
+
+            return response._content
+        except Exception as e:
+            if response is not None:
+                content_type = response.headers['Content-Type']
+                if content_type.startswith('application/json'):
+                    raise AppwriteException(response.json()['message'], response.status_code, response.json().get('type'), response.json())
+                else:
+                    raise AppwriteException(response.text, response.status_code)
+            else:
+                raise AppwriteException(e)
+
+    def close(self) -> None:
+        self._session.close()
+
+
+_client: Optional[PooledClient] = None
+_client_lock = threading.Lock()
+
+
 def get_client() -> Client:
-    client = Client()
-    client.set_endpoint(settings.APPWRITE_ENDPOINT)
-    client.set_project(settings.APPWRITE_PROJECT_ID)
-    client.set_key(settings.APPWRITE_API_KEY)
-    return client
+    """Returns the worker-wide pooled Appwrite client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                client = PooledClient(
+                    pool_size=settings.APPWRITE_POOL_SIZE,
+                    connect_timeout=settings.APPWRITE_CONNECT_TIMEOUT,
+                    read_timeout=settings.APPWRITE_READ_TIMEOUT
+                )
+                client.set_endpoint(settings.APPWRITE_ENDPOINT)
+                client.set_project(settings.APPWRITE_PROJECT_ID)
+                client.set_key(settings.APPWRITE_API_KEY)
+                _client = client
+    return _client
+
+
+def close_client() -> None:
+    """Closes the pooled connections; called on application shutdown."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
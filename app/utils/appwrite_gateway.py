@@ -0,0 +1,125 @@
+# app/utils/appwrite_gateway.py
+from functools import partial
+from typing import Any, Callable, Optional
+import anyio
+from anyio import CapacityLimiter
+from appwrite.services.databases import Databases
+from app.config import settings
+from app.utils.unit_of_work import current_unit_of_work
+
+_limiter: Optional[CapacityLimiter] = None
+
+
+def _get_limiter() -> CapacityLimiter:
+    # Created lazily: anyio needs a running event loop to build the limiter
+    global _limiter
+    if _limiter is None:
+        _limiter = CapacityLimiter(settings.APPWRITE_POOL_SIZE)
+    return _limiter
+
+
+async def run_blocking(func: Callable, *args, **kwargs) -> Any:
+    """
+    Runs a blocking Appwrite SDK call in a worker thread so it never stalls
+    the event loop. Concurrency is capped at APPWRITE_POOL_SIZE, matching the
+    pooled client's connection pool.
+    """
+    return await anyio.to_thread.run_sync(
+        partial(func, *args, **kwargs),
+        limiter=_get_limiter()
+    )
+
+
+class AsyncGateway:
+    """
+    Async facade over any Appwrite SDK service (Storage, Account, ...).
+    Every method becomes awaitable and runs through run_blocking.
+    """
+
+    def __init__(self, service: Any):
+        self._service = service
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._service, name)
+        if not callable(attr):
+            return attr
+
+        async def call(*args, **kwargs):
+            return await run_blocking(attr, *args, **kwargs)
+
+        return call
+
+
+class AsyncDatabases(AsyncGateway):
+    """
+    Async facade over Appwrite's Databases service. Document reads and
+    writes also go through the current request's unit of work, so repeated
+    reads are memoized and later reads see earlier writes. Outside a request
+    (e.g. scheduled jobs) calls go straight upstream.
+    """
+
+    def __init__(self, database: Databases):
+        super().__init__(database)
+
+    async def get_document(self, database_id: str, collection_id: str, document_id: str, queries=None):
+        uow = current_unit_of_work()
+        if uow is not None and queries is None:
+            document = uow.get(collection_id, document_id)
+            if document is not None:
+                return document
+
+        document = await run_blocking(
+            self._service.get_document,
+            database_id=database_id,
+            collection_id=collection_id,
+            document_id=document_id,
+            queries=queries
+        )
+        if uow is not None and queries is None:
+            uow.remember(collection_id, document_id, document)
+        return document
+
+    async def create_document(self, database_id: str, collection_id: str, document_id: str, data, permissions=None):
+        document = await run_blocking(
+            self._service.create_document,
+            database_id=database_id,
+            collection_id=collection_id,
+            document_id=document_id,
+            data=data,
+            permissions=permissions
+        )
+        uow = current_unit_of_work()
+        if uow is not None:
+            uow.record_write(collection_id, document['$id'], document)
+        return document
+
+    async def update_document(self, database_id: str, collection_id: str, document_id: str, data=None, permissions=None):
+        uow = current_unit_of_work()
+        try:
+            document = await run_blocking(
+                self._service.update_document,
+                database_id=database_id,
+                collection_id=collection_id,
+                document_id=document_id,
+                data=data,
+                permissions=permissions
+            )
+        except Exception:
+            # The upstream state is unknown now; force the next read to refetch
+            if uow is not None:
+                uow.forget(collection_id, document_id)
+            raise
+        if uow is not None:
+            uow.record_write(collection_id, document_id, document)
+        return document
+
+    async def delete_document(self, database_id: str, collection_id: str, document_id: str):
+        uow = current_unit_of_work()
+        if uow is not None:
+            uow.forget(collection_id, document_id)
+        return await run_blocking(
+            self._service.delete_document,
+            database_id=database_id,
+            collection_id=collection_id,
+            document_id=document_id
+        )
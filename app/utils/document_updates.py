@@ -0,0 +1,326 @@
+# app/utils/document_updates.py
+import asyncio
+import hashlib
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional
+from appwrite.exception import AppwriteException
+from appwrite.query import Query
+from appwrite.services.databases import Databases
+from app.config import settings
+from app.utils.appwrite_client import get_client
+from app.utils.appwrite_gateway import run_blocking
+from app.utils.pagination import iter_pages
+from app.utils.unit_of_work import current_unit_of_work
+
+logger = logging.getLogger(__name__)
+
+# A mutation gets the current document and returns the fields to write
+Mutation = Callable[[Dict[str, Any]], Dict[str, Any]]
+
+
+class DocumentUpdateConflict(Exception):
+    """Raised when an update kept losing to other writers."""
+
+
+def claim_id(collection_id: str, document_id: str, revision: int) -> str:
+    return hashlib.sha256(f"{collection_id}:{document_id}:{revision}".encode()).hexdigest()[:32]
+
+
+@dataclass
+class _Pending:
+    mutation: Mutation
+    future: asyncio.Future
+    current: Optional[Dict[str, Any]] = None
+    initial: Optional[Dict[str, Any]] = None
+
+
+@dataclass
+class _DocumentQueue:
+    pending: List[_Pending] = field(default_factory=list)
+    drain: Optional[asyncio.Task] = None
+
+
+class DocumentUpdateQueue:
+    """
+    Read-modify-write updates of the documents of one collection (counters
+    such as a user's total_points, or a day's nutrition totals) that don't
+    lose concurrent updates.
+
+    Within a worker, updates to the same document are queued and applied
+    one batch at a time: everything queued while a write is in flight is
+    folded into the next write, so a burst of logs becomes one read and one
+    write.
+
+    Across workers, Appwrite has no conditional update, so each document
+    carries a `revision` and a write must first create the claim document
+    for the next revision in REVISION_CLAIMS_COLLECTION_ID. Document
+    creation fails with 409 when the ID exists, so exactly one writer wins
+    each revision; the losers re-read the document and retry with backoff.
+    A claim whose write failed is deleted; one whose write never landed
+    (the worker died) is skipped once it is older than
+    REVISION_CLAIM_TIMEOUT seconds, so losers keep retrying for twice that
+    long before giving up.
+
+    Limit: a writer that stalls for longer than REVISION_CLAIM_TIMEOUT
+    between its claim and its write (e.g. a frozen process) can find its
+    revision skipped, and its late write then overwrites the newer one.
+    Keep the timeout well above the latency of a single document update.
+    """
+
+    def __init__(self, collection_id: str, on_write: Optional[Callable[[str], None]] = None):
+        self.collection_id = collection_id
+        self.on_write = on_write
+        self._queues: Dict[str, _DocumentQueue] = {}
+        self._database: Optional[Databases] = None
+
+    @property
+    def database(self) -> Databases:
+        if self._database is None:
+            self._database = Databases(get_client())
+        return self._database
+
+    async def update(
+        self,
+        document_id: str,
+        mutation: Mutation,
+        current: Optional[Dict[str, Any]] = None,
+        initial: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Applies `mutation` to the latest version of a document and returns
+        the written document. The mutation may run more than once (on
+        conflicts), always against a fresher document, so it must not have
+        side effects. `current` is a document the caller already read, used
+        instead of a fresh read on the first attempt. With `initial`, a
+        missing document is created from those fields (plus the mutation)
+        instead of failing.
+        """
+        queue = self._queues.setdefault(document_id, _DocumentQueue())
+        pending = _Pending(mutation, asyncio.get_running_loop().create_future(), current, initial)
+        queue.pending.append(pending)
+        if queue.drain is None:
+            queue.drain = asyncio.create_task(self._drain(document_id, queue))
+
+        document = await pending.future
+        uow = current_unit_of_work()
+        if uow is not None:
+            uow.record_write(self.collection_id, document_id, document)
+        return document
+
+    async def increment(
+        self,
+        document_id: str,
+        deltas: Dict[str, float],
+        initial: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Adds `deltas` to numeric fields (missing or null counts as 0)."""
+        return await self.update(
+            document_id,
+            lambda document: {name: (document.get(name) or 0) + delta for name, delta in deltas.items()},
+            initial=initial
+        )
+
+    async def _drain(self, document_id: str, queue: _DocumentQueue) -> None:
+        try:
+            while queue.pending:
+                batch, queue.pending = queue.pending, []
+                try:
+                    document = await self._apply(document_id, batch)
+                except Exception as e:
+                    for pending in batch:
+                        if not pending.future.done():
+                            pending.future.set_exception(e)
+                    continue
+                for pending in batch:
+                    if not pending.future.done():
+                        pending.future.set_result(document)
+        finally:
+            queue.drain = None
+            if self._queues.get(document_id) is queue and not queue.pending:
+                del self._queues[document_id]
+
+    async def _read(self, document_id: str, batch: List[_Pending]) -> Optional[Dict[str, Any]]:
+        """The current document, or None if it is missing and the batch may create it."""
+        try:
+            return await run_blocking(
+                self.database.get_document,
+                database_id=settings.DATABASE_ID,
+                collection_id=self.collection_id,
+                document_id=document_id
+            )
+        except AppwriteException as e:
+            if e.code != 404 or not any(pending.initial is not None for pending in batch):
+                raise
+            return None
+
+    async def _apply(self, document_id: str, batch: List[_Pending]) -> Dict[str, Any]:
+        document = next((pending.current for pending in batch if pending.current is not None), None)
+        deadline = time.monotonic() + 2 * settings.REVISION_CLAIM_TIMEOUT
+
+        attempt = 0
+        while time.monotonic() < deadline:
+            if document is None:
+                document = await self._read(document_id, batch)
+            missing = document is None
+            if missing:
+                document = {}
+                for pending in batch:
+                    document.update(pending.initial or {})
+            revision = document.get('revision') or 0
+
+            # Fold the batch into one write; each mutation sees the previous ones
+            state, updates = dict(document), {}
+            for pending in batch:
+                if pending.future.done():
+                    continue
+                try:
+                    changes = pending.mutation(state)
+                except Exception as e:
+                    pending.future.set_exception(e)
+                    continue
+                state.update(changes)
+                updates.update(changes)
+
+            if not updates:
+                return document  # Nothing to write
+
+            if missing:
+                # Creation is atomic: if another writer created it first, start over
+                try:
+                    written = await run_blocking(
+                        self.database.create_document,
+                        database_id=settings.DATABASE_ID,
+                        collection_id=self.collection_id,
+                        document_id=document_id,
+                        data={**state, 'revision': 0}
+                    )
+                except AppwriteException as e:
+                    if e.code != 409:
+                        raise
+                    document = None
+                    continue
+                self._written(document_id)
+                return written
+
+            target = await self._claim(document_id, revision)
+            if target is not None:
+                try:
+                    written = await run_blocking(
+                        self.database.update_document,
+                        database_id=settings.DATABASE_ID,
+                        collection_id=self.collection_id,
+                        document_id=document_id,
+                        data={**updates, 'revision': target}
+                    )
+                except Exception:
+                    # Free the revision rather than make everyone wait out the timeout
+                    await self._release_claim(document_id, target)
+                    raise
+                self._written(document_id)
+                return written
+
+            # Another writer got there first: back off, re-read and retry
+            document = None
+            await asyncio.sleep(random.uniform(0, min(0.05 * 2 ** attempt, 1.0)))
+            attempt += 1
+
+        raise DocumentUpdateConflict(f"Too many concurrent updates to {self.collection_id}/{document_id}")
+
+    def _written(self, document_id: str) -> None:
+        if self.on_write is not None:
+            self.on_write(document_id)
+
+    async def _release_claim(self, document_id: str, revision: int) -> None:
+        try:
+            await run_blocking(
+                self.database.delete_document,
+                database_id=settings.DATABASE_ID,
+                collection_id=settings.REVISION_CLAIMS_COLLECTION_ID,
+                document_id=claim_id(self.collection_id, document_id, revision)
+            )
+        except Exception as e:
+            logger.warning(f"Could not release revision {revision} of {self.collection_id}/{document_id}: {str(e)}")
+
+    async def _claim(self, document_id: str, revision: int) -> Optional[int]:
+        """
+        Claims the revision after `revision` and returns it, or None if
+        another writer has moved the document on (or is about to).
+        """
+        target = revision + 1
+        while True:
+            try:
+                await run_blocking(
+                    self.database.create_document,
+                    database_id=settings.DATABASE_ID,
+                    collection_id=settings.REVISION_CLAIMS_COLLECTION_ID,
+                    document_id=claim_id(self.collection_id, document_id, target),
+                    data={
+                        "collection_id": self.collection_id,
+                        "document_id": document_id,
+                        "revision": target,
+                        "created_at": datetime.now(timezone.utc).isoformat()
+                    }
+                )
+                return target
+            except AppwriteException as e:
+                if e.code != 409:
+                    raise
+
+            claim = await run_blocking(
+                self.database.get_document,
+                database_id=settings.DATABASE_ID,
+                collection_id=settings.REVISION_CLAIMS_COLLECTION_ID,
+                document_id=claim_id(self.collection_id, document_id, target)
+            )
+            age = datetime.now(timezone.utc) - datetime.fromisoformat(claim['created_at'])
+            if age < timedelta(seconds=settings.REVISION_CLAIM_TIMEOUT):
+                return None
+
+            # An old claim is only abandoned if the document never reached it
+            document = await run_blocking(
+                self.database.get_document,
+                database_id=settings.DATABASE_ID,
+                collection_id=self.collection_id,
+                document_id=document_id
+            )
+            if (document.get('revision') or 0) != revision:
+                return None
+            logger.warning(f"Skipping abandoned revision {target} of {self.collection_id}/{document_id}")
+            target += 1
+
+
+async def purge_revision_claims() -> None:
+    """Scheduled entry point: deletes claims older than REVISION_CLAIM_RETENTION_HOURS."""
+    try:
+        database = Databases(get_client())
+        cutoff = datetime.now(timezone.utc) - timedelta(hours=settings.REVISION_CLAIM_RETENTION_HOURS)
+        list_page = partial(
+            run_blocking,
+            database.list_documents,
+            database_id=settings.DATABASE_ID,
+            collection_id=settings.REVISION_CLAIMS_COLLECTION_ID
+        )
+        stale = []
+        async for claims, _ in iter_pages(
+            list_page,
+            'documents',
+            100,
+            queries=[Query.less_than('created_at', cutoff.isoformat())]
+        ):
+            stale.extend(claim['$id'] for claim in claims)
+
+        for document_id in stale:
+            await run_blocking(
+                database.delete_document,
+                database_id=settings.DATABASE_ID,
+                collection_id=settings.REVISION_CLAIMS_COLLECTION_ID,
+                document_id=document_id
+            )
+        logger.info(f"Purged {len(stale)} revision claims")
+    except Exception as e:
+        logger.error(f"Error in purge_revision_claims: {str(e)}")
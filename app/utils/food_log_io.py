@@ -0,0 +1,88 @@
+# app/utils/food_log_io.py
+import csv
+import io
+import json
+from typing import Any, Dict, Iterable, Iterator
+from pydantic import ValidationError
+from app.models.food_log import FoodLogImport
+from app.utils.macronutrients import MACRONUTRIENTS, decode_macros
+
+CSV_FIELDS = (
+    'id', 'food_name', 'portion_size', 'calories', 'protein', 'carbs', 'fats',
+    'image_url', 'visibility', 'timestamp'
+)
+
+
+def export_row(document: Dict[str, Any]) -> Dict[str, Any]:
+    """A stored food log document in the portable export shape."""
+    return {
+        "id": document['$id'],
+        "food_name": document['food_name'],
+        "portion_size": document['portion_size'],
+        "calories": document['calories'],
+        "macronutrients": decode_macros(document),
+        "image_url": document.get('image_url') or '',
+        "visibility": document.get('visibility') or 'friends',
+        "reactions": document.get('reactions') or [],
+        "timestamp": document['timestamp']
+    }
+
+
+def ndjson_chunk(rows: Iterable[Dict[str, Any]]) -> str:
+    return ''.join(json.dumps(row, separators=(',', ':')) + '\n' for row in rows)
+
+
+def csv_chunk(rows: Iterable[Dict[str, Any]], header: bool = False) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(CSV_FIELDS)
+    for row in rows:
+        macros = row['macronutrients']
+        writer.writerow([
+            row['id'], row['food_name'], row['portion_size'], row['calories'],
+            *(macros.get(name, 0) for name in MACRONUTRIENTS),
+            row['image_url'], row['visibility'], row['timestamp']
+        ])
+    return buffer.getvalue()
+
+
+def iter_import_records(lines: Iterable[str], fmt: str) -> Iterator[Dict[str, Any]]:
+    """
+    Parses an NDJSON or CSV (export columns) import lazily and validates
+    each record, yielding {"line", "log"} for valid records and
+    {"line", "error"} for invalid ones, so one bad row doesn't fail the rest.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(lines)
+        for row in reader:
+            record = {key: value for key, value in row.items() if key is not None and key not in MACRONUTRIENTS}
+            record['macronutrients'] = {name: row.get(name) or 0 for name in MACRONUTRIENTS}
+            yield _validate(reader.line_num, record)
+        return
+
+    for line_number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield {"line": line_number, "error": f"Invalid JSON: {str(e)}"}
+            continue
+        if not isinstance(record, dict):
+            yield {"line": line_number, "error": "Expected a JSON object"}
+            continue
+        yield _validate(line_number, record)
+
+
+def _validate(line_number: int, record: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        return {"line": line_number, "log": FoodLogImport(**record)}
+    except ValidationError as e:
+        return {
+            "line": line_number,
+            "error": '; '.join(
+                f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors()
+            )
+        }
@@ -0,0 +1,137 @@
+# app/utils/image_processing.py
+import asyncio
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Dict, List, Optional, Tuple, Union
+from PIL import Image, ImageOps, UnidentifiedImageError
+from app.config import settings
+
+_MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp"}
+_EXTENSIONS = {"JPEG": ".jpg", "WEBP": ".webp"}
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+@dataclass
+class PreparedImage:
+    data: bytes
+    content_type: str
+    filename: str
+    width: int
+    height: int
+    thumbnails: Dict[int, bytes] = field(default_factory=dict)
+
+
+def thumbnail_sizes() -> List[int]:
+    """Configured THUMBNAIL_SIZES (longest edge in pixels), smallest first."""
+    return sorted({int(size) for size in settings.THUMBNAIL_SIZES.split(',') if size.strip()})
+
+
+def _encode(image: "Image.Image", output_format: str, quality: int) -> bytes:
+    out = io.BytesIO()
+    image.save(out, format=output_format, quality=quality, optimize=True)
+    return out.getvalue()
+
+
+def _load(source: Union[bytes, str], max_edge: int) -> "Image.Image":
+    image = Image.open(io.BytesIO(source) if isinstance(source, bytes) else source)
+    # JPEG: let libjpeg decode at a reduced scale instead of full resolution
+    image.draft('RGB', (max_edge, max_edge))
+    image = ImageOps.exif_transpose(image)
+
+    if image.mode in ('RGBA', 'LA', 'P'):
+        # Flatten transparency onto white; JPEG has no alpha channel
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    elif image.mode != 'RGB':
+        image = image.convert('RGB')
+    return image
+
+
+def downscale_image(
+    source: Union[bytes, str],
+    max_edge: int,
+    output_format: str,
+    quality: int,
+    thumbnail_edges: Tuple[int, ...] = ()
+) -> Tuple[bytes, int, int, Dict[int, bytes]]:
+    """
+    Decodes, EXIF-orients, shrinks to fit max_edge and re-encodes an image
+    given as bytes or a file path, plus one smaller rendition per entry in
+    thumbnail_edges (sizes at or above the main edge are skipped). The image
+    is decoded once for all of them. CPU-bound; runs inside the process pool.
+    Raises ValueError on bad input.
+    """
+    try:
+        image = _load(source, max_edge)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        raise ValueError(f"Unreadable image: {str(e)}")
+
+    image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+    thumbnails = {}
+    variant = image
+    for edge in sorted(thumbnail_edges, reverse=True):
+        if edge >= max(image.size):
+            continue
+        # Shrink from the previous (larger) rendition rather than the original
+        variant = variant.copy()
+        variant.thumbnail((edge, edge), Image.LANCZOS)
+        thumbnails[edge] = _encode(variant, output_format, quality)
+
+    return _encode(image, output_format, quality), image.width, image.height, thumbnails
+
+
+def start_image_pool() -> None:
+    """Starts the worker processes; called from the app lifespan."""
+    global _pool
+    if _pool is None and settings.IMAGE_PROCESS_WORKERS > 0:
+        _pool = ProcessPoolExecutor(max_workers=settings.IMAGE_PROCESS_WORKERS)
+
+
+def shutdown_image_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def run_in_image_pool(func, *args):
+    """
+    Runs CPU-bound image work off the event loop: in the process pool, or in
+    a thread when IMAGE_PROCESS_WORKERS=0 (e.g. serverless deployments).
+    """
+    start_image_pool()
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_pool, partial(func, *args))
+
+
+async def prepare_image(source: Union[bytes, str], filename: str) -> PreparedImage:
+    """
+    Produces the compact derivative used for both vision analysis and storage,
+    along with its THUMBNAIL_SIZES renditions.
+    Pass a file path to keep large originals out of this process's memory.
+    """
+    output_format = settings.IMAGE_OUTPUT_FORMAT.upper()
+    data, width, height, thumbnails = await run_in_image_pool(
+        downscale_image,
+        source,
+        settings.IMAGE_MAX_EDGE,
+        output_format,
+        settings.IMAGE_QUALITY,
+        tuple(thumbnail_sizes())
+    )
+    stem = os.path.splitext(os.path.basename(filename or "image"))[0] or "image"
+    return PreparedImage(
+        data=data,
+        content_type=_MIME_TYPES[output_format],
+        filename=f"{stem}{_EXTENSIONS[output_format]}",
+        width=width,
+        height=height,
+        thumbnails=thumbnails
+    )
@@ -0,0 +1,225 @@
+# app/utils/job_queue.py
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+import anyio
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+TERMINAL_STATES = (SUCCEEDED, FAILED)
+
+
+@dataclass
+class Job:
+    user_id: str
+    payload: Dict[str, Any]
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = QUEUED
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    attempts: int = 0
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def _expire(job: Job, max_attempts: int) -> None:
+    """Puts a job whose lease ran out back in the queue, or fails it if it has had its attempts."""
+    if job.attempts >= max_attempts:
+        job.status = FAILED
+        job.error = f"Gave up after {job.attempts} attempts"
+    else:
+        job.status = QUEUED
+    job.updated_at = time.time()
+
+
+class MemoryJobStore:
+    """Keeps jobs in process memory; finished jobs are pruned after job_ttl seconds."""
+
+    def __init__(self, job_ttl: int):
+        self.job_ttl = job_ttl
+        self._jobs: Dict[str, Job] = {}
+
+    async def add(self, job: Job) -> None:
+        self._prune()
+        self._jobs[job.id] = job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    async def update(self, job: Job) -> None:
+        job.updated_at = time.time()
+        self._jobs[job.id] = job
+
+    async def claim(self, limit: int) -> List[Job]:
+        """Marks up to `limit` of the oldest queued jobs as running and returns them."""
+        queued = sorted(
+            (job for job in self._jobs.values() if job.status == QUEUED),
+            key=lambda job: job.created_at
+        )[:limit]
+        for job in queued:
+            job.status = RUNNING
+            job.attempts += 1
+            job.updated_at = time.time()
+        return queued
+
+    async def requeue_running(self, lease: float, max_attempts: int) -> int:
+        expired = [
+            job for job in self._jobs.values()
+            if job.status == RUNNING and job.updated_at < time.time() - lease
+        ]
+        for job in expired:
+            _expire(job, max_attempts)
+        return len(expired)
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self.job_ttl
+        for job_id in [
+            job.id for job in self._jobs.values()
+            if job.status in TERMINAL_STATES and job.updated_at < cutoff
+        ]:
+            del self._jobs[job_id]
+
+
+class SQLiteJobStore:
+    """
+    Durable job store in a local SQLite file, so queued jobs survive a
+    restart. Several processes may share the file: claims and requeues run
+    in write transactions, so each job is claimed by exactly one of them.
+    Blocking SQLite calls run in a worker thread.
+    """
+
+    def __init__(self, path: str, job_ttl: int):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.job_ttl = job_ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, status TEXT NOT NULL, created_at REAL NOT NULL, "
+            "updated_at REAL NOT NULL, data TEXT NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at)"
+        )
+        self._conn.commit()
+
+    def _write(self, job: Job) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO jobs (id, status, created_at, updated_at, data) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (job.id, job.status, job.created_at, job.updated_at, json.dumps(job.to_dict()))
+        )
+
+    def _add(self, job: Job) -> None:
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+                (*TERMINAL_STATES, time.time() - self.job_ttl)
+            )
+            self._write(job)
+            self._conn.commit()
+
+    def _get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return Job(**json.loads(row[0])) if row else None
+
+    def _update(self, job: Job) -> None:
+        job.updated_at = time.time()
+        with self._lock:
+            self._write(job)
+            self._conn.commit()
+
+    def _transact(self, select: str, params: tuple, change: Callable[[Job], None]) -> List[Job]:
+        """
+        Selects jobs and writes back `change`d copies in one write
+        transaction; BEGIN IMMEDIATE takes the write lock before the
+        SELECT, so no other process can select the same jobs meanwhile.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(select, params).fetchall()
+                jobs = [Job(**json.loads(row[0])) for row in rows]
+                for job in jobs:
+                    change(job)
+                    self._write(job)
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+        return jobs
+
+    def _claim(self, limit: int) -> List[Job]:
+        def start(job: Job) -> None:
+            job.status = RUNNING
+            job.attempts += 1
+            job.updated_at = time.time()
+
+        return self._transact(
+            "SELECT data FROM jobs WHERE status = ? ORDER BY created_at LIMIT ?",
+            (QUEUED, limit),
+            start
+        )
+
+    def _requeue_running(self, lease: float, max_attempts: int) -> int:
+        expired = self._transact(
+            "SELECT data FROM jobs WHERE status = ? AND updated_at < ?",
+            (RUNNING, time.time() - lease),
+            lambda job: _expire(job, max_attempts)
+        )
+        return len(expired)
+
+    async def add(self, job: Job) -> None:
+        await anyio.to_thread.run_sync(self._add, job)
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        return await anyio.to_thread.run_sync(self._get, job_id)
+
+    async def update(self, job: Job) -> None:
+        await anyio.to_thread.run_sync(self._update, job)
+
+    async def claim(self, limit: int) -> List[Job]:
+        return await anyio.to_thread.run_sync(self._claim, limit)
+
+    async def requeue_running(self, lease: float, max_attempts: int) -> int:
+        """
+        Puts jobs that have been running for longer than `lease` seconds
+        (their worker died or was restarted) back in the queue.
+        """
+        return await anyio.to_thread.run_sync(self._requeue_running, lease, max_attempts)
+
+
+class TokenBucket:
+    """Async token bucket: allows `rate` acquisitions per second, bursting up to `burst`."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def acquire(self) -> None:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
@@ -0,0 +1,25 @@
+# app/utils/macronutrients.py
+import json
+from typing import Any, Dict
+
+MACRONUTRIENTS = ('protein', 'carbs', 'fats')
+
+
+def encode_macros(macros: Dict[str, Any]) -> Dict[str, float]:
+    """The numeric protein/carbs/fats attributes a food log document stores."""
+    return {name: float(macros.get(name) or 0) for name in MACRONUTRIENTS}
+
+
+def decode_macros(document: Dict[str, Any]) -> Dict[str, float]:
+    """
+    A stored food log's macros in either schema: the numeric protein/carbs/
+    fats attributes, or (for logs not migrated yet) the legacy
+    `macronutrients` JSON string. Raises ValueError on malformed legacy JSON.
+    """
+    if document.get('protein') is not None:
+        return {name: float(document.get(name) or 0) for name in MACRONUTRIENTS}
+
+    legacy = document.get('macronutrients')
+    if isinstance(legacy, str):
+        legacy = json.loads(legacy)
+    return encode_macros(legacy or {})
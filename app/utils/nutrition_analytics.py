@@ -0,0 +1,170 @@
+# app/utils/nutrition_analytics.py
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
+
+METRICS = ('calories', 'protein', 'carbs', 'fats')
+
+
+@dataclass
+class LogColumns:
+    """A user's food logs as parallel column arrays, one entry per log."""
+    days: np.ndarray  # int64 days since 1970-01-01 (UTC)
+    calories: np.ndarray
+    protein: np.ndarray
+    carbs: np.ndarray
+    fats: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+
+def _utc_date(timestamp: str) -> str:
+    # Logs are written as UTC ISO timestamps, so the date is the prefix
+    if timestamp.endswith(('+00:00', 'Z')) or len(timestamp) == 10:
+        return timestamp[:10]
+    return datetime.fromisoformat(timestamp).astimezone(timezone.utc).date().isoformat()
+
+
+def build_columns(
+    timestamps: Sequence[str],
+    calories: Sequence[float],
+    protein: Sequence[float],
+    carbs: Sequence[float],
+    fats: Sequence[float]
+) -> LogColumns:
+    """Packs per-log values (timestamps as ISO strings) into column arrays."""
+    dates = np.array([_utc_date(timestamp) for timestamp in timestamps], dtype='datetime64[D]')
+    return LogColumns(
+        days=dates.astype(np.int64),
+        calories=np.asarray(calories, dtype=np.float64),
+        protein=np.asarray(protein, dtype=np.float64),
+        carbs=np.asarray(carbs, dtype=np.float64),
+        fats=np.asarray(fats, dtype=np.float64)
+    )
+
+
+def daily_totals(columns: LogColumns, start_day: int, n_days: int) -> Dict[str, np.ndarray]:
+    """Per-day sums of each metric plus log counts for n_days starting at start_day."""
+    offsets = columns.days - start_day
+    in_range = (offsets >= 0) & (offsets < n_days)
+    offsets = offsets[in_range]
+
+    totals = {
+        metric: np.bincount(offsets, weights=getattr(columns, metric)[in_range], minlength=n_days)
+        for metric in METRICS
+    }
+    totals['log_count'] = np.bincount(offsets, minlength=n_days)
+    return totals
+
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """Trailing mean over `window` days; the first days average what is available."""
+    cumulative = np.cumsum(np.insert(values, 0, 0.0))
+    ends = np.arange(1, len(values) + 1)
+    starts = np.maximum(ends - window, 0)
+    return (cumulative[ends] - cumulative[starts]) / (ends - starts)
+
+
+def _bucket(
+    totals: Dict[str, np.ndarray],
+    keys: np.ndarray,
+    dates: np.ndarray
+) -> List[Dict[str, Any]]:
+    # "start" is the bucket's first day inside the requested range
+    _, first_index, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    logged_days = np.bincount(inverse, weights=totals['log_count'] > 0)
+    sums = {metric: np.bincount(inverse, weights=totals[metric]) for metric in METRICS}
+    averages = {
+        metric: np.divide(sums[metric], logged_days, out=np.zeros_like(sums[metric]), where=logged_days > 0)
+        for metric in METRICS
+    }
+
+    # Convert once; building the dicts from numpy scalars is the slow part
+    columns = {
+        "start": np.datetime_as_string(dates[first_index]).tolist(),
+        "days": np.bincount(inverse).tolist(),
+        "logged_days": logged_days.astype(np.int64).tolist(),
+        "log_count": np.bincount(inverse, weights=totals['log_count']).astype(np.int64).tolist(),
+        **{f"total_{metric}": np.round(sums[metric], 2).tolist() for metric in METRICS},
+        **{f"avg_daily_{metric}": np.round(averages[metric], 2).tolist() for metric in METRICS}
+    }
+    return [dict(zip(columns, row)) for row in zip(*columns.values())]
+
+
+def compute_analytics(
+    columns: LogColumns,
+    end_day: int,
+    n_days: int,
+    rolling_window: int = 7,
+    percentiles: Sequence[float] = (10, 25, 50, 75, 90),
+    calorie_goal: Optional[float] = None,
+    goal_tolerance: float = 0.1,
+    include_daily: bool = True
+) -> Dict[str, Any]:
+    """
+    Trends for the n_days ending at end_day (inclusive, days since epoch):
+    weekly (Monday-based) and monthly buckets, trailing rolling averages,
+    daily calorie percentiles and goal adherence. Percentiles, averages
+    and adherence only consider days with at least one log.
+    """
+    start_day = end_day - n_days + 1
+    totals = daily_totals(columns, start_day, n_days)
+    day_numbers = np.arange(start_day, end_day + 1)
+    dates = day_numbers.astype('datetime64[D]')
+    logged = totals['log_count'] > 0
+    logged_calories = totals['calories'][logged]
+
+    # 1970-01-01 was a Thursday, so shifting by 3 makes weeks start on Monday
+    week_keys = (day_numbers + 3) // 7
+    month_keys = dates.astype('datetime64[M]').astype(np.int64)
+
+    result: Dict[str, Any] = {
+        "start": str(dates[0]),
+        "end": str(dates[-1]),
+        "days": n_days,
+        "logged_days": int(logged.sum()),
+        "log_count": int(totals['log_count'].sum()),
+        "averages": {
+            metric: round(float(totals[metric][logged].mean()), 2) if logged.any() else 0.0
+            for metric in METRICS
+        },
+        "calorie_percentiles": {
+            f"p{p:g}": round(float(value), 2)
+            for p, value in zip(
+                percentiles,
+                np.percentile(logged_calories, percentiles) if len(logged_calories) else [0.0] * len(percentiles)
+            )
+        },
+        "weekly": _bucket(totals, week_keys, dates),
+        "monthly": _bucket(totals, month_keys, dates),
+        "goal": None
+    }
+
+    if calorie_goal:
+        within = np.abs(logged_calories - calorie_goal) <= goal_tolerance * calorie_goal
+        under = logged_calories <= calorie_goal
+        result["goal"] = {
+            "daily_calorie_goal": calorie_goal,
+            "tolerance": goal_tolerance,
+            "within_rate": round(float(within.mean()), 4) if len(logged_calories) else 0.0,
+            "under_rate": round(float(under.mean()), 4) if len(logged_calories) else 0.0,
+            "days_within": int(within.sum()),
+            "days_over": int((~under).sum())
+        }
+
+    if include_daily:
+        columns = {
+            "date": np.datetime_as_string(dates).tolist(),
+            "log_count": totals['log_count'].tolist(),
+            **{metric: np.round(totals[metric], 2).tolist() for metric in METRICS},
+            **{
+                f"rolling_{metric}": np.round(rolling_mean(totals[metric], rolling_window), 2).tolist()
+                for metric in METRICS
+            }
+        }
+        result["rolling_window"] = rolling_window
+        result["daily"] = [dict(zip(columns, row)) for row in zip(*columns.values())]
+
+    return result
@@ -0,0 +1,106 @@
+# app/utils/openai_client.py
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+from openai import AsyncOpenAI
+from app.config import settings
+
+T = TypeVar("T")
+
+
+class ConcurrencyGate:
+    """
+    Caps concurrent model calls per worker and enforces a per-call deadline
+    that covers both the time spent queued and the call itself.
+    Keeps simple counters so queue depth can be monitored.
+    """
+
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max_concurrency
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.waiting = 0
+        self.in_flight = 0
+        self.max_waiting = 0
+        self.completed = 0
+        self.failed = 0
+        self.timed_out = 0
+        self.total_wait_seconds = 0.0
+        self.total_call_seconds = 0.0
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Created lazily so it binds to the server's running loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def run(self, call: Callable[[], Awaitable[T]], timeout: float) -> T:
+        """Runs call() once a slot is free; raises asyncio.TimeoutError past the deadline."""
+        semaphore = self._get_semaphore()
+        started = time.monotonic()
+
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise
+        finally:
+            self.waiting -= 1
+
+        waited = time.monotonic() - started
+        self.total_wait_seconds += waited
+        self.in_flight += 1
+        try:
+            result = await asyncio.wait_for(call(), max(timeout - waited, 0))
+            self.completed += 1
+            return result
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            self.total_call_seconds += time.monotonic() - started - waited
+            semaphore.release()
+
+    def snapshot(self) -> Dict[str, Any]:
+        finished = self.completed + self.failed + self.timed_out
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "queue_depth": self.waiting,
+            "max_queue_depth": self.max_waiting,
+            "completed": self.completed,
+            "failed": self.failed,
+            "timed_out": self.timed_out,
+            "avg_wait_ms": round(self.total_wait_seconds / finished * 1000, 2) if finished else 0.0,
+            "avg_call_ms": round(self.total_call_seconds / finished * 1000, 2) if finished else 0.0
+        }
+
+
+_client: Optional[AsyncOpenAI] = None
+
+openai_gate = ConcurrencyGate(settings.OPENAI_MAX_CONCURRENCY)
+
+
+def get_openai_client() -> AsyncOpenAI:
+    """Returns the worker-wide AsyncOpenAI client (one HTTP connection pool)."""
+    global _client
+    if _client is None:
+        _client = AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            timeout=settings.OPENAI_TIMEOUT,
+            max_retries=settings.OPENAI_MAX_RETRIES
+        )
+    return _client
+
+
+async def close_openai_client() -> None:
+    """Closes the shared client's connections; called on application shutdown."""
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
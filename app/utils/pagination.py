@@ -0,0 +1,96 @@
+# app/utils/pagination.py
+import base64
+import binascii
+import json
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+from appwrite.query import Query
+
+
+async def iter_pages(
+    list_page: Callable[..., Awaitable[Dict[str, Any]]],
+    key: str,
+    page_size: int,
+    queries: Sequence[str] = (),
+    cursor: Optional[str] = None
+) -> AsyncIterator[Tuple[List[Dict[str, Any]], str]]:
+    """
+    Streams an Appwrite list endpoint page by page with cursor pagination,
+    yielding (items, last_id). Unlike offset pagination each page costs the
+    same no matter how deep the scan is, and pass last_id back as `cursor`
+    to resume an interrupted scan.
+
+    `list_page` is the list call with everything but `queries` bound, e.g.
+    partial(database.list_documents, database_id=..., collection_id=...);
+    `key` is the result field holding the items ('documents', 'files').
+    """
+    while True:
+        page_queries = [*queries, Query.limit(page_size)]
+        if cursor:
+            page_queries.append(Query.cursor_after(cursor))
+
+        result = await list_page(queries=page_queries)
+        items = result[key]
+        if not items:
+            return
+
+        cursor = items[-1]['$id']
+        yield items, cursor
+
+        if len(items) < page_size:
+            return
+
+
+def encode_cursor(document: Dict[str, Any]) -> str:
+    """Opaque page token for the (timestamp, $id) position of a document."""
+    position = json.dumps([document['timestamp'], document['$id']], separators=(',', ':'))
+    return base64.urlsafe_b64encode(position.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """Inverse of encode_cursor. Raises ValueError on a malformed token."""
+    try:
+        position = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        timestamp, document_id = json.loads(position)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(timestamp, str) or not isinstance(document_id, str):
+        raise ValueError("Invalid cursor")
+    return timestamp, document_id
+
+
+def keyset_queries(limit: int, cursor: Optional[str] = None) -> List[str]:
+    """
+    Newest-first keyset page over (timestamp, $id): the ordering is total,
+    so pages stay stable while logs are inserted, and each page is an index
+    range scan whatever its depth. Fetches one extra row so split_page can
+    tell whether another page follows.
+
+    The position is filtered explicitly rather than with Query.cursor_after,
+    which needs the cursor document to still exist.
+    """
+    queries = [
+        Query.order_desc('timestamp'),
+        Query.order_desc('$id'),
+        Query.limit(limit + 1)
+    ]
+    if cursor:
+        timestamp, document_id = decode_cursor(cursor)
+        queries.append(Query.or_queries([
+            Query.less_than('timestamp', timestamp),
+            Query.and_queries([
+                Query.equal('timestamp', timestamp),
+                Query.less_than('$id', document_id)
+            ])
+        ]))
+    return queries
+
+
+def split_page(
+    documents: List[Dict[str, Any]],
+    limit: int
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Trims a keyset_queries result to `limit` and returns it with the next page's cursor."""
+    if len(documents) <= limit:
+        return documents, None
+    page = documents[:limit]
+    return page, encode_cursor(page[-1])
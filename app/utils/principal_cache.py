@@ -0,0 +1,54 @@
+# app/utils/principal_cache.py
+import threading
+from typing import Optional, Set
+from cachetools import TTLCache
+from app.config import settings
+from app.models.user import User
+
+# token -> User, bounded and expiring after CACHE_TTL seconds
+_principals: TTLCache = TTLCache(
+    maxsize=settings.PRINCIPAL_CACHE_SIZE,
+    ttl=settings.CACHE_TTL
+)
+
+# user_id -> tokens currently cached for that user, so writes can invalidate
+# every principal of a user without scanning the whole cache
+_tokens_by_user: TTLCache = TTLCache(
+    maxsize=settings.PRINCIPAL_CACHE_SIZE,
+    ttl=settings.CACHE_TTL
+)
+
+_lock = threading.Lock()
+
+
+def get_cached_principal(token: str) -> Optional[User]:
+    """Returns the cached user for a token, or None on a miss/expiry."""
+    with _lock:
+        return _principals.get(token)
+
+
+def cache_principal(token: str, user: User) -> None:
+    """Caches the authenticated user for a token."""
+    with _lock:
+        _principals[token] = user
+        tokens: Set[str] = _tokens_by_user.get(user.id, set())
+        tokens.add(token)
+        # Re-assign so the index entry's TTL follows the newest principal
+        _tokens_by_user[user.id] = tokens
+
+
+def invalidate_user(user_id: str) -> None:
+    """
+    Drops every cached principal belonging to a user.
+    Call this after any write to the user's document.
+    """
+    with _lock:
+        for token in _tokens_by_user.pop(user_id, set()):
+            _principals.pop(token, None)
+
+
+def clear_principals() -> None:
+    """Drops all cached principals (e.g. after bulk user updates)."""
+    with _lock:
+        _principals.clear()
+        _tokens_by_user.clear()
@@ -0,0 +1,48 @@
+# app/utils/responses.py
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Type
+import orjson
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
+from pydantic import BaseModel
+from app.config import settings
+
+_ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def construct_rows(model: Type[BaseModel], rows: Iterable[Mapping[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Shapes rows like `model` without validating them: keeps the model's
+    fields, in order, and fills in defaults for missing optional ones.
+
+    Only for rows from our own data layer, which were validated when they
+    were written; anything else should go through the model.
+    """
+    names = list(model.model_fields)
+    defaults = {
+        name: field.get_default(call_default_factory=True)
+        for name, field in model.model_fields.items()
+        if not field.is_required()
+    }
+    return [{name: row[name] if name in row else defaults[name] for name in names} for row in rows]
+
+
+def json_array_response(rows: List[Any], headers: Optional[Dict[str, str]] = None) -> Response:
+    """
+    Serializes a list endpoint's rows with orjson, bypassing FastAPI's
+    response model validation and jsonable_encoder pass. Arrays of at least
+    JSON_STREAM_MIN_ITEMS rows are streamed in chunks instead of being
+    encoded into one buffer.
+
+    Routes opt in by returning this; keep `response_model` on the route so
+    the OpenAPI schema still describes the rows.
+    """
+    if len(rows) < settings.JSON_STREAM_MIN_ITEMS:
+        return ORJSONResponse(rows, headers=headers)
+    return StreamingResponse(_iter_json_array(rows), media_type="application/json", headers=headers)
+
+
+def _iter_json_array(rows: List[Any], chunk_size: int = 256) -> Iterator[bytes]:
+    yield b'['
+    for start in range(0, len(rows), chunk_size):
+        chunk = b','.join(orjson.dumps(row, option=_ORJSON_OPTIONS) for row in rows[start:start + chunk_size])
+        yield (b',' + chunk) if start else chunk
+    yield b']'
@@ -3,7 +3,16 @@ from apscheduler.triggers.cron import CronTrigger
 from appwrite.services.databases import Databases
 from appwrite.query import Query
 from app.utils.appwrite_client import get_client
+from app.utils.appwrite_gateway import AsyncDatabases
 from app.config import settings
+from app.utils.principal_cache import clear_principals
+from app.services.retention_service import sweep_storage
+from app.services.usage_service import reconcile_storage_usage
+from app.utils.storage_index import storage_index
+from app.services.nutrition_service import backfill_nutrition_rollups
+from app.services.macro_migration_service import migrate_food_log_macros
+from app.utils.document_updates import purge_revision_claims
+from app.utils.user_updates import user_updates
 import logging
 
 # Set up logging
@@ -13,14 +22,14 @@ logger = logging.getLogger(__name__)
 async def reset_daily_calories():
     try:
         client = get_client()
-        database = Databases(client)
+        database = AsyncDatabases(Databases(client))
         
         # Get all users - paginate through results
         offset = 0
         limit = 100  # Process in batches
         
         while True:
-            users = database.list_documents(
+            users = await database.list_documents(
                 database_id=settings.DATABASE_ID,
                 collection_id='6758085b003d85763089',
                 queries=[
@@ -34,11 +43,11 @@ async def reset_daily_calories():
                 
             for user in users['documents']:
                 try:
-                    database.update_document(
-                        database_id=settings.DATABASE_ID,
-                        collection_id='6758085b003d85763089',
-                        document_id=user['$id'],
-                        data={'calories_consumed_today': 0}
+                    # Through the update queue, so a meal logged concurrently isn't overwritten
+                    await user_updates.update(
+                        user['$id'],
+                        lambda latest: {'calories_consumed_today': 0},
+                        current=user
                     )
                     logger.info(f"Reset calories for user: {user['$id']}")
                 except Exception as e:
@@ -46,6 +55,8 @@ async def reset_daily_calories():
             
             offset += limit
             
+        # Cached principals still carry yesterday's counters
+        clear_principals()
         logger.info("Completed daily calorie reset for all users")
     except Exception as e:
         logger.error(f"Error in reset_daily_calories: {str(e)}")
@@ -62,7 +73,53 @@ def init_scheduler():
         name='Reset daily calorie counts',
         replace_existing=True
     )
+
+    # Delete orphaned images once a day, outside peak hours
+    scheduler.add_job(
+        sweep_storage,
+        CronTrigger(hour=settings.RETENTION_SWEEP_HOUR, minute=30),
+        id='sweep_storage',
+        name='Delete orphaned storage files',
+        replace_existing=True
+    )
+
+    # Correct drift in the incremental storage usage counters
+    if storage_index.enabled:
+        scheduler.add_job(
+            reconcile_storage_usage,
+            CronTrigger(hour=settings.STORAGE_USAGE_RECONCILE_HOUR, minute=0),
+            id='reconcile_storage_usage',
+            name='Reconcile storage usage counters',
+            replace_existing=True
+        )
+
+    # Drop revision claims nobody can still be racing for
+    scheduler.add_job(
+        purge_revision_claims,
+        CronTrigger(hour=settings.STORAGE_USAGE_RECONCILE_HOUR, minute=30),
+        id='purge_revision_claims',
+        name='Purge old revision claims',
+        replace_existing=True
+    )
+
+    # One-off rebuild of the daily nutrition rollups from food log history
+    if settings.NUTRITION_BACKFILL_ON_STARTUP:
+        scheduler.add_job(
+            backfill_nutrition_rollups,
+            id='backfill_nutrition_rollups',
+            name='Backfill daily nutrition rollups',
+            replace_existing=True
+        )
     
+    # One-off rewrite of legacy JSON macronutrients to numeric attributes
+    if settings.MACRO_MIGRATION_ON_STARTUP:
+        scheduler.add_job(
+            migrate_food_log_macros,
+            id='migrate_food_log_macros',
+            name='Migrate food log macronutrients',
+            replace_existing=True
+        )
+
     # Start the scheduler
     scheduler.start()
     logger.info("Scheduler started successfully")
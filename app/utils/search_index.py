@@ -0,0 +1,192 @@
+# app/utils/search_index.py
+import heapq
+import re
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from cachetools import LRUCache
+from app.config import settings
+
+_TOKEN = re.compile(r"[^\W_]+")
+
+# Rough per-entry overheads used to keep the cache under its memory budget
+_BYTES_PER_LOG = 400
+_BYTES_PER_TERM = 300
+
+_EXACT_SCORE = 1.0
+_PREFIX_SCORE = 0.8
+_FUZZY_WEIGHT = 0.7
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+
+def trigrams(term: str) -> Set[str]:
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class FoodLogIndex:
+    """
+    Inverted index over one user's food log names.
+
+    People log the same meals over and over, so terms map to distinct food
+    names, and each name to its logs. A second index maps character
+    trigrams to terms, so a query term is matched against the user's
+    vocabulary exactly, as a prefix ("chick" -> "chicken") and fuzzily by
+    trigram similarity ("chiken" -> "chicken"). Names are ranked by the sum
+    of each query term's best match, then by how recently they were logged;
+    logs of a name are returned newest first.
+    """
+
+    def __init__(self):
+        self.logs: Dict[str, Tuple[str, float, str, str]] = {}  # id -> (food_name, calories, image_url, timestamp)
+        self.names: Dict[str, List[str]] = defaultdict(list)  # normalized name -> log ids
+        self.latest: Dict[str, str] = {}  # normalized name -> newest timestamp
+        self.postings: Dict[str, Set[str]] = defaultdict(set)  # term -> normalized names
+        self.term_trigrams: Dict[str, Set[str]] = defaultdict(set)
+        self.trigram_counts: Dict[str, int] = {}
+        self.estimated_bytes = 0
+        self.built_at = time.monotonic()
+
+    def add(self, log: Dict[str, Any]) -> None:
+        log_id = log.get('$id') or log['id']
+        if log_id in self.logs:
+            return
+        food_name, timestamp = log['food_name'], log['timestamp']
+        self.logs[log_id] = (
+            food_name,
+            float(log.get('calories') or 0),
+            log.get('image_url') or '',
+            timestamp
+        )
+        self.estimated_bytes += _BYTES_PER_LOG + len(food_name) + len(self.logs[log_id][2])
+
+        name_terms = tokenize(food_name)
+        name = ' '.join(name_terms)
+        self.names[name].append(log_id)
+        if timestamp > self.latest.get(name, ''):
+            self.latest[name] = timestamp
+
+        for term in set(name_terms):
+            if term not in self.postings:
+                term_trigrams = trigrams(term)
+                for trigram in term_trigrams:
+                    self.term_trigrams[trigram].add(term)
+                self.trigram_counts[term] = len(term_trigrams)
+                self.estimated_bytes += _BYTES_PER_TERM
+            self.postings[term].add(name)
+
+    def _match_terms(self, query_term: str, threshold: float) -> Dict[str, float]:
+        matches = {}
+        if query_term in self.postings:
+            matches[query_term] = _EXACT_SCORE
+
+        for term in self.postings:
+            if term != query_term and term.startswith(query_term):
+                matches[term] = _PREFIX_SCORE
+
+        query_trigrams = trigrams(query_term)
+        shared: Dict[str, int] = defaultdict(int)
+        for trigram in query_trigrams:
+            for term in self.term_trigrams.get(trigram, ()):
+                shared[term] += 1
+        for term, count in shared.items():
+            similarity = count / (len(query_trigrams) + self.trigram_counts[term] - count)
+            if similarity >= threshold:
+                matches[term] = max(matches.get(term, 0.0), similarity * _FUZZY_WEIGHT)
+        return matches
+
+    def search(self, query: str, limit: int, threshold: float) -> List[Dict[str, Any]]:
+        scores: Dict[str, float] = defaultdict(float)
+        for query_term in set(tokenize(query)):
+            best: Dict[str, float] = {}
+            for term, score in self._match_terms(query_term, threshold).items():
+                for name in self.postings[term]:
+                    if score > best.get(name, 0.0):
+                        best[name] = score
+            for name, score in best.items():
+                scores[name] += score
+
+        ranked = sorted(scores.items(), key=lambda item: (item[1], self.latest[item[0]]), reverse=True)
+        results = []
+        for name, score in ranked:
+            log_ids = heapq.nlargest(limit - len(results), self.names[name], key=lambda i: self.logs[i][3])
+            for log_id in log_ids:
+                food_name, calories, image_url, timestamp = self.logs[log_id]
+                results.append({
+                    "id": log_id,
+                    "food_name": food_name,
+                    "calories": calories,
+                    "image_url": image_url,
+                    "timestamp": timestamp,
+                    "score": round(score, 3)
+                })
+            if len(results) >= limit:
+                break
+        return results
+
+
+class SearchIndexCache:
+    """
+    Per-user FoodLogIndex instances kept under an approximate memory budget
+    (SEARCH_INDEX_MEMORY_MB), least recently used evicted first. An index is
+    rebuilt once it is older than SEARCH_INDEX_TTL seconds, so logs written
+    by other workers are picked up.
+    """
+
+    def __init__(self, memory_budget: int, ttl: int):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._indexes = LRUCache(maxsize=memory_budget, getsizeof=lambda index: index.estimated_bytes)
+        self._pending: Dict[str, List[Dict[str, Any]]] = {}
+
+    def get(self, user_id: str) -> Optional[FoodLogIndex]:
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is not None and time.monotonic() - index.built_at > self.ttl:
+                del self._indexes[user_id]
+                return None
+            return index
+
+    def begin_build(self, user_id: str) -> None:
+        """Starts buffering writes for a user whose index is being built."""
+        with self._lock:
+            self._pending.setdefault(user_id, [])
+
+    def finish_build(self, user_id: str, index: FoodLogIndex) -> None:
+        with self._lock:
+            for log in self._pending.pop(user_id, []):
+                index.add(log)
+            self._store(user_id, index)
+
+    def abort_build(self, user_id: str) -> None:
+        with self._lock:
+            self._pending.pop(user_id, None)
+
+    def add_logs(self, user_id: str, logs: Iterable[Dict[str, Any]]) -> None:
+        """Adds new logs to the user's index if it is loaded or being built."""
+        with self._lock:
+            if user_id in self._pending:
+                self._pending[user_id].extend(logs)
+                return
+            index = self._indexes.get(user_id)
+            if index is None:
+                return  # Built from the database, including these logs, on first search
+            for log in logs:
+                index.add(log)
+            self._store(user_id, index)
+
+    def _store(self, user_id: str, index: FoodLogIndex) -> None:
+        try:
+            self._indexes[user_id] = index  # Re-set so the cache sees the new size
+        except ValueError:
+            pass  # Larger than the whole budget; serve this search without caching it
+
+
+food_search_index = SearchIndexCache(
+    settings.SEARCH_INDEX_MEMORY_MB * 1024 * 1024,
+    settings.SEARCH_INDEX_TTL
+)
@@ -0,0 +1,275 @@
+# app/utils/storage_index.py
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+import anyio
+from app.config import settings
+
+
+def content_file_id(file_data: bytes) -> str:
+    """
+    Content-addressed Appwrite file ID: the first 128 bits of the SHA-256,
+    hex encoded (32 chars, within Appwrite's 36-char ID limit).
+    """
+    return hashlib.sha256(file_data).hexdigest()[:32]
+
+
+def variant_file_id(file_id: str, size: int) -> str:
+    """ID of a thumbnail stored alongside file_id, derivable from the original's ID."""
+    return f"{file_id[:30]}_{size}"
+
+
+BUCKET_SCOPE = ''  # Usage row for the whole bucket; other rows are per user
+
+
+class StorageIndex:
+    """
+    Per-instance index of content-addressed files, the thumbnail sizes stored with
+    each and how many references (food logs, profile images) point at it, so
+    identical uploads reuse the stored file and deletes only hit storage once
+    nothing uses it.
+
+    It also keeps storage usage counters, updated in the same transaction as
+    the reference counts: bytes and files physically in the bucket, and per
+    user the bytes and number of images they reference (a shared image
+    counts for every user holding it). Reading usage is a single-row lookup;
+    drift (e.g. from other processes or manual deletes) is corrected by a
+    periodic reconciliation scan that overwrites the counters.
+    Blocking SQLite calls run in a worker thread.
+
+    Each process or instance has its own index, so its reference counts are
+    only a hint: a file is never deleted from storage on the strength of a
+    zero count alone (see StorageService.delete_image).
+    """
+
+    enabled = True
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "file_id TEXT PRIMARY KEY, size INTEGER NOT NULL, "
+            "refcount INTEGER NOT NULL, created_at REAL NOT NULL, "
+            "variants TEXT NOT NULL DEFAULT '')"
+        )
+        for column in ("variants TEXT NOT NULL DEFAULT ''", "stored_bytes INTEGER NOT NULL DEFAULT 0"):
+            try:
+                self._conn.execute(f"ALTER TABLE files ADD COLUMN {column}")
+            except sqlite3.OperationalError:
+                pass  # Column already exists
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS usage ("
+            "scope TEXT PRIMARY KEY, bytes INTEGER NOT NULL, files INTEGER NOT NULL)"
+        )
+        self._conn.commit()
+
+    def _add_usage(self, scope: str, size: int, files: int) -> None:
+        # Caller holds the lock and commits
+        self._conn.execute("INSERT OR IGNORE INTO usage (scope, bytes, files) VALUES (?, 0, 0)", (scope,))
+        self._conn.execute(
+            "UPDATE usage SET bytes = MAX(bytes + ?, 0), files = MAX(files + ?, 0) WHERE scope = ?",
+            (size, files, scope)
+        )
+
+    def _acquire(self, file_id: str, user_id: Optional[str]) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT stored_bytes FROM files WHERE file_id = ?", (file_id,)
+            ).fetchone()
+            if row is None:
+                return False
+            self._conn.execute(
+                "UPDATE files SET refcount = refcount + 1 WHERE file_id = ?", (file_id,)
+            )
+            if user_id:
+                self._add_usage(user_id, row[0], 1)
+            self._conn.commit()
+            return True
+
+    def _register(
+        self,
+        file_id: str,
+        size: int,
+        variants: List[int],
+        stored_bytes: int,
+        user_id: Optional[str],
+        new_file: bool
+    ) -> None:
+        with self._lock:
+            existing = self._conn.execute(
+                "SELECT stored_bytes FROM files WHERE file_id = ?", (file_id,)
+            ).fetchone()
+            if existing is None:
+                self._conn.execute(
+                    "INSERT INTO files (file_id, size, refcount, created_at, variants, stored_bytes) "
+                    "VALUES (?, ?, 1, ?, ?, ?)",
+                    (file_id, size, time.time(), ','.join(str(v) for v in variants), stored_bytes)
+                )
+                if new_file:
+                    self._add_usage(BUCKET_SCOPE, stored_bytes, 1 + len(variants))
+            else:
+                self._conn.execute(
+                    "UPDATE files SET refcount = refcount + 1 WHERE file_id = ?", (file_id,)
+                )
+                stored_bytes = existing[0]
+            if user_id:
+                self._add_usage(user_id, stored_bytes, 1)
+            self._conn.commit()
+
+    def _variants(self, file_ids: List[str]) -> Dict[str, List[int]]:
+        if not file_ids:
+            return {}
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT file_id, variants FROM files WHERE file_id IN ({','.join('?' * len(file_ids))})",
+                file_ids
+            ).fetchall()
+        return {
+            file_id: [int(v) for v in variants.split(',') if v]
+            for file_id, variants in rows
+        }
+
+    def _release(self, file_id: str, user_id: Optional[str]) -> int:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT refcount, stored_bytes, variants FROM files WHERE file_id = ?", (file_id,)
+            ).fetchone()
+            if row is None:
+                return 0
+            refcount, stored_bytes, variants = row
+            remaining = refcount - 1
+            if remaining > 0:
+                self._conn.execute(
+                    "UPDATE files SET refcount = ? WHERE file_id = ?", (remaining, file_id)
+                )
+            else:
+                self._conn.execute("DELETE FROM files WHERE file_id = ?", (file_id,))
+                file_count = 1 + len([v for v in variants.split(',') if v])
+                self._add_usage(BUCKET_SCOPE, -stored_bytes, -file_count)
+            if user_id:
+                self._add_usage(user_id, -stored_bytes, -1)
+            self._conn.commit()
+            return remaining
+
+    def _forget(self, file_id: str, size: int) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM files WHERE file_id = ?", (file_id,))
+            self._add_usage(BUCKET_SCOPE, -size, -1)
+            self._conn.commit()
+
+    def _usage(self, scope: str) -> Tuple[int, int]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT bytes, files FROM usage WHERE scope = ?", (scope,)
+            ).fetchone()
+        return row or (0, 0)
+
+    def _replace_usage(self, usage: Dict[str, Tuple[int, int]]) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM usage")
+            self._conn.executemany(
+                "INSERT INTO usage (scope, bytes, files) VALUES (?, ?, ?)",
+                [(scope, size, files) for scope, (size, files) in usage.items()]
+            )
+            self._conn.commit()
+
+    async def acquire(self, file_id: str, user_id: Optional[str] = None) -> bool:
+        """Adds a reference to an already stored file; False if it isn't indexed."""
+        return await anyio.to_thread.run_sync(self._acquire, file_id, user_id)
+
+    async def register(
+        self,
+        file_id: str,
+        size: int,
+        variants: Iterable[int] = (),
+        stored_bytes: Optional[int] = None,
+        user_id: Optional[str] = None,
+        new_file: bool = True
+    ) -> None:
+        """
+        Records a stored file with one reference. stored_bytes covers the
+        original and its thumbnails (defaults to size). new_file is False
+        when the upload found the file already in the bucket (stored by
+        another instance), so it isn't added to the bucket usage again.
+        """
+        await anyio.to_thread.run_sync(
+            self._register,
+            file_id,
+            size,
+            sorted(variants),
+            size if stored_bytes is None else stored_bytes,
+            user_id,
+            new_file
+        )
+
+    async def variants(self, file_ids: Iterable[str]) -> Dict[str, List[int]]:
+        """Thumbnail sizes stored for each of the given (indexed) files."""
+        return await anyio.to_thread.run_sync(self._variants, list(set(file_ids)))
+
+    async def release(self, file_id: str, user_id: Optional[str] = None) -> int:
+        """
+        Drops a reference; returns how many this index still knows of. 0
+        (also for unknown files) only means the file may be unused.
+        """
+        return await anyio.to_thread.run_sync(self._release, file_id, user_id)
+
+    async def forget(self, file_id: str, size: int) -> None:
+        """
+        Records that a single bucket file of `size` bytes was deleted as an
+        orphan, dropping its entry regardless of its count.
+        """
+        await anyio.to_thread.run_sync(self._forget, file_id, size)
+
+    async def usage(self, user_id: Optional[str] = None) -> Tuple[int, int]:
+        """(bytes, files) for the bucket, or for one user."""
+        return await anyio.to_thread.run_sync(self._usage, user_id or BUCKET_SCOPE)
+
+    async def replace_usage(self, usage: Dict[str, Tuple[int, int]]) -> None:
+        """Overwrites all counters with reconciled values, keyed by scope."""
+        await anyio.to_thread.run_sync(self._replace_usage, usage)
+
+
+class NullStorageIndex:
+    """
+    Stand-in when STORAGE_INDEX_BACKEND is "none" (serverless deploys with a
+    read-only filesystem and many short-lived instances): nothing is
+    tracked, uploads always go upstream and usage is computed by scanning.
+    """
+
+    enabled = False
+
+    async def acquire(self, file_id: str, user_id: Optional[str] = None) -> bool:
+        return False
+
+    async def register(self, file_id: str, size: int, variants: Iterable[int] = (), **kwargs) -> None:
+        return None
+
+    async def variants(self, file_ids: Iterable[str]) -> Dict[str, List[int]]:
+        return {}
+
+    async def release(self, file_id: str, user_id: Optional[str] = None) -> int:
+        return 0
+
+    async def forget(self, file_id: str, size: int) -> None:
+        return None
+
+    async def usage(self, user_id: Optional[str] = None) -> Tuple[int, int]:
+        return 0, 0
+
+    async def replace_usage(self, usage: Dict[str, Tuple[int, int]]) -> None:
+        return None
+
+
+def build_storage_index():
+    """Builds the index configured by STORAGE_INDEX_BACKEND ("sqlite" or "none")."""
+    if settings.STORAGE_INDEX_BACKEND == "none":
+        return NullStorageIndex()
+    return StorageIndex(settings.STORAGE_INDEX_PATH)
+
+
+storage_index = build_storage_index()
@@ -0,0 +1,119 @@
+# app/utils/tokens.py
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Tuple
+import jwt
+from app.config import settings
+
+ALGORITHM = "HS256"
+ACCESS_TOKEN_TYPE = "access"
+REFRESH_TOKEN_TYPE = "refresh"
+
+# jti or session id -> exp (unix seconds); entries are dropped once the token expires anyway
+_revoked: Dict[str, float] = {}
+_revoked_lock = threading.Lock()
+
+
+def is_signed_token(token: str) -> bool:
+    """Signed tokens are compact JWTs; legacy tokens are bare Appwrite user IDs."""
+    return token.count('.') == 2
+
+
+def _encode(claims: Dict[str, Any], token_type: str, lifetime: timedelta) -> Tuple[str, datetime]:
+    now = datetime.now(timezone.utc)
+    expires = now + lifetime
+    payload = {
+        **claims,
+        "typ": token_type,
+        "jti": uuid.uuid4().hex,
+        "iat": now,
+        "exp": expires
+    }
+    return jwt.encode(payload, settings.SECRET_KEY, algorithm=ALGORITHM), expires
+
+
+def new_session_id() -> str:
+    return uuid.uuid4().hex
+
+
+def create_access_token(user_data: Dict[str, Any], session_id: str) -> Tuple[str, datetime]:
+    """
+    Issues a short-lived access token from an Appwrite user document.
+    Only the fields that never change per meal are embedded; counters such
+    as streaks, points and calories must still be read from the database.
+    """
+    claims = {
+        "sub": user_data['$id'],
+        "sid": session_id,
+        "email": user_data['email'],
+        "full_name": user_data.get('full_name'),
+        "profile_image": user_data.get('profile_image'),
+        "created_at": user_data['$createdAt'],
+        "updated_at": user_data['$updatedAt']
+    }
+    return _encode(
+        claims,
+        ACCESS_TOKEN_TYPE,
+        timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+
+
+def create_refresh_token(user_id: str, session_id: str) -> Tuple[str, datetime]:
+    """
+    Issues a long-lived refresh token that can only be exchanged at
+    /auth/refresh. It shares its session ID with the access token issued
+    alongside it, and refreshing keeps the session, so logout can revoke
+    the whole chain.
+    """
+    return _encode(
+        {"sub": user_id, "sid": session_id},
+        REFRESH_TOKEN_TYPE,
+        timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+    )
+
+
+def decode_token(token: str, token_type: str = ACCESS_TOKEN_TYPE) -> Dict[str, Any]:
+    """
+    Verifies signature, expiry, type and revocation of a token.
+    Raises jwt.InvalidTokenError if any check fails.
+    """
+    claims = jwt.decode(
+        token,
+        settings.SECRET_KEY,
+        algorithms=[ALGORITHM],
+        options={"require": ["sub", "typ", "jti", "exp"]}
+    )
+    if claims["typ"] != token_type:
+        raise jwt.InvalidTokenError(f"Expected {token_type} token")
+    if is_revoked(claims["jti"]) or (claims.get("sid") and is_revoked(claims["sid"])):
+        raise jwt.InvalidTokenError("Token has been revoked")
+    return claims
+
+
+def _revoke(key: str, exp: float) -> None:
+    now = time.time()
+    with _revoked_lock:
+        for expired in [revoked for revoked, until in _revoked.items() if until <= now]:
+            del _revoked[expired]
+        _revoked[key] = exp
+
+
+def revoke_token(claims: Dict[str, Any]) -> None:
+    """Adds a decoded token to the in-memory revocation list until it expires."""
+    _revoke(claims["jti"], float(claims["exp"]))
+
+
+def revoke_session(claims: Dict[str, Any]) -> None:
+    """
+    Revokes every token of a decoded token's session (its refresh token
+    included), for as long as any token issued so far could still be valid.
+    """
+    if claims.get("sid"):
+        _revoke(claims["sid"], time.time() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS).total_seconds())
+
+
+def is_revoked(jti: str) -> bool:
+    with _revoked_lock:
+        return jti in _revoked
@@ -0,0 +1,52 @@
+# app/utils/unit_of_work.py
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional, Set, Tuple
+
+DocumentKey = Tuple[str, str]  # (collection_id, document_id)
+
+_current: ContextVar[Optional["UnitOfWork"]] = ContextVar("unit_of_work", default=None)
+
+
+class UnitOfWork:
+    """
+    Per-request identity map of Appwrite documents.
+    Documents read during a request are memoized so later reads of the same
+    document are free, and writes replace the memoized copy (and are tracked
+    as dirty) so later reads see earlier writes.
+    """
+
+    def __init__(self):
+        self._documents: Dict[DocumentKey, Dict[str, Any]] = {}
+        self.dirty: Set[DocumentKey] = set()
+
+    def get(self, collection_id: str, document_id: str) -> Optional[Dict[str, Any]]:
+        document = self._documents.get((collection_id, document_id))
+        # Hand out copies so callers can't corrupt the memoized document
+        return dict(document) if document is not None else None
+
+    def remember(self, collection_id: str, document_id: str, document: Dict[str, Any]) -> None:
+        self._documents[(collection_id, document_id)] = dict(document)
+
+    def record_write(self, collection_id: str, document_id: str, document: Dict[str, Any]) -> None:
+        self.remember(collection_id, document_id, document)
+        self.dirty.add((collection_id, document_id))
+
+    def forget(self, collection_id: str, document_id: str) -> None:
+        self._documents.pop((collection_id, document_id), None)
+
+
+def current_unit_of_work() -> Optional[UnitOfWork]:
+    """Returns the unit of work of the current request, if any."""
+    return _current.get()
+
+
+@contextmanager
+def unit_of_work() -> Iterator[UnitOfWork]:
+    """Opens a unit of work for the duration of the block (one per request)."""
+    uow = UnitOfWork()
+    token = _current.set(uow)
+    try:
+        yield uow
+    finally:
+        _current.reset(token)
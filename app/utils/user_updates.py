@@ -0,0 +1,8 @@
+# app/utils/user_updates.py
+from app.utils.document_updates import DocumentUpdateQueue
+from app.utils.principal_cache import invalidate_user
+
+USERS_COLLECTION = '6758085b003d85763089'
+
+# Counters, streaks and achievements on user documents; see DocumentUpdateQueue
+user_updates = DocumentUpdateQueue(USERS_COLLECTION, on_write=invalidate_user)
@@ -0,0 +1,233 @@
+# app/utils/vision_cache.py
+import hashlib
+import io
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+import anyio
+from cachetools import LRUCache
+from app.config import settings
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional; near-duplicate matching is skipped without it
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(image_data: bytes) -> str:
+    return hashlib.sha256(image_data).hexdigest()
+
+
+def perceptual_hash(image_data: bytes) -> Optional[int]:
+    """
+    64-bit difference hash (dHash): robust to re-encoding and resizing,
+    so the same photo uploaded twice maps to (nearly) the same value.
+    """
+    if Image is None:
+        return None
+    try:
+        image = Image.open(io.BytesIO(image_data))
+        image.draft('L', (64, 64))  # JPEG: decode at reduced size, much faster
+        pixels = list(image.convert('L').resize((9, 8)).getdata())
+    except Exception as e:
+        logger.warning(f"Perceptual hash failed: {str(e)}")
+        return None
+
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            value = (value << 1) | (1 if left > right else 0)
+    return value
+
+
+class MemoryBackend:
+    """Size-bounded LRU in process memory."""
+
+    blocking = False
+
+    def __init__(self, max_entries: int):
+        self._cache: LRUCache = LRUCache(maxsize=max_entries)
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._cache.get(key)
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        with self._lock:
+            self._cache[key] = value
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+
+class DiskBackend:
+    """Size-bounded LRU in a local SQLite file; survives restarts."""
+
+    blocking = True
+
+    def __init__(self, path: str, max_entries: int):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS vision_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS vision_cache_last_used ON vision_cache (last_used)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM vision_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE vision_cache SET last_used = ? WHERE key = ?", (time.time(), key)
+            )
+            self._conn.commit()
+            return json.loads(row[0])
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO vision_cache (key, value, last_used) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time())
+            )
+            # Evict least recently used rows beyond the size bound
+            self._conn.execute(
+                "DELETE FROM vision_cache WHERE key IN ("
+                "SELECT key FROM vision_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM vision_cache").fetchone()[0]
+
+
+class VisionCache:
+    """
+    Maps image content to the parsed nutrition result of VisionService.
+    Lookups try the exact SHA-256 first and, when enabled, fall back to a
+    perceptual hash within VISION_CACHE_PHASH_DISTANCE bits.
+    """
+
+    def __init__(self, backend, max_entries: int, near_duplicates: bool, max_distance: int):
+        self.backend = backend
+        self.near_duplicates = near_duplicates and Image is not None
+        self.max_distance = max_distance
+        # phash -> content hash, bounded like the backend (oldest dropped first)
+        self._phashes: "OrderedDict[int, str]" = OrderedDict()
+        self._max_phashes = max_entries
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self._miss_seconds = 0.0
+        self._timed_misses = 0
+
+        if near_duplicates and Image is None:
+            logger.warning("Pillow not installed; vision cache near-duplicate matching disabled")
+
+    async def _call(self, func, *args):
+        if self.backend.blocking:
+            return await anyio.to_thread.run_sync(func, *args)
+        return func(*args)
+
+    def _find_near_duplicate(self, phash: int) -> Optional[str]:
+        best_key, best_distance = None, self.max_distance + 1
+        for candidate, key in self._phashes.items():
+            distance = bin(candidate ^ phash).count('1')
+            if distance < best_distance:
+                best_key, best_distance = key, distance
+        return best_key
+
+    def _avg_miss_seconds(self) -> float:
+        return self._miss_seconds / self._timed_misses if self._timed_misses else 0.0
+
+    async def get(self, image_data: bytes) -> Dict[str, Any]:
+        """
+        Looks up a cached result. Returns a dict with the result (or None),
+        plus the hashes to pass back to put() on a miss.
+        """
+        key = content_hash(image_data)
+        result = await self._call(self.backend.get, key)
+        if result is not None:
+            self.exact_hits += 1
+            self.saved_seconds += self._avg_miss_seconds()
+            return {"result": result, "key": key, "phash": None}
+
+        phash = None
+        if self.near_duplicates:
+            phash = await anyio.to_thread.run_sync(perceptual_hash, image_data)
+            near_key = self._find_near_duplicate(phash) if phash is not None else None
+            if near_key is not None:
+                result = await self._call(self.backend.get, near_key)
+                if result is not None:
+                    self.near_hits += 1
+                    self.saved_seconds += self._avg_miss_seconds()
+                    # Next upload of these exact bytes becomes an exact hit
+                    await self._call(self.backend.set, key, result)
+                    return {"result": result, "key": key, "phash": phash}
+
+        self.misses += 1
+        return {"result": None, "key": key, "phash": phash}
+
+    async def put(self, lookup: Dict[str, Any], result: Dict[str, Any], elapsed: float) -> None:
+        """Stores a freshly computed result and records how long it took."""
+        self._miss_seconds += elapsed
+        self._timed_misses += 1
+        await self._call(self.backend.set, lookup["key"], result)
+        if lookup["phash"] is not None:
+            self._phashes[lookup["phash"]] = lookup["key"]
+            self._phashes.move_to_end(lookup["phash"])
+            while len(self._phashes) > self._max_phashes:
+                self._phashes.popitem(last=False)
+
+    def snapshot(self) -> Dict[str, Any]:
+        lookups = self.exact_hits + self.near_hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": len(self.backend),
+            "exact_hits": self.exact_hits,
+            "near_duplicate_hits": self.near_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.exact_hits + self.near_hits) / lookups, 4) if lookups else 0.0,
+            "saved_seconds": round(self.saved_seconds, 2),
+            "avg_miss_ms": round(self._avg_miss_seconds() * 1000, 2)
+        }
+
+
+def build_vision_cache() -> Optional[VisionCache]:
+    """Builds the cache configured by VISION_CACHE_BACKEND ("memory", "disk" or "none")."""
+    if settings.VISION_CACHE_BACKEND == "none":
+        return None
+    if settings.VISION_CACHE_BACKEND == "disk":
+        backend = DiskBackend(settings.VISION_CACHE_PATH, settings.VISION_CACHE_MAX_ENTRIES)
+    else:
+        backend = MemoryBackend(settings.VISION_CACHE_MAX_ENTRIES)
+    return VisionCache(
+        backend,
+        settings.VISION_CACHE_MAX_ENTRIES,
+        settings.VISION_CACHE_NEAR_DUPLICATES,
+        settings.VISION_CACHE_PHASH_DISTANCE
+    )
+
+
+vision_cache = build_vision_cache()
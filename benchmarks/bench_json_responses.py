@@ -0,0 +1,103 @@
+"""
+Benchmarks serializing a page of food logs the way /food/logs used to
+(a FoodLog model per row, then FastAPI's response validation, encoder and
+json.dumps) against the orjson fast path (construct_rows +
+json_array_response).
+
+    python -m benchmarks.bench_json_responses [--rows 50] [--repeats 200]
+
+Only in-process work is timed; the Appwrite query is not included.
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from app.models.food_log import FoodLog
+from app.utils.macronutrients import decode_macros
+from app.utils.responses import construct_rows, json_array_response
+
+
+def synthetic_page(rows: int, legacy: bool) -> List[dict]:
+    start = datetime.now(timezone.utc)
+    page = []
+    for i in range(rows):
+        macros = {"protein": 20.0 + i % 30, "carbs": 40.0 + i % 50, "fats": 10.0 + i % 20}
+        document = {
+            "$id": f"log{i:06d}",
+            "$collectionId": "675928700015cab990d9",
+            "$databaseId": "db",
+            "$createdAt": start.isoformat(),
+            "$updatedAt": start.isoformat(),
+            "$permissions": [],
+            "id": f"log{i:06d}",
+            "user_id": "user1",
+            "food_name": f"Chicken tikka masala {i}",
+            "portion_size": 350.0,
+            "calories": 520.0 + i,
+            "image_url": f"https://cloud.appwrite.io/v1/storage/buckets/b/files/{i:032d}/view",
+            "visibility": "friends",
+            "reactions": [],
+            "timestamp": (start - timedelta(minutes=37 * i)).isoformat()
+        }
+        if legacy:
+            document["macronutrients"] = json.dumps(macros)
+        else:
+            document.update(macros)
+        page.append(document)
+    return page
+
+
+def model_path(page: List[dict], adapter: TypeAdapter) -> bytes:
+    """The previous route body plus what FastAPI does with a response_model."""
+    food_logs = []
+    for log in page:
+        log = dict(log)
+        log['macronutrients'] = json.loads(log['macronutrients'])
+        log['timestamp'] = datetime.fromisoformat(log['timestamp'])
+        food_logs.append(FoodLog(**log))
+    validated = adapter.validate_python(food_logs, from_attributes=True)
+    return json.dumps(jsonable_encoder(validated)).encode()
+
+
+def fast_path(page: List[dict]) -> bytes:
+    food_logs = construct_rows(FoodLog, (
+        {**log, "id": log['$id'], "macronutrients": decode_macros(log)} for log in page
+    ))
+    return json_array_response(food_logs).body
+
+
+def best_of(repeats, func, *args):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--rows', type=int, default=50)
+    parser.add_argument('--repeats', type=int, default=200)
+    args = parser.parse_args()
+
+    adapter = TypeAdapter(List[FoodLog])
+    legacy_page = synthetic_page(args.rows, legacy=True)
+    page = synthetic_page(args.rows, legacy=False)
+
+    before = best_of(args.repeats, model_path, legacy_page, adapter)
+    after = best_of(args.repeats, fast_path, page)
+    after_legacy = best_of(args.repeats, fast_path, legacy_page)
+
+    print(f"{args.rows} rows per page")
+    print(f"models + jsonable_encoder + json:  {before * 1000:8.3f} ms  {before / args.rows * 1e6:7.2f} us/row")
+    print(f"construct_rows + orjson:           {after * 1000:8.3f} ms  {after / args.rows * 1e6:7.2f} us/row")
+    print(f"  (legacy JSON macros):            {after_legacy * 1000:8.3f} ms  {after_legacy / args.rows * 1e6:7.2f} us/row")
+    print(f"speedup:                           {before / after:8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
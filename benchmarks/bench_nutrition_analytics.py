@@ -0,0 +1,93 @@
+"""
+Benchmarks the vectorized nutrition analytics against a plain Python
+per-row implementation over synthetic food log histories.
+
+    python -m benchmarks.bench_nutrition_analytics [--years 5] [--meals-per-day 4]
+
+Only the in-process computation is timed; fetching logs from Appwrite is
+not included.
+"""
+import argparse
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+import numpy as np
+from app.utils.nutrition_analytics import build_columns, compute_analytics
+
+
+def synthetic_history(years: int, meals_per_day: float, seed: int = 7):
+    rng = np.random.default_rng(seed)
+    n_days = int(years * 365)
+    n_logs = int(n_days * meals_per_day)
+    start = datetime.now(timezone.utc) - timedelta(days=n_days)
+    offsets = np.sort(rng.uniform(0, n_days * 86400, n_logs))
+    timestamps = [(start + timedelta(seconds=float(s))).isoformat() for s in offsets]
+    calories = rng.gamma(4.0, 150.0, n_logs)
+    protein = rng.gamma(3.0, 8.0, n_logs)
+    carbs = rng.gamma(3.0, 15.0, n_logs)
+    fats = rng.gamma(3.0, 6.0, n_logs)
+    return n_days, timestamps, calories.tolist(), protein.tolist(), carbs.tolist(), fats.tolist()
+
+
+def python_baseline(n_days, timestamps, calories, protein, carbs, fats, window, goal):
+    """Straightforward per-row version of the core numbers, for comparison."""
+    end = datetime.now(timezone.utc).date()
+    start = end - timedelta(days=n_days - 1)
+    daily = defaultdict(lambda: [0.0, 0.0, 0.0, 0.0, 0])
+    for i, timestamp in enumerate(timestamps):
+        day = datetime.fromisoformat(timestamp).astimezone(timezone.utc).date()
+        if start <= day <= end:
+            totals = daily[day]
+            totals[0] += calories[i]
+            totals[1] += protein[i]
+            totals[2] += carbs[i]
+            totals[3] += fats[i]
+            totals[4] += 1
+
+    series = [daily[start + timedelta(days=d)][0] if (start + timedelta(days=d)) in daily else 0.0
+              for d in range(n_days)]
+    rolling = [sum(series[max(0, i - window + 1):i + 1]) / min(i + 1, window) for i in range(n_days)]
+    logged = sorted(totals[0] for totals in daily.values())
+    percentiles = [logged[int(p / 100 * (len(logged) - 1))] for p in (10, 25, 50, 75, 90)]
+    within = sum(1 for value in logged if abs(value - goal) <= 0.1 * goal) / len(logged)
+    return rolling, percentiles, within
+
+
+def best_of(repeats, func, *args, **kwargs):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        func(*args, **kwargs)
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--years', type=float, default=5)
+    parser.add_argument('--meals-per-day', type=float, default=4)
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    n_days, timestamps, calories, protein, carbs, fats = synthetic_history(args.years, args.meals_per_day)
+    end_day = (datetime.now(timezone.utc).date() - date(1970, 1, 1)).days
+    print(f"{len(timestamps)} logs over {n_days} days")
+
+    columns = build_columns(timestamps, calories, protein, carbs, fats)
+    build_ms = best_of(args.repeats, build_columns, timestamps, calories, protein, carbs, fats)
+    compute_ms = best_of(
+        args.repeats, compute_analytics, columns, end_day, n_days, calorie_goal=2000, include_daily=False
+    )
+    compute_daily_ms = best_of(args.repeats, compute_analytics, columns, end_day, n_days, calorie_goal=2000)
+    baseline_ms = best_of(
+        1, python_baseline, n_days, timestamps, calories, protein, carbs, fats, 7, 2000
+    )
+
+    print(f"build_columns:                 {build_ms:9.2f} ms")
+    print(f"compute_analytics (summary):   {compute_ms:9.2f} ms")
+    print(f"compute_analytics (+ daily):   {compute_daily_ms:9.2f} ms")
+    print(f"per-row Python baseline:       {baseline_ms:9.2f} ms")
+
+
+if __name__ == '__main__':
+    main()